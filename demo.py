@@ -51,7 +51,7 @@ tf_finder = transferFinder(
     active_state_current=1e-9,
     active_state_voltage=0.1,
     measurement_voltage=0.5,
-
+    nanonis_address=(TCP_IP, TCP_PORT),
 )
 
 logger.info("Starting transfer function optimization...")
@@ -0,0 +1,140 @@
+# strategies deciding when the atom is tracked between the points of a sweep
+import numpy as np
+
+import logging
+logger = logging.getLogger("atom_tracking_scheduler")
+
+
+class AtomTrackingScheduler:
+    """
+    Base class for the atom tracking schedulers.
+
+    The scheduler only decides if the atom should be tracked after a point. Reading the drift signals is done by
+    the callbacks passed to its functions, so the scheduler only costs hardware calls if it needs them.
+    """
+    name = "base"
+    reads_current = False # True if decide calls read_current, which costs a measurement per point
+
+    # function called once at the start of the sweep
+    def start(self, clock_time):
+        pass
+
+    def decide(self, points_since_tracking, clock_time, read_current):
+        """
+        Decides if the atom should be tracked now.
+
+        Args:
+            - points_since_tracking: The number of points measured since the last tracking (or the start of the sweep).
+            - clock_time: The current clock time in seconds.
+            - read_current: Function returning the current with the AWG output off in Amperes.
+
+        Returns
+            - decision (dict): "track" (bool), the "reason" of the decision and the drift estimates.
+        """
+        raise NotImplementedError
+
+    # function called after the atom was tracked
+    def tracked(self, clock_time, read_position):
+        pass
+
+    def make_decision(self, track, reason, points_since_tracking, current_drift = None, lateral_drift = None):
+        return {
+            "scheduler": self.name,
+            "track": bool(track),
+            "reason": reason,
+            "points_since_tracking": points_since_tracking,
+            "current_drift": None if current_drift is None else float(current_drift),
+            "lateral_drift": None if lateral_drift is None else float(lateral_drift),
+        }
+
+
+class IntervalTrackingScheduler(AtomTrackingScheduler):
+    name = "interval"
+
+    def __init__(self, interval):
+        """
+        Tracks the atom after every interval points, regardless of the drift.
+
+        Args:
+            - interval: The number of points between two trackings.
+        """
+        self.interval = interval
+
+    def decide(self, points_since_tracking, clock_time, read_current):
+        return self.make_decision(points_since_tracking >= self.interval, "interval", points_since_tracking)
+
+
+class DriftTrackingScheduler(AtomTrackingScheduler):
+    name = "drift"
+    reads_current = True
+
+    def __init__(self, current_threshold = 0.01, lateral_threshold = 50e-12, max_interval = 20, min_interval = 1):
+        """
+        Tracks the atom only if the estimated drift since the last tracking exceeds a threshold, and at the latest
+        after max_interval points. Two drift estimates are used:
+            - current drift: the relative change of the current with the AWG output off (z-controller off, so any
+              change of the junction shows up here), compared to the first check after the last tracking.
+              This costs one short acquisition per point. With a continuously playing AWG output, the output
+              additionally has to be muted and settled before every check (see transferFinder.measure_drift_current),
+              which costs an AWG command and the AWG settling time per point.
+            - lateral drift: the tip position (FolMe.XYPosGet) is read after every tracking. The distance the tip
+              was moved between two trackings gives the lateral drift velocity, which predicts the offset since the
+              last tracking without any hardware call between the trackings.
+
+        Args:
+            - current_threshold: The relative current change which triggers a tracking.
+            - lateral_threshold: The predicted lateral offset in m which triggers a tracking, None to disable.
+            - max_interval: The maximum number of points between two trackings.
+            - min_interval: The minimum number of points between two trackings, no drift is checked before.
+        """
+        self.current_threshold = current_threshold
+        self.lateral_threshold = lateral_threshold
+        self.max_interval = max_interval
+        self.min_interval = min_interval
+
+        self.reference_current = None
+        self.last_position = None
+        self.last_tracking_time = None
+        self.lateral_velocity = None
+
+    def start(self, clock_time):
+        # the time of the tracking before the sweep is unknown, the velocity is measured from the second tracking of the sweep on
+        self.reference_current = None
+        self.last_position = None
+        self.last_tracking_time = clock_time
+
+    # predicted lateral offset since the last tracking
+    def estimate_lateral_drift(self, clock_time):
+        if self.lateral_velocity is None:
+            return None
+        return self.lateral_velocity * (clock_time - self.last_tracking_time)
+
+    def decide(self, points_since_tracking, clock_time, read_current):
+        if points_since_tracking < self.min_interval:
+            return self.make_decision(False, "min_interval", points_since_tracking)
+        if points_since_tracking >= self.max_interval:
+            return self.make_decision(True, "max_interval", points_since_tracking)
+
+        current = read_current()
+        if self.reference_current is None or self.reference_current == 0:
+            # first check after the tracking, the reference for the following points
+            self.reference_current = current
+        current_drift = abs(current / self.reference_current - 1)
+        lateral_drift = self.estimate_lateral_drift(clock_time)
+
+        if current_drift > self.current_threshold:
+            return self.make_decision(True, "current_drift", points_since_tracking, current_drift, lateral_drift)
+        if lateral_drift is not None and lateral_drift > self.lateral_threshold:
+            return self.make_decision(True, "lateral_drift", points_since_tracking, current_drift, lateral_drift)
+        return self.make_decision(False, "below_threshold", points_since_tracking, current_drift, lateral_drift)
+
+    def tracked(self, clock_time, read_position):
+        if self.lateral_threshold is not None:
+            position = np.array(read_position())
+            if self.last_position is not None and clock_time > self.last_tracking_time:
+                # the tracking moved the tip by the drift since the previous tracking
+                self.lateral_velocity = float(np.linalg.norm(position - self.last_position) / (clock_time - self.last_tracking_time))
+                logger.info(f"Lateral drift velocity: {self.lateral_velocity * 1e12:.2f} pm/s")
+            self.last_position = position
+        self.last_tracking_time = clock_time
+        self.reference_current = None
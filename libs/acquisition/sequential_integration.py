@@ -0,0 +1,82 @@
+# sequential acquisition which stops integrating as soon as a tolerance decision is statistically clear
+import numpy as np
+
+
+class RunningStatistics:
+    """
+    Running mean and variance of a series of values (Welford's algorithm).
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def variance(self):
+        if self.count < 2:
+            return np.inf
+        return self.m2 / (self.count - 1)
+
+    # standard error of the mean
+    def standard_error(self):
+        return np.sqrt(self.variance() / self.count) if self.count > 0 else np.inf
+
+
+class SequentialAcquisition:
+    def __init__(self, burst_time, confidence_z = 3.0, min_bursts = 3):
+        """
+        Averages a signal in min_bursts short bursts and stops if the confidence interval of their mean lies completely
+        outside the tolerance band. Otherwise the remaining time is integrated in a single measurement, so an accepted
+        value has the same averaging time as a single long measurement and only costs min_bursts + 1 round-trips.
+        This is a single test of fixed size after min_bursts, not a test repeated after every burst: a value which
+        leaves the band only after more bursts is integrated for the full time.
+
+        Args:
+            - burst_time: The averaging time of a single burst in seconds.
+            - confidence_z: The half width of the confidence interval in standard errors.
+            - min_bursts: The minimum number of bursts before the variance estimate is trusted.
+        """
+        self.burst_time = burst_time
+        self.confidence_z = confidence_z
+        self.min_bursts = min_bursts
+
+    def acquire(self, measure_burst, integration_time, lower_bound, upper_bound):
+        """
+        Runs the sequential acquisition. The confidence interval is tested once, after min_bursts bursts.
+
+        Args:
+            - measure_burst: Function taking the averaging time and returning one averaged value.
+            - integration_time: The maximum total averaging time in seconds.
+            - lower_bound: The lower end of the tolerance band.
+            - upper_bound: The upper end of the tolerance band.
+
+        Returns
+            - mean (float): The mean of all bursts.
+            - acquisition_time (float): The total averaging time used in seconds.
+        """
+        statistics = RunningStatistics()
+        num_bursts = max(1, int(round(integration_time / self.burst_time)))
+        burst_time = integration_time / num_bursts
+
+        for _ in range(min(self.min_bursts, num_bursts)):
+            statistics.add(measure_burst(burst_time))
+
+        measured_time = statistics.count * burst_time
+        remaining_time = integration_time - measured_time
+        if remaining_time <= burst_time * 1e-9:
+            return statistics.mean, measured_time
+
+        half_width = self.confidence_z * statistics.standard_error()
+        if statistics.mean - half_width > upper_bound or statistics.mean + half_width < lower_bound:
+            # clearly outside the tolerance, the value is only needed for the next tuning step
+            return statistics.mean, measured_time
+
+        # the value may be accepted, integrate the rest in one measurement and weight both parts by their time
+        remaining_mean = measure_burst(remaining_time)
+        mean = (statistics.mean * measured_time + remaining_mean * remaining_time) / integration_time
+        return mean, integration_time
@@ -0,0 +1,64 @@
+# detection of the end of the step response after the AWG output was changed
+from collections import deque
+import numpy as np
+
+
+class SettleDetector:
+    def __init__(self, sample_interval = 0.005, window_size = 5, relative_threshold = 2e-3):
+        """
+        Samples a signal and declares it settled as soon as the last window_size samples are flat and quiet:
+            - flat: the change of a linear fit over the window is below relative_threshold * |mean|
+            - quiet: the standard deviation of the residuals is below relative_threshold * |mean|
+
+        Args:
+            - sample_interval: The time to wait between two samples in seconds (on top of the time to read a sample).
+            - window_size: The number of samples used for the decision.
+            - relative_threshold: The allowed drift and noise in the window relative to its mean.
+        """
+        self.sample_interval = sample_interval
+        self.window_size = window_size
+        self.relative_threshold = relative_threshold
+
+    # function to check if a window of samples is flat and quiet
+    def is_settled(self, times, values):
+        times = np.array(times)
+        values = np.array(values)
+        scale = self.relative_threshold * abs(np.mean(values))
+
+        slope, offset = np.polyfit(times - times[0], values, 1)
+        residuals = values - (slope * (times - times[0]) + offset)
+
+        drift = abs(slope) * (times[-1] - times[0])
+        return drift <= scale and np.std(residuals) <= scale
+
+    def wait_until_settled(self, read_value, clock, max_time):
+        """
+        Samples the signal until it is settled, but at most for max_time.
+
+        Args:
+            - read_value: Function returning one sample of the signal.
+            - clock: The clock used for waiting.
+            - max_time: The upper bound for the settling time in seconds.
+
+        Returns
+            - settle_time (float): The time until the signal was declared settled (or max_time) in seconds.
+            - settled (bool): False if max_time was reached before the signal settled.
+        """
+        start_time = clock.time()
+        times = deque(maxlen=self.window_size)
+        values = deque(maxlen=self.window_size)
+
+        while True:
+            values.append(read_value())
+            times.append(clock.time() - start_time)
+
+            if len(values) == self.window_size and self.is_settled(times, values):
+                return clock.time() - start_time, True
+
+            remaining_time = max_time - (clock.time() - start_time)
+            if remaining_time <= self.sample_interval:
+                # the fixed settling time is the upper bound
+                clock.sleep(remaining_time)
+                return clock.time() - start_time, False
+
+            clock.sleep(self.sample_interval)
@@ -0,0 +1,115 @@
+# strategies deciding the order in which the frequencies of a sweep are measured
+import numpy as np
+
+
+class SweepPlanner:
+    """
+    Base class for the sweep planners.
+
+    The planner only reorders the frequencies, the results are sorted back into the given order after the sweep.
+    A good order gives every starting amplitude guess a recorded neighbour with a similar amplitude.
+    """
+    name = "base"
+
+    def plan(self, frequencies, predict = None):
+        """
+        Returns the measurement order.
+
+        Args:
+            - frequencies (list of float): The frequencies to measure in Hz, in the given order.
+            - predict: Function returning the predicted compensation amplitude for a frequency (None if unknown), or None.
+
+        Returns
+            - order (list of int): The indices of the frequencies in the order they are measured.
+        """
+        raise NotImplementedError
+
+    def transition_sizes(self, frequencies, predict = None):
+        """
+        Size of the step from every planned point to the next one: the predicted amplitude change if all amplitudes
+        can be predicted, otherwise the distance in log(frequency). The step after the last point is 0.
+
+        A tracking costs least before a large step, the starting guess of the next point is poor there anyway.
+        """
+        values = None
+        if predict is not None:
+            values = [predict(frequency) for frequency in frequencies]
+            if any(value is None for value in values):
+                values = None
+        if values is None:
+            values = np.log(frequencies)
+        return list(np.abs(np.diff(values))) + [0.0]
+
+    # function to choose the point after which a due tracking is executed
+    def tracking_position(self, transitions, index, max_deferral):
+        """
+        Returns the position in [index, index + max_deferral] with the largest step to the next point.
+        With max_deferral = 0 the tracking is executed immediately.
+        """
+        last = min(index + max_deferral, len(transitions) - 1)
+        if last <= index:
+            return index
+        return index + int(np.argmax(transitions[index:last+1]))
+
+
+class GivenOrderPlanner(SweepPlanner):
+    name = "given"
+
+    # measures the frequencies in the given order
+    def plan(self, frequencies, predict = None):
+        return list(range(len(frequencies)))
+
+
+class SortedPlanner(SweepPlanner):
+    name = "sorted"
+
+    # measures the frequencies in ascending order, so the closest recorded frequency is always the previous one
+    def plan(self, frequencies, predict = None):
+        return [int(index) for index in np.argsort(frequencies, kind="stable")]
+
+
+class BisectionPlanner(SweepPlanner):
+    name = "bisection"
+
+    def plan(self, frequencies, predict = None):
+        """
+        Measures the lowest and the highest frequency first and then always the middle of the gaps between the
+        measured frequencies, coarse to fine (van der Corput order over the sorted frequencies). Every point after
+        the first two lies between two recorded points, so the guess can interpolate instead of extrapolate,
+        and an interrupted sweep still covers the whole range.
+        """
+        sorted_indices = [int(index) for index in np.argsort(frequencies, kind="stable")]
+        if len(sorted_indices) <= 2:
+            return sorted_indices
+
+        order = [sorted_indices[0], sorted_indices[-1]]
+        gaps = [(0, len(sorted_indices) - 1)]
+        # breadth first, so every refinement level covers the whole range before the next one starts
+        while len(gaps) > 0:
+            next_gaps = []
+            for low, high in gaps:
+                if high - low < 2:
+                    continue
+                middle = (low + high) // 2
+                order.append(sorted_indices[middle])
+                next_gaps += [(low, middle), (middle, high)]
+            gaps = next_gaps
+        return order
+
+
+class AmplitudePlanner(SweepPlanner):
+    name = "amplitude"
+
+    def plan(self, frequencies, predict = None):
+        """
+        Measures the frequencies in the order of their predicted compensation amplitude (e.g. from the old
+        compensation amplitudes), which minimises the total amplitude change between consecutive points.
+        Falls back to ascending frequencies if the amplitudes can not be predicted.
+        """
+        sorted_indices = [int(index) for index in np.argsort(frequencies, kind="stable")]
+        if predict is None:
+            return sorted_indices
+        predictions = [predict(frequencies[index]) for index in sorted_indices]
+        if any(prediction is None for prediction in predictions):
+            return sorted_indices
+        return [sorted_indices[position] for position in np.argsort(predictions, kind="stable")]
@@ -0,0 +1,113 @@
+# sweep mode which keeps the AWG output running and switches between preloaded waveform segments
+import threading
+
+from libs.awg.waveform_cache import WaveformCache
+
+SEGMENT_METHODS = ["upload_sine_segment", "select_segment", "delete_segment"] # segment API needed in addition to M8195A_transfer
+
+
+# function to get the segment methods the AWG is missing, empty if it supports the continuous sweep
+def missing_segment_methods(awg):
+    return [method for method in SEGMENT_METHODS if not callable(getattr(awg, method, None))]
+
+
+class ContinuousSweepAWG:
+    def __init__(self, awg, granularity_frequency, lockin_frequency, waveform_cache = None):
+        """
+        Outputs the sine waves from waveform segments of the AWG. The sine waves for all frequencies are uploaded
+        once as separate segments, and a frequency change only selects another segment and sets the amplitude,
+        without stopping the output.
+
+        The AWG has to provide, in addition to the M8195A_transfer methods used by the transfer finder:
+            - upload_sine_segment(segment_id, frequency, granularity_frequency, lockin_frequency): computes the
+              continuous sine wave (as configure_continuous_sine_wave) and stores it in the given segment
+            - select_segment(segment_id): switches the output to the segment without stopping it
+            - delete_segment(segment_id): frees the memory of the segment
+
+        Args:
+            - awg: The AWG object, e.g. M8195A_transfer.
+            - granularity_frequency: The granularity frequency used to generate the waveforms.
+            - lockin_frequency: The frequency of the lock-in amplifier.
+            - waveform_cache: The WaveformCache managing the segments of the AWG. A new cache is created if None.
+
+        All AWG commands are serialized with a lock, so waveforms can be uploaded from a background thread.
+        """
+        self.awg = awg
+        self.granularity_frequency = granularity_frequency
+        self.lockin_frequency = lockin_frequency
+        self.waveform_cache = waveform_cache if waveform_cache is not None else WaveformCache(awg)
+
+        self.selected_segment_id = None
+        self.amplitude = None
+        self.is_playing = False
+        self.lock = threading.RLock()
+        # a deleted segment id can be reused for another frequency, it has to be selected again
+        self.waveform_cache.eviction_listeners.append(self.segment_deleted)
+
+    # function to upload the waveforms for all frequencies
+    def preload(self, frequencies):
+        """
+        Uploads one segment per frequency, as far as the segment memory allows. Cached frequencies are skipped.
+        """
+        with self.lock:
+            self.waveform_cache.preload(frequencies, self.granularity_frequency, self.lockin_frequency)
+
+    def prefetch(self, frequency):
+        """
+        Uploads the waveform of a frequency without changing the output. The playing segment is never replaced.
+        The upload holds the lock like every other AWG command, so it never interleaves with the commands of the main
+        thread on the instrument session. It overlaps with the Nanonis acquisitions of the current frequency, which
+        do not need the AWG.
+        """
+        with self.lock:
+            in_use = self.selected_segment_id if self.is_playing else None
+            self.waveform_cache.get_segment(frequency, self.granularity_frequency, self.lockin_frequency, in_use=in_use)
+
+    # function called by the waveform cache when a segment is deleted
+    def segment_deleted(self, segment_id):
+        if segment_id == self.selected_segment_id:
+            self.selected_segment_id = None
+
+    def switch_to(self, frequency, amplitude):
+        """
+        Outputs the given frequency and amplitude. The output is started if it is not running yet, but never stopped.
+
+        Returns
+            - matched_amplitude (float): The amplitude applied by the AWG in Volts.
+        """
+        with self.lock:
+            # the playing segment must not be deleted to make space for the new one
+            in_use = self.selected_segment_id if self.is_playing else None
+            segment_id = self.waveform_cache.get_segment(frequency, self.granularity_frequency, self.lockin_frequency,
+                                                         in_use=in_use)
+
+            if segment_id != self.selected_segment_id:
+                if self.is_playing and self.amplitude is not None and amplitude < self.amplitude:
+                    # lower the output before the switch, the old (higher) amplitude must not play at the new frequency
+                    self.set_amplitude(amplitude)
+                self.awg.select_segment(segment_id)
+                self.selected_segment_id = segment_id
+
+            matched_amplitude = self.set_amplitude(amplitude)
+
+            if not self.is_playing:
+                self.awg.start_playing()
+                self.is_playing = True
+
+            return matched_amplitude
+
+    def set_amplitude(self, amplitude):
+        with self.lock:
+            matched_amplitude = self.awg.update_continuous_sine_wave_amplitude(new_amplitude=amplitude)
+            self.amplitude = matched_amplitude if matched_amplitude is not None else amplitude
+            return self.amplitude
+
+    # function to reduce the output to the minimum amplitude without stopping it, e.g. during atom tracking
+    def mute(self):
+        if self.is_playing:
+            self.set_amplitude(0.0)
+
+    def stop(self):
+        with self.lock:
+            self.awg.stop_playing()
+            self.is_playing = False
@@ -0,0 +1,55 @@
+# executor which prepares the waveform of the next frequency while the current one is measured
+from concurrent.futures import ThreadPoolExecutor
+
+import logging
+logger = logging.getLogger("pipelined_sweep")
+
+
+class PipelinedSweepExecutor:
+    def __init__(self, continuous_awg, clock):
+        """
+        Uploads the waveform of the next frequency in a background thread while the current frequency is measured.
+
+        The upload goes into a segment which is not playing (see ContinuousSweepAWG.prefetch), so the physical
+        output does not change until the sweep switches to the next frequency.
+
+        Args:
+            - continuous_awg: The ContinuousSweepAWG used for the output.
+            - clock: The clock of the measurement. Background work runs on its own timeline of a VirtualClock.
+        """
+        self.continuous_awg = continuous_awg
+        self.clock = clock
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = None # future of the running preparation
+
+    # function to prepare a frequency in the background
+    def prefetch(self, frequency):
+        self.wait()
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        start_time = self.clock.time()
+        self.pending = self.executor.submit(self.run_prefetch, frequency, start_time)
+
+    def run_prefetch(self, frequency, start_time):
+        self.clock.begin_timeline(start_time)
+        self.continuous_awg.prefetch(frequency)
+        return self.clock.time()
+
+    def wait(self):
+        """
+        Waits until the running preparation is done. Errors of the preparation are raised here.
+        """
+        if self.pending is None:
+            return
+        end_time = self.pending.result()
+        self.pending = None
+        self.clock.wait_until(end_time)
+
+    # function to wait for the running preparation and stop the background thread, a later prefetch starts a new one
+    def shutdown(self):
+        try:
+            self.wait()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
@@ -0,0 +1,142 @@
+# cache of the sine waveforms stored in the segment memory of the AWG
+from collections import OrderedDict
+import numpy as np
+
+import logging
+logger = logging.getLogger("waveform_cache")
+
+
+class WaveformCache:
+    def __init__(self, awg, memory_limit = 16e9, sample_rate = 64e9):
+        """
+        Keeps uploaded sine waveforms in the segment memory of the AWG, so repeated sweeps over the same
+        frequencies do not compute and upload them again.
+
+        A waveform only depends on (frequency, granularity_frequency, lockin_frequency). The amplitude is set
+        on the output channel and scales the stored waveform, so it is not part of the key.
+        If the memory limit is reached, the least recently used segments are deleted.
+
+        The cache should live as long as the AWG connection, e.g. one cache per AWG shared by all measurements.
+        The AWG has to provide upload_sine_segment(segment_id, frequency, granularity_frequency, lockin_frequency)
+        and delete_segment(segment_id).
+
+        Args:
+            - awg: The AWG object, e.g. M8195A_transfer.
+            - memory_limit: The number of samples available for the segments.
+            - sample_rate: The sample rate of the AWG, used to compute the length of a waveform.
+        """
+        self.awg = awg
+        self.memory_limit = memory_limit
+        self.sample_rate = sample_rate
+
+        self.segments = OrderedDict() # key -> (segment id, number of samples), ordered from least to most recently used
+        self.used_memory = 0
+        self.free_segment_ids = []
+        self.next_segment_id = 1 # segment ids start at 1
+        self.eviction_listeners = [] # functions called with the id of every deleted segment, e.g. to forget a selection
+
+        # statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uploaded_samples = 0
+
+    # key of a waveform
+    def make_key(self, frequency, granularity_frequency, lockin_frequency):
+        return (float(frequency), float(granularity_frequency), float(lockin_frequency))
+
+    # number of samples of a waveform that repeats seamlessly with the granularity frequency
+    def waveform_length(self, granularity_frequency):
+        return int(np.ceil(self.sample_rate / granularity_frequency))
+
+    def contains(self, frequency, granularity_frequency, lockin_frequency):
+        return self.make_key(frequency, granularity_frequency, lockin_frequency) in self.segments
+
+    def get_segment(self, frequency, granularity_frequency, lockin_frequency, in_use = None):
+        """
+        Returns the id of the segment holding the waveform, uploading it if it is not cached.
+
+        Args:
+            - frequency: The frequency of the sine wave in Hz.
+            - granularity_frequency: The granularity frequency of the waveform in Hz.
+            - lockin_frequency: The frequency of the lock-in amplifier in Hz.
+            - in_use: The id of a segment which must not be deleted, e.g. the one currently playing.
+
+        Returns
+            - segment_id (int)
+        """
+        key = self.make_key(frequency, granularity_frequency, lockin_frequency)
+
+        if key in self.segments:
+            self.hits += 1
+            self.segments.move_to_end(key)
+            return self.segments[key][0]
+
+        self.misses += 1
+        num_samples = self.waveform_length(granularity_frequency)
+        self.make_space(num_samples, in_use)
+
+        segment_id = self.allocate_segment_id()
+        self.awg.upload_sine_segment(segment_id=segment_id,
+                                     frequency=frequency,
+                                     granularity_frequency=granularity_frequency,
+                                     lockin_frequency=lockin_frequency)
+        self.segments[key] = (segment_id, num_samples)
+        self.used_memory += num_samples
+        self.uploaded_samples += num_samples
+        return segment_id
+
+    def preload(self, frequencies, granularity_frequency, lockin_frequency):
+        """
+        Uploads the waveforms as long as they fit into the free memory. Nothing is deleted for preloading.
+
+        Returns
+            - num_loaded (int): The number of waveforms available in the cache afterwards.
+        """
+        num_loaded = 0
+        num_samples = self.waveform_length(granularity_frequency)
+        for frequency in frequencies:
+            if not self.contains(frequency, granularity_frequency, lockin_frequency):
+                if self.used_memory + num_samples > self.memory_limit:
+                    logger.info(f"AWG segment memory full, {len(frequencies) - num_loaded} waveforms are uploaded on demand.")
+                    break
+                self.get_segment(frequency, granularity_frequency, lockin_frequency)
+            num_loaded += 1
+        return num_loaded
+
+    # function to delete the least recently used segments until the new waveform fits
+    def make_space(self, num_samples, in_use = None):
+        if num_samples > self.memory_limit:
+            raise ValueError(f"Waveform with {num_samples} samples does not fit into the AWG segment memory of {self.memory_limit} samples.")
+
+        while self.used_memory + num_samples > self.memory_limit:
+            victim = next((key for key, (segment_id, _) in self.segments.items() if segment_id != in_use), None)
+            if victim is None:
+                raise ValueError("Not enough AWG segment memory without deleting the segment in use.")
+
+            segment_id, victim_samples = self.segments.pop(victim)
+            self.awg.delete_segment(segment_id)
+            for listener in self.eviction_listeners:
+                listener(segment_id)
+            self.free_segment_ids.append(segment_id)
+            self.used_memory -= victim_samples
+            self.evictions += 1
+
+    def allocate_segment_id(self):
+        if len(self.free_segment_ids) > 0:
+            return self.free_segment_ids.pop()
+        segment_id = self.next_segment_id
+        self.next_segment_id += 1
+        return segment_id
+
+    def statistics(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups > 0 else None,
+            "evictions": self.evictions,
+            "uploaded_samples": self.uploaded_samples,
+            "cached_waveforms": len(self.segments),
+            "used_memory": self.used_memory,
+        }
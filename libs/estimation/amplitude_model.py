@@ -0,0 +1,128 @@
+# smooth model of the compensation amplitude vs. frequency, used to predict the starting amplitude of the tuning
+import bisect
+import numpy as np
+
+
+class AmplitudeModel:
+    def __init__(self):
+        """
+        Monotone piecewise cubic Hermite interpolation (PCHIP, Fritsch-Carlson slopes) of the compensation amplitude
+        over log(frequency). Between two points the curve stays within their amplitudes, so the prediction never
+        overshoots into amplitudes which were not needed anywhere. Outside the measured range the amplitude of the
+        closest end is held.
+
+        The slopes of PCHIP only depend on the neighbouring points, so the model is not fitted as a whole: a prediction
+        only evaluates the four points around the frequency (binary search), and adding a point is an insertion.
+
+        The uncertainty of a prediction combines
+            - the difference between the cubic and the linear interpolation (how much the shape matters here),
+            - the root mean square of the errors of the previous predictions (how well the model did so far),
+            - the end slope times the distance for extrapolated frequencies.
+        """
+        self.keys = [] # sorted log(frequency)
+        self.amplitudes = []
+        self.prediction_errors = [] # measured amplitude - predicted amplitude of every added point
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, frequency, amplitude):
+        """
+        Adds a measured point. The error of the prediction for this point is recorded for the uncertainty estimate.
+        A point at an already known frequency replaces the old amplitude.
+        """
+        prediction = self.predict(frequency)
+        if prediction is not None and prediction[1] is not None:
+            self.prediction_errors.append(float(amplitude) - prediction[0])
+        self.insert(np.log(frequency), float(amplitude))
+
+    # function to add points without recording prediction errors, e.g. the amplitudes of an old measurement
+    def extend(self, frequencies, amplitudes):
+        for frequency, amplitude in zip(frequencies, amplitudes):
+            self.insert(np.log(frequency), float(amplitude))
+
+    def insert(self, key, amplitude):
+        position = bisect.bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            self.amplitudes[position] = amplitude
+            return
+        self.keys.insert(position, key)
+        self.amplitudes.insert(position, amplitude)
+
+    # helper function to get the secant slope between point index and index + 1
+    def secant(self, index):
+        return (self.amplitudes[index+1] - self.amplitudes[index]) / (self.keys[index+1] - self.keys[index])
+
+    # helper function to get the PCHIP slope at point index
+    def slope(self, index):
+        last = len(self.keys) - 1
+        if last == 1:
+            return self.secant(0)
+
+        if index == 0 or index == last:
+            # shape preserving three point formula at the ends
+            if index == 0:
+                h0, h1 = self.keys[1] - self.keys[0], self.keys[2] - self.keys[1]
+                d0, d1 = self.secant(0), self.secant(1)
+            else:
+                h0, h1 = self.keys[last] - self.keys[last-1], self.keys[last-1] - self.keys[last-2]
+                d0, d1 = self.secant(last-1), self.secant(last-2)
+            slope = ((2 * h0 + h1) * d0 - h0 * d1) / (h0 + h1)
+            if np.sign(slope) != np.sign(d0):
+                return 0.0
+            if np.sign(d0) != np.sign(d1) and abs(slope) > 3 * abs(d0):
+                return 3 * d0
+            return slope
+
+        # weighted harmonic mean of the neighbouring secants, zero at local extrema
+        d0, d1 = self.secant(index-1), self.secant(index)
+        if d0 * d1 <= 0:
+            return 0.0
+        h0, h1 = self.keys[index] - self.keys[index-1], self.keys[index+1] - self.keys[index]
+        w0, w1 = 2 * h1 + h0, h1 + 2 * h0
+        return (w0 + w1) / (w0 / d0 + w1 / d1)
+
+    # root mean square of the previous prediction errors, None without any
+    def prediction_rmse(self):
+        if len(self.prediction_errors) == 0:
+            return None
+        return float(np.sqrt(np.mean(np.square(self.prediction_errors))))
+
+    def predict(self, frequency):
+        """
+        Predicts the compensation amplitude at the frequency.
+
+        Returns
+            - prediction (tuple): (amplitude, uncertainty) in Volts. The uncertainty is None with less than two points.
+                                  None if the model has no points.
+        """
+        if len(self.keys) == 0:
+            return None
+        if len(self.keys) == 1:
+            return self.amplitudes[0], None
+
+        key = np.log(frequency)
+        error_terms = []
+        rmse = self.prediction_rmse()
+        if rmse is not None:
+            error_terms.append(rmse)
+
+        last = len(self.keys) - 1
+        if key <= self.keys[0] or key >= self.keys[last]:
+            # hold the amplitude of the closest end, the end slope shows how far off this may be
+            index = 0 if key <= self.keys[0] else last
+            error_terms.append(abs(self.slope(index)) * abs(key - self.keys[index]))
+            return self.amplitudes[index], float(np.sqrt(np.sum(np.square(error_terms))))
+
+        # cubic Hermite polynomial between the bracketing points
+        index = bisect.bisect_right(self.keys, key) - 1
+        h = self.keys[index+1] - self.keys[index]
+        t = (key - self.keys[index]) / h
+        y0, y1 = self.amplitudes[index], self.amplitudes[index+1]
+        m0, m1 = self.slope(index) * h, self.slope(index+1) * h
+        amplitude = ((2 * t**3 - 3 * t**2 + 1) * y0 + (t**3 - 2 * t**2 + t) * m0
+                     + (-2 * t**3 + 3 * t**2) * y1 + (t**3 - t**2) * m1)
+
+        linear = y0 + t * (y1 - y0)
+        error_terms.append(abs(amplitude - linear))
+        return float(amplitude), float(np.sqrt(np.sum(np.square(error_terms))))
@@ -0,0 +1,86 @@
+# sorted index of frequencies for nearest-neighbour lookups of the compensation amplitudes
+import bisect
+import numpy as np
+
+
+class FrequencyIndex:
+    def __init__(self, log_distance = False):
+        """
+        Frequencies (and a value per frequency, e.g. the compensation amplitude) kept sorted, so nearest-neighbour
+        and tolerance lookups need a binary search (bisect) instead of a scan over all frequencies.
+
+        Args:
+            - log_distance: If true, distances are measured between log(frequency), so 1 MHz is as close to 2 MHz
+                            as 10 MHz is to 20 MHz. Otherwise the absolute difference in Hz is used.
+        """
+        self.log_distance = log_distance
+        self.keys = [] # sorted, log(frequency) with log_distance
+        self.frequencies = []
+        self.values = []
+
+    # helper function to convert a frequency to the sorted key
+    def key(self, frequency):
+        return float(np.log(frequency)) if self.log_distance else float(frequency)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, frequency, value):
+        key = self.key(frequency)
+        position = bisect.bisect_right(self.keys, key)
+        self.keys.insert(position, key)
+        self.frequencies.insert(position, float(frequency))
+        self.values.insert(position, value)
+
+    # function to add many frequencies at once, sorted once instead of inserted one by one
+    def extend(self, frequencies, values):
+        frequencies = [float(frequency) for frequency in frequencies]
+        entries = sorted(zip([self.key(frequency) for frequency in frequencies] + self.keys,
+                             frequencies + self.frequencies,
+                             list(values) + self.values), key=lambda entry: entry[0])
+        self.keys = [entry[0] for entry in entries]
+        self.frequencies = [entry[1] for entry in entries]
+        self.values = [entry[2] for entry in entries]
+
+    def nearest_k(self, frequency, k = 1):
+        """
+        Returns the k closest entries.
+
+        Args:
+            - frequency: The frequency to look up in Hz.
+            - k: The number of entries to return.
+
+        Returns
+            - entries (list of tuple): (frequency, value, distance) of the k closest entries, closest first.
+                                       The distance is in Hz, or in log(frequency) with log_distance.
+        """
+        key = self.key(frequency)
+        right = bisect.bisect_left(self.keys, key)
+        left = right - 1
+        entries = []
+        # merge the neighbours on both sides by distance
+        while len(entries) < k and (left >= 0 or right < len(self.keys)):
+            if right >= len(self.keys) or (left >= 0 and key - self.keys[left] <= self.keys[right] - key):
+                entries.append((self.frequencies[left], self.values[left], key - self.keys[left]))
+                left -= 1
+            else:
+                entries.append((self.frequencies[right], self.values[right], self.keys[right] - key))
+                right += 1
+        return entries
+
+    # function to get the closest entry, None if the index is empty
+    def nearest(self, frequency):
+        entries = self.nearest_k(frequency, 1)
+        return entries[0] if len(entries) > 0 else None
+
+    def match(self, frequency, rtol = 1e-9, atol = 0.0):
+        """
+        Returns the closest entry if its frequency agrees within the tolerance: |f - f_entry| <= atol + rtol * |f|.
+
+        Returns
+            - entry (tuple): (frequency, value, distance) of the matching entry, None if there is none.
+        """
+        entry = self.nearest(frequency)
+        if entry is None or abs(entry[0] - frequency) > atol + rtol * abs(frequency):
+            return None
+        return entry
@@ -0,0 +1,165 @@
+# asyncio client for the Nanonis TCP interface, which keeps several requests in flight on one connection
+import asyncio
+import collections
+
+from libs.pyNanonisMeasurements.nanonisTCP.nanonisTCP import nanonisTCP
+
+import logging
+logger = logging.getLogger("async_client")
+
+
+HEADER_SIZE = 40 # bytes, fixed by the Nanonis TCP protocol
+
+
+class AsyncNanonisClient:
+    def __init__(self, IP = "127.0.0.1", PORT = 6501, version = 99999999, max_outstanding = 16):
+        """
+        Nanonis TCP client for asyncio, using the message framing of nanonisTCP.
+
+        Nanonis processes the commands of one connection in order and answers them in order, so requests are
+        pipelined: they are written to the socket without waiting for the previous response, and the responses
+        are matched to the requests in FIFO order by a reader task. Commands sent with response=False set the
+        "send response" flag of the header to 0, so Nanonis does not answer them at all.
+
+        The client needs its own TCP port (Nanonis offers several, see File > Settings > TCP Programming Interface),
+        it cannot share the connection of a blocking nanonisTCP object.
+
+        Args:
+            - IP: The IP address of the Nanonis TCP interface.
+            - PORT: The port of the Nanonis TCP interface.
+            - version: The Nanonis RT Engine version, which selects the format of the error section. The default is the
+                       default of nanonisTCP (latest version, int32 error status). Versions up to 14000 use the legacy
+                       2-byte error status, which would read a current error section as "no error".
+            - max_outstanding: The maximum number of requests waiting for a response.
+        """
+        self.IP = IP
+        self.PORT = PORT
+        self.max_outstanding = max_outstanding
+
+        # framing helpers of nanonisTCP, without opening its blocking connection
+        self.framing = nanonisTCP.__new__(nanonisTCP)
+        self.framing.IP = IP
+        self.framing.PORT = PORT
+        self.framing.version = version
+
+        self.reader = None
+        self.writer = None
+        self.reader_task = None
+        self.pending = collections.deque() # futures of the sent requests, in the order of the responses
+        self.slots = None
+
+        # statistics
+        self.sent_requests = 0
+        self.unacknowledged_requests = 0
+
+    # function to create a client with the IP address and version of a blocking nanonisTCP connection
+    @classmethod
+    def for_connection(cls, connection, PORT, max_outstanding = 16):
+        return cls(IP=connection.IP, PORT=PORT, version=connection.version, max_outstanding=max_outstanding)
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.IP, self.PORT)
+        self.slots = asyncio.Semaphore(self.max_outstanding)
+        self.reader_task = asyncio.create_task(self.read_responses())
+
+    async def close(self):
+        if self.writer is None:
+            return
+        # wait for the outstanding responses before closing
+        if len(self.pending) > 0:
+            await asyncio.gather(*[future for future, _ in self.pending], return_exceptions=True)
+        self.reader_task.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+        self.writer = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    # task which reads the responses and resolves the futures of the requests in order
+    async def read_responses(self):
+        try:
+            while True:
+                header = await self.reader.readexactly(HEADER_SIZE)
+                body_size = self.framing.hex_to_int32(header[32:36])
+                body = await self.reader.readexactly(body_size)
+
+                future, error_index = self.pending.popleft()
+                if future.cancelled():
+                    continue
+                try:
+                    if error_index > -1:
+                        self.framing.check_error(body, error_index)
+                    future.set_result(body)
+                except Exception as e:
+                    future.set_exception(e)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            # the connection was closed, fail all outstanding requests
+            while len(self.pending) > 0:
+                future, _ = self.pending.popleft()
+                if not future.done():
+                    future.set_exception(ConnectionError(f"Nanonis connection closed: {e}"))
+
+    async def request(self, command_name, body_hex = "", body_size = 0, error_index = 0, response = True):
+        """
+        Sends a command and waits for its response body (if response is True).
+
+        Args:
+            - command_name: The Nanonis command, e.g. "Bias.Set".
+            - body_hex: The arguments as hex string, encoded with the nanonisTCP helpers.
+            - body_size: The size of the arguments in bytes.
+            - error_index: The index of the error section in the response body, -1 to skip the error check.
+            - response: If false, Nanonis is told not to answer and the function returns as soon as the command is sent.
+
+        Returns
+            - body (bytes): The response body, None without response.
+        """
+        message = bytes.fromhex(self.framing.make_header(command_name, body_size=body_size, resp=response) + body_hex)
+        self.sent_requests += 1
+
+        if not response:
+            self.unacknowledged_requests += 1
+            self.writer.write(message)
+            await self.writer.drain()
+            return None
+
+        async with self.slots:
+            future = asyncio.get_running_loop().create_future()
+            self.pending.append((future, error_index))
+            self.writer.write(message)
+            await self.writer.drain()
+            return await future
+
+    ############## commands used in the hot loops of the transfer finder ##############
+
+    async def bias_set(self, bias, response = True):
+        # nanonisTCP does not pad the hex string of small values
+        body_hex = self.framing.float32_to_hex(bias).zfill(8)
+        await self.request("Bias.Set", body_hex, body_size=4, error_index=0, response=response)
+
+    async def bias_get(self):
+        body = await self.request("Bias.Get", error_index=4)
+        return self.framing.hex_to_float32(body[0:4])
+
+    async def sig_val_get(self, signal_index, wait_for_newest_data = True):
+        body_hex = self.framing.to_hex(signal_index, 4) + self.framing.to_hex(int(wait_for_newest_data), 4)
+        body = await self.request("Signals.ValGet", body_hex, body_size=8, error_index=4)
+        return self.framing.hex_to_float32(body[0:4])
+
+    async def z_ctrl_on_off_set(self, on, response = True):
+        await self.request("ZCtrl.OnOffSet", self.framing.to_hex(int(on), 4), body_size=4, error_index=0, response=response)
+
+    async def z_ctrl_on_off_get(self):
+        body = await self.request("ZCtrl.OnOffGet", error_index=4)
+        return self.framing.hex_to_uint32(body[0:4])
+
+    # function to read several samples of a signal with all requests in flight at once
+    async def sig_val_get_burst(self, signal_index, num_samples, wait_for_newest_data = True):
+        return await asyncio.gather(*[self.sig_val_get(signal_index, wait_for_newest_data) for _ in range(num_samples)])
@@ -0,0 +1,248 @@
+# cache of the Nanonis state which is only changed by the measurement itself
+import contextlib
+import functools
+import inspect
+
+import logging
+logger = logging.getLogger("state_cache")
+
+
+# cached getters: getter -> (setter, write_through, hardware_state)
+# with write_through, the value written by the setter is returned by the getter without asking the hardware.
+# otherwise the hardware applies the value with a delay (e.g. the z-controller switches off after the switch-off delay),
+# so the getter is only cached once it reports the written value.
+# hardware_state marks values the hardware can change by itself, which expire after max_age. Settings expire after settings_max_age.
+CACHED_GETTERS = {
+    "Bias.Get": ("Bias.Set", True, True),
+    "ZCtl.OnOffGet": ("ZCtl.OnOffSet", False, True),
+    "ZCtl.SetpntGet": ("ZCtl.SetpntSet", True, False),
+    "ZCtl.SwitchOffDelayGet": ("ZCtl.SwitchOffDelaySet", True, False),
+    "ATrack.PropsGet": ("ATrack.PropsSet", True, False),
+}
+
+
+class NanonisStateCache:
+    def __init__(self, clock, max_age = 1.0, settings_max_age = None, coalesce_writes = False):
+        """
+        Read-through/write-through cache for Nanonis getters without arguments.
+
+        A getter is served from the last value read or written, as long as it is younger than max_age. The setter
+        belonging to a getter replaces (write-through) or invalidates the cached value. The max age bounds how long
+        a change by the hardware or the user (e.g. in the Nanonis GUI) can go unnoticed.
+
+        With coalesce_writes, the cached values are also used as the known hardware state: a setter call writing the
+        value which is already cached is elided. Inside batch(), consecutive writes of settings are collected and
+        repeated writes of the same setter are merged into the last one, before any other command is sent.
+
+        Args:
+            - clock: The clock used for the age of the values.
+            - max_age: The time after which a value the hardware can change (bias, z-controller state) is read again in seconds.
+            - settings_max_age: The same for settings only changed by the measurement (setpoint, switch-off delay, atom tracking settings). Never expire if None.
+            - coalesce_writes: If true, setter calls which would not change the known state are elided.
+        """
+        self.clock = clock
+        self.max_age = max_age
+        self.settings_max_age = settings_max_age
+        self.coalesce_writes = coalesce_writes
+
+        self.setters = {setter: (getter, write_through) for getter, (setter, write_through, _) in CACHED_GETTERS.items()}
+        self.values = {} # getter -> (value, time)
+        self.pending = {} # getter -> value written but not yet reported by the hardware
+        self.signatures = {} # setter -> signature, to convert the arguments into the value of the getter
+
+        # setter calls collected in a batch: setter -> (setter function, args, kwargs), in the order of their last call
+        self.is_batching = False
+        self.batched_writes = {}
+
+        # statistics per command
+        self.hits = {}
+        self.misses = {}
+        self.elided = {}
+        self.merged = {}
+
+    # function to get the max age of the cached value of a getter
+    def get_max_age(self, command_name):
+        _, _, hardware_state = CACHED_GETTERS[command_name]
+        return self.max_age if hardware_state else self.settings_max_age
+
+    # function to get a cached value which is not expired
+    def lookup(self, command_name):
+        if command_name not in self.values:
+            return False, None
+        value, read_time = self.values[command_name]
+        max_age = self.get_max_age(command_name)
+        if max_age is not None and self.clock.time() - read_time > max_age:
+            return False, None
+        return True, value
+
+    # function to convert the arguments of a setter into the value returned by its getter
+    def make_value(self, command_name, setter, args, kwargs):
+        if command_name not in self.signatures:
+            try:
+                self.signatures[command_name] = inspect.signature(setter)
+            except (TypeError, ValueError):
+                self.signatures[command_name] = None
+        try:
+            arguments = self.signatures[command_name].bind(*args, **kwargs).arguments
+        except (AttributeError, TypeError):
+            arguments = None
+        if arguments is None:
+            return args[0] if len(args) > 0 else next(iter(kwargs.values()), None)
+        if len(arguments) == 1:
+            return next(iter(arguments.values()))
+        return dict(arguments)
+
+    def is_cached_getter(self, command_name):
+        return command_name in CACHED_GETTERS
+
+    def is_cached_setter(self, command_name):
+        return command_name in self.setters
+
+    def get(self, command_name, getter, *args, **kwargs):
+        # only getters without arguments are cached
+        if len(args) > 0 or len(kwargs) > 0:
+            return getter(*args, **kwargs)
+
+        is_cached, value = self.lookup(command_name)
+        if is_cached:
+            self.hits[command_name] = self.hits.get(command_name, 0) + 1
+            return dict(value) if isinstance(value, dict) else value
+
+        self.misses[command_name] = self.misses.get(command_name, 0) + 1
+        value = getter()
+
+        if command_name in self.pending and self.pending[command_name] != value:
+            # the hardware has not applied the written value yet, ask again next time
+            self.values.pop(command_name, None)
+        else:
+            self.pending.pop(command_name, None)
+            self.values[command_name] = (value, self.clock.time())
+        return value
+
+    # function to check if the setter of a getter only changes a setting (and not the hardware state)
+    def is_setting(self, getter_name):
+        _, _, hardware_state = CACHED_GETTERS[getter_name]
+        return not hardware_state
+
+    def set(self, command_name, setter, *args, **kwargs):
+        getter_name, _ = self.setters[command_name]
+        if self.is_batching and self.is_setting(getter_name):
+            if command_name in self.batched_writes:
+                self.merged[command_name] = self.merged.get(command_name, 0) + 1
+                del self.batched_writes[command_name]
+            self.batched_writes[command_name] = (setter, args, kwargs)
+            return None
+
+        # the bias and z-controller state are never delayed, the collected writes are sent first
+        if len(self.batched_writes) > 0:
+            self.flush()
+        return self.write(command_name, setter, *args, **kwargs)
+
+    def write(self, command_name, setter, *args, **kwargs):
+        getter_name, write_through = self.setters[command_name]
+        value = self.make_value(command_name, setter, args, kwargs)
+
+        if self.coalesce_writes:
+            is_cached, known_value = self.lookup(getter_name)
+            if is_cached and known_value == value and getter_name not in self.pending:
+                self.elided[command_name] = self.elided.get(command_name, 0) + 1
+                return None
+
+        result = setter(*args, **kwargs)
+        if write_through:
+            self.values[getter_name] = (value, self.clock.time())
+        else:
+            self.values.pop(getter_name, None)
+            self.pending[getter_name] = value
+        return result
+
+    # function to send all collected setter calls
+    def flush(self):
+        batched_writes = self.batched_writes
+        self.batched_writes = {}
+        for command_name, (setter, args, kwargs) in batched_writes.items():
+            self.write(command_name, setter, *args, **kwargs)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Context manager collecting consecutive writes of settings (setpoint, switch-off delay, atom tracking settings).
+        Repeated writes of the same setter are merged into the last one. The collected writes are sent before any other
+        command and at the end of the block. Bias and z-controller commands are never delayed.
+        """
+        self.is_batching = True
+        try:
+            yield self
+        finally:
+            self.is_batching = False
+            self.flush()
+
+    # function to drop all cached values, e.g. after an error
+    def invalidate(self):
+        self.values = {}
+        self.pending = {}
+
+    def statistics(self):
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "elided_writes": dict(self.elided),
+            "merged_writes": dict(self.merged),
+            "avoided_round_trips": sum(self.hits.values()) + sum(self.elided.values()) + sum(self.merged.values()),
+        }
+
+
+class CachedNanonisModule:
+    def __init__(self, module_name, module, cache):
+        """
+        Wraps one Nanonis module (e.g. Bias) and routes the cached getters and their setters through the cache.
+        All other methods are passed through unchanged.
+        """
+        self.module_name = module_name
+        self.module = module
+        self.cache = cache
+
+    def __getattr__(self, name):
+        attribute = getattr(self.module, name)
+        command_name = f"{self.module_name}.{name}"
+
+        if self.cache.is_cached_setter(command_name):
+            return functools.partial(self.cache.set, command_name, attribute)
+
+        # any other command is sent after the collected writes
+        if len(self.cache.batched_writes) > 0:
+            self.cache.flush()
+
+        if self.cache.is_cached_getter(command_name):
+            return functools.partial(self.cache.get, command_name, attribute)
+        return attribute
+
+
+class CachedNanonisModules:
+    def __init__(self, nanonis_module, clock, max_age = 1.0, settings_max_age = None, coalesce_writes = False):
+        """
+        Drop-in replacement for NanonisModules which serves repeated getters from a NanonisStateCache.
+
+        Modules (attributes starting with an upper case letter, e.g. Bias, ZCtl) are wrapped, all other attributes
+        are taken from the wrapped object.
+
+        Args:
+            - nanonis_module: The NanonisModules object (or the simulated one).
+            - clock: The clock used for the age of the cached values.
+            - max_age: The time after which a cached value the hardware can change is read again in seconds.
+            - settings_max_age: The same for settings only changed by the measurement. Never expire if None.
+            - coalesce_writes: If true, setter calls which would not change the known state are elided.
+        """
+        self.nanonis_module = nanonis_module
+        self.state_cache = NanonisStateCache(clock, max_age=max_age, settings_max_age=settings_max_age,
+                                             coalesce_writes=coalesce_writes)
+        self.modules = {}
+
+    def __getattr__(self, name):
+        attribute = getattr(self.nanonis_module, name)
+        if not name[:1].isupper():
+            return attribute
+
+        if name not in self.modules:
+            self.modules[name] = CachedNanonisModule(name, attribute, self.state_cache)
+        return self.modules[name]
@@ -0,0 +1,171 @@
+# strategies to increase the bias (z-controller off) until the tunnel current reaches a setpoint
+import numpy as np
+
+import logging
+logger = logging.getLogger("bias_approach")
+
+
+class BiasApproach:
+    """
+    Base class for the bias approach strategies.
+
+    The strategy only decides which bias to apply next. Setting the bias (within the slew rate) and reading
+    the current is done by the callbacks passed to approach(), so the strategy can count the hardware calls.
+    """
+    name = "base"
+
+    def approach(self, set_bias, read_current, start_voltage, polarity, desired_current):
+        """
+        Increases the bias magnitude until the current reaches the desired current.
+
+        Args:
+            - set_bias: Function set_bias(new_voltage, current_voltage) moving the bias, returns the number of Bias.Set calls.
+            - read_current: Function returning the current in Amperes.
+            - start_voltage: The bias at the start of the approach in Volts.
+            - polarity: The sign of the bias to approach with (+1 or -1).
+            - desired_current: The current to reach in Amperes (magnitude).
+
+        Returns
+            - result (dict): The final voltage and current, the number of measurements and Bias.Set calls, and whether the approach converged.
+        """
+        raise NotImplementedError
+
+    def make_result(self, voltage, current, measurements, bias_set_calls, converged):
+        return {
+            "strategy": self.name,
+            "voltage": float(voltage),
+            "current": float(current),
+            "measurements": measurements,
+            "bias_set_calls": bias_set_calls,
+            "converged": bool(converged),
+        }
+
+
+class LinearBiasApproach(BiasApproach):
+    name = "linear"
+
+    def __init__(self, voltage_step, max_voltage = 10.0):
+        """
+        Steps the bias by a fixed voltage step and measures the current after every step.
+
+        Args:
+            - voltage_step: The voltage increment per step in Volts, e.g. slew_rate * communication_time.
+            - max_voltage: The largest bias magnitude to apply in Volts.
+        """
+        self.voltage_step = voltage_step
+        self.max_voltage = max_voltage
+
+    def approach(self, set_bias, read_current, start_voltage, polarity, desired_current):
+        voltage = start_voltage
+        current = abs(read_current())
+        measurements = 1
+        bias_set_calls = 0
+
+        while current < desired_current:
+            if abs(voltage + self.voltage_step * polarity) > self.max_voltage:
+                logger.warning(f"Bias limit of {self.max_voltage} V reached before the current reached {desired_current} A.")
+                return self.make_result(voltage, current, measurements, bias_set_calls, False)
+
+            new_voltage = voltage + self.voltage_step * polarity
+            bias_set_calls += set_bias(new_voltage, voltage)
+            voltage = new_voltage
+            current = abs(read_current())
+            measurements += 1
+
+        return self.make_result(voltage, current, measurements, bias_set_calls, True)
+
+
+class GallopingBiasApproach(BiasApproach):
+    name = "galloping"
+
+    def __init__(self, initial_step = 1e-3, growth_factor = 2.0, current_tolerance = 0.2,
+                 max_voltage = 10.0, max_measurements = 50):
+        """
+        Exponential (galloping) search on the bias magnitude followed by bisection.
+
+        The tunnel current grows exponentially with the bias, I ~ exp(|V| / V_0), so ln(I) is close to linear in |V|
+        and its slope decreases towards higher bias. A secant through the last two measurements in ln(I) therefore
+        underestimates the bias needed for a current, which makes it a safe jump. Steps are:
+            - galloping: the step grows by growth_factor after every measurement below the desired current,
+              but never jumps past the bias predicted by the ln(I) secant for the middle of the accepted band
+            - bisection: as soon as a measurement is above the accepted band, the bracket between the last
+              bias below and the bias above is bisected
+        The approach stops as soon as the current is in [desired_current, desired_current * (1 + current_tolerance)],
+        which takes O(log) measurements instead of one per voltage step. As in the linear approach, nothing is changed
+        if the current already reaches the desired current at the start.
+
+        Args:
+            - initial_step: The first bias step in Volts.
+            - growth_factor: The factor to increase the step by after every measurement below the desired current.
+            - current_tolerance: The accepted relative overshoot of the current above the desired current.
+            - max_voltage: The largest bias magnitude to apply in Volts.
+            - max_measurements: The maximum number of current measurements, to avoid infinite loops.
+        """
+        self.initial_step = initial_step
+        self.growth_factor = growth_factor
+        self.current_tolerance = current_tolerance
+        self.max_voltage = max_voltage
+        self.max_measurements = max_measurements
+
+    # function to predict the bias magnitude for the target current from the last two points below the target
+    def exponential_estimate(self, points, target_current):
+        if len(points) < 2:
+            return None
+        (v_previous, i_previous), (v_last, i_last) = points[-2], points[-1]
+        if i_previous <= 0 or i_last <= i_previous or v_last <= v_previous:
+            return None
+
+        log_slope = np.log(i_last / i_previous) / (v_last - v_previous)
+        return v_last + np.log(target_current / i_last) / log_slope
+
+    def approach(self, set_bias, read_current, start_voltage, polarity, desired_current):
+        upper_current = desired_current * (1 + self.current_tolerance)
+        target_current = desired_current * np.sqrt(1 + self.current_tolerance) # middle of the band in ln(I)
+
+        # all voltages are bias magnitudes in the direction of the polarity
+        voltage = start_voltage * polarity
+        current = abs(read_current())
+        measurements = 1
+        bias_set_calls = 0
+
+        # the bias is only increased, a current above the desired current is already reached
+        if current >= desired_current:
+            return self.make_result(voltage * polarity, current, measurements, bias_set_calls, True)
+
+        below = [(voltage, current)] # points (voltage, current) below the desired current, in increasing voltage
+        above = None # lowest point above the accepted band
+
+        step = self.initial_step
+        while not (desired_current <= current <= upper_current):
+            if measurements >= self.max_measurements:
+                logger.warning(f"Bias approach stopped after {measurements} measurements at {voltage * polarity} V, {current} A.")
+                return self.make_result(voltage * polarity, current, measurements, bias_set_calls, False)
+
+            if above is None:
+                # galloping phase
+                new_voltage = voltage + step
+                estimate = self.exponential_estimate(below, target_current)
+                if estimate is not None and voltage < estimate < new_voltage:
+                    new_voltage = estimate
+                step *= self.growth_factor
+
+                if new_voltage > self.max_voltage:
+                    if voltage >= self.max_voltage:
+                        logger.warning(f"Bias limit of {self.max_voltage} V reached before the current reached {desired_current} A.")
+                        return self.make_result(voltage * polarity, current, measurements, bias_set_calls, False)
+                    new_voltage = self.max_voltage
+            else:
+                # bisection phase
+                new_voltage = (below[-1][0] + above[0]) / 2
+
+            bias_set_calls += set_bias(new_voltage * polarity, voltage * polarity)
+            voltage = new_voltage
+            current = abs(read_current())
+            measurements += 1
+
+            if current < desired_current:
+                below.append((voltage, current))
+            elif current > upper_current:
+                above = (voltage, current)
+
+        return self.make_result(voltage * polarity, current, measurements, bias_set_calls, True)
@@ -26,6 +26,7 @@ class PIController:
 
     def reset(self):
         self.integral = 0.0
+        self.last_error = 0.0
         self.V_out = 0.0
 
     def update(self, I_ref, I_meas):
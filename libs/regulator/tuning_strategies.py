@@ -0,0 +1,133 @@
+# strategies to tune the AWG amplitude until the measured Irec matches the reference Irec
+import numpy as np
+
+
+class TuningStrategy:
+    """
+    Base class for the amplitude tuning strategies.
+
+    The transfer finder calls start() once per frequency and then next_amplitude() after every measurement
+    that is outside the tolerance, until the tolerance or the maximum number of iterations is reached.
+    """
+    name = "base"
+
+    def start(self, reference_irec, starting_amplitude, baseline_irec = None):
+        """
+        Resets the strategy for a new frequency.
+
+        Args:
+            - reference_irec: The Irec value to reach in Amperes.
+            - starting_amplitude: The first amplitude applied by the AWG in Volts.
+            - baseline_irec: The Irec value without AWG output in Amperes, None if unknown.
+        """
+        raise NotImplementedError
+
+    def next_amplitude(self, amplitude, irec):
+        """
+        Returns the next amplitude to apply given the amplitude applied last and the Irec measured with it.
+        """
+        raise NotImplementedError
+
+
+class PITuningStrategy(TuningStrategy):
+    name = "pi"
+
+    def __init__(self, controller):
+        """
+        Tuning with the PI controller, updated once per measurement.
+
+        Args:
+            - controller: The PIController to use. Its time step should match the time of one tuning iteration.
+        """
+        self.controller = controller
+        self.reference_irec = None
+
+    def start(self, reference_irec, starting_amplitude, baseline_irec = None):
+        self.reference_irec = reference_irec
+        self.controller.reset()
+
+    def next_amplitude(self, amplitude, irec):
+        return self.controller.update(I_ref=self.reference_irec, I_meas=irec)
+
+
+class SecantTuningStrategy(TuningStrategy):
+    name = "secant"
+
+    def __init__(self, V_min = 0.0, V_max = 1.0, first_step_factor = 1.2):
+        """
+        Root finding on the rectification model Irec(a) = I_0 + k * a^2, which is monotonic in the amplitude a.
+
+        The strategy works on u = a^2, in which the model is linear:
+            - with one measurement and a known baseline I_0, k is estimated from that point (Newton step on the model)
+            - with two or more measurements, a secant through the last two points is used
+        Every measurement is kept to bracket the solution. If a step leaves the bracket (e.g. due to noise),
+        the bracket is bisected instead, so the tuning always converges.
+
+        Args:
+            - V_min: The minimum amplitude in Volts.
+            - V_max: The maximum amplitude in Volts.
+            - first_step_factor: The factor to change the amplitude by if no model estimate is possible.
+        """
+        self.V_min = V_min
+        self.V_max = V_max
+        self.first_step_factor = first_step_factor
+
+        self.reference_irec = None
+        self.baseline_irec = None
+        self.history = [] # list of tuples (u, irec)
+
+    def start(self, reference_irec, starting_amplitude, baseline_irec = None):
+        self.reference_irec = reference_irec
+        self.baseline_irec = baseline_irec
+        self.history = []
+
+    # function to find the closest measured points below and above the reference
+    def bracket(self):
+        below = [u for u, irec in self.history if irec < self.reference_irec]
+        above = [u for u, irec in self.history if irec > self.reference_irec]
+        lower_u = max(below) if len(below) > 0 else None
+        upper_u = min(above) if len(above) > 0 else None
+        return lower_u, upper_u
+
+    # function to estimate u for the reference Irec from the model
+    def model_estimate(self):
+        u_last, irec_last = self.history[-1]
+
+        # secant through the last two distinct points
+        for u_previous, irec_previous in reversed(self.history[:-1]):
+            if u_previous != u_last:
+                slope = (irec_last - irec_previous) / (u_last - u_previous)
+                if slope > 0:
+                    return u_last + (self.reference_irec - irec_last) / slope
+                return None
+
+        # newton step on the model through the baseline
+        if self.baseline_irec is not None and u_last > 0:
+            slope = (irec_last - self.baseline_irec) / u_last
+            if slope > 0:
+                return (self.reference_irec - self.baseline_irec) / slope
+
+        return None
+
+    def next_amplitude(self, amplitude, irec):
+        self.history.append((amplitude**2, irec))
+
+        u_next = self.model_estimate()
+        lower_u, upper_u = self.bracket()
+
+        if u_next is None:
+            # no usable model yet, step in the direction of the reference
+            factor = self.first_step_factor if irec < self.reference_irec else 1 / self.first_step_factor
+            u_next = (amplitude * factor)**2
+
+        # safeguard: stay strictly inside the bracket, bisect if the estimate leaves it
+        if lower_u is not None and upper_u is not None:
+            if not (lower_u < u_next < upper_u):
+                u_next = (lower_u + upper_u) / 2
+        elif lower_u is not None and u_next <= lower_u:
+            u_next = (np.sqrt(lower_u) * self.first_step_factor)**2
+        elif upper_u is not None and u_next >= upper_u:
+            u_next = (np.sqrt(upper_u) / self.first_step_factor)**2
+
+        next_amplitude = np.sqrt(max(u_next, 0.0))
+        return float(min(self.V_max, max(self.V_min, next_amplitude)))
@@ -0,0 +1,211 @@
+# physical model of the tip/sample junction and the AWG line used by the simulated backend
+import numpy as np
+
+from libs.timing.clock import RealClock
+
+
+class STMPlantModel:
+    def __init__(self,
+                 bias = 0.5,
+                 current_setpoint = 100e-12,
+                 iv_voltage_scale = 0.5,
+                 transmission = None,
+                 transmission_cutoff_frequency = 5e7,
+                 transmission_ripple = 0.1,
+                 cable_delay = 5e-9,
+                 awg_settling_time_constant = 0.01,
+                 current_noise = 0.2e-12,
+                 noise_bandwidth = 1e3,
+                 conductance_drift_rate = 0.0,
+                 xy_drift_rate = (0.0, 0.0),
+                 lateral_decay_length = 1e-10,
+                 decay_constant = 1e10,
+                 num_phase_samples = 64,
+                 seed = None,
+                 clock = None,
+                 ):
+        """
+        Model of the STM junction driven by the bias voltage and the AWG output.
+
+        The tunnelling current follows I(V) = g * sign(V) * (exp(|V|/V0) - 1), where g is the junction conductance
+        (set by the tip height) and V0 the I-V voltage scale. With the AWG playing, the sine with amplitude
+        a = A_awg * T(f) at the junction is added to the bias, and the current averaged over one period is reported.
+        The non-linearity of the I-V curve makes this average grow monotonically with the amplitude (rectification),
+        which is the quantity the transfer finder tunes against the reference.
+
+        Args:
+            - bias: The initial bias voltage in Volts.
+            - current_setpoint: The initial z-controller setpoint in Amperes.
+            - iv_voltage_scale: The voltage scale V0 of the exponential I-V relation in Volts.
+            - transmission: Optional callable f -> T(f) replacing the built-in line model.
+            - transmission_cutoff_frequency: The -3 dB frequency of the built-in low-pass line model in Hz.
+            - transmission_ripple: The relative ripple caused by reflections on the line.
+            - cable_delay: The round-trip delay of the reflections in seconds (sets the ripple period).
+            - awg_settling_time_constant: The time constant in seconds with which the amplitude at the junction follows a change of the AWG output.
+            - current_noise: The standard deviation of a single current sample in Amperes.
+            - noise_bandwidth: The bandwidth of the current noise in Hz, used to scale the noise with the averaging time.
+            - conductance_drift_rate: The relative drift of the conductance per second while the z-controller is off.
+            - xy_drift_rate: The lateral drift of the sample in m/s (x, y).
+            - lateral_decay_length: The length scale in m on which the current decays with the lateral tip offset.
+            - decay_constant: The vertical decay constant kappa in 1/m, used to convert the conductance to a height.
+            - num_phase_samples: The number of phase samples used to average the current over one AWG period.
+            - seed: Seed for the random number generator.
+            - clock: The clock defining the time of the simulation (RealClock if None), shared with the simulated devices.
+        """
+        self.iv_voltage_scale = iv_voltage_scale
+        self.custom_transmission = transmission
+        self.transmission_cutoff_frequency = transmission_cutoff_frequency
+        self.transmission_ripple = transmission_ripple
+        self.cable_delay = cable_delay
+        self.awg_settling_time_constant = awg_settling_time_constant
+        self.current_noise = current_noise
+        self.noise_bandwidth = noise_bandwidth
+        self.conductance_drift_rate = conductance_drift_rate
+        self.xy_drift_rate = np.array(xy_drift_rate, dtype=float)
+        self.lateral_decay_length = lateral_decay_length
+        self.decay_constant = decay_constant
+        self.phases = 2 * np.pi * np.arange(num_phase_samples) / num_phase_samples
+        self.rng = np.random.default_rng(seed)
+        self.clock = clock if clock is not None else RealClock()
+
+        # junction state
+        self.start_time = self.clock.time()
+        self.bias = bias
+        self.current_setpoint = current_setpoint
+        self.z_controller_on = True
+        self.z_switch_off_time = None
+        self.z_switch_off_delay = 0.0
+        self.frozen_conductance = None
+
+        # lateral state (tip follows the atom only while atom tracking is running)
+        self.tip_xy = np.zeros(2)
+        self.tracking_on = False
+
+        # AWG output state
+        self.awg_playing = False
+        self.awg_frequency = None
+        self.awg_amplitude = 0.0
+        self.awg_step_time = 0.0
+        self.awg_step_start_amplitude = 0.0
+
+    # function to get the time since the creation of the plant
+    def now(self):
+        return self.clock.time() - self.start_time
+
+    # line model between AWG and junction
+    def transmission(self, frequency):
+        """
+        Returns the amplitude transmission T(f) from the AWG output to the junction.
+        """
+        if self.custom_transmission is not None:
+            return self.custom_transmission(frequency)
+
+        low_pass = 1 / np.sqrt(1 + (frequency / self.transmission_cutoff_frequency)**2)
+        ripple = 1 + self.transmission_ripple * np.cos(2 * np.pi * frequency * self.cable_delay)
+        return low_pass * ripple / (1 + self.transmission_ripple)
+
+    # normalized I-V characteristic
+    def iv_curve(self, voltage):
+        return np.sign(voltage) * np.expm1(np.abs(voltage) / self.iv_voltage_scale)
+
+    # amplitude of the sine at the junction once the output has settled
+    def target_stm_amplitude(self):
+        if not self.awg_playing or self.awg_frequency is None:
+            return 0.0
+        return self.awg_amplitude * self.transmission(self.awg_frequency)
+
+    # amplitude of the sine at the junction, following output changes with the settling time constant
+    def stm_amplitude(self):
+        target = self.target_stm_amplitude()
+        if self.awg_settling_time_constant <= 0:
+            return target
+        decay = np.exp(-(self.now() - self.awg_step_time) / self.awg_settling_time_constant)
+        return target + (self.awg_step_start_amplitude - target) * decay
+
+    # function to change the AWG output, starting a new settling transient
+    def set_awg_output(self, playing = None, frequency = None, amplitude = None):
+        self.awg_step_start_amplitude = self.stm_amplitude()
+        self.awg_step_time = self.now()
+
+        if playing is not None:
+            self.awg_playing = playing
+        if frequency is not None:
+            self.awg_frequency = frequency
+        if amplitude is not None:
+            self.awg_amplitude = amplitude
+
+    # conductance which reproduces the setpoint at the current bias (z-controller on)
+    def conductance_for_setpoint(self):
+        iv = self.iv_curve(self.bias)
+        if iv == 0:
+            return 0.0
+        return self.current_setpoint / iv
+
+    # state of the z-controller, including the switch off delay
+    def is_z_controller_on(self):
+        if self.z_controller_on:
+            return True
+        # nanonis averages the height for the switch off delay before actually switching off
+        return self.now() - self.z_switch_off_time < self.z_switch_off_delay
+
+    def set_z_controller(self, on, switch_off_delay):
+        if on:
+            self.z_controller_on = True
+            self.frozen_conductance = None
+            return
+        if self.z_controller_on:
+            self.z_controller_on = False
+            self.z_switch_off_time = self.now()
+            self.z_switch_off_delay = switch_off_delay
+            self.frozen_conductance = self.conductance_for_setpoint()
+
+    # junction conductance, including vertical and lateral drift
+    def conductance(self):
+        if self.is_z_controller_on():
+            return self.conductance_for_setpoint()
+
+        elapsed = self.now() - self.z_switch_off_time - self.z_switch_off_delay
+        conductance = self.frozen_conductance * np.exp(self.conductance_drift_rate * elapsed)
+
+        lateral_offset = np.linalg.norm(self.lateral_offset())
+        return conductance * np.exp(-(lateral_offset / self.lateral_decay_length)**2)
+
+    # lateral offset between tip and atom
+    def atom_xy(self):
+        return self.xy_drift_rate * self.now()
+
+    def lateral_offset(self):
+        if self.tracking_on:
+            self.tip_xy = self.atom_xy()
+        return self.atom_xy() - self.tip_xy
+
+    def set_tracking(self, on):
+        # the tip is re-centered on the atom while tracking is running
+        self.tip_xy = self.atom_xy()
+        self.tracking_on = on
+
+    # noiseless current averaged over one AWG period
+    def mean_current(self):
+        amplitude = self.stm_amplitude()
+        if amplitude == 0:
+            return self.conductance() * self.iv_curve(self.bias)
+        voltages = self.bias + amplitude * np.sin(self.phases)
+        return self.conductance() * np.mean(self.iv_curve(voltages))
+
+    # measured current including noise
+    def measure_current(self, averaging_time = 0.0):
+        """
+        Returns the current in Amperes averaged over the specified time.
+
+        Args:
+            - averaging_time: The averaging time in seconds. 0 returns a single sample.
+        """
+        noise = self.current_noise / np.sqrt(1 + averaging_time * self.noise_bandwidth)
+        return float(self.mean_current() + self.rng.normal(0.0, noise))
+
+    # tip height relative to the height at which the conductance is 1 A/V
+    def z_position(self):
+        conductance = self.conductance()
+        if conductance <= 0:
+            return 0.0
+        return float(-np.log(conductance) / (2 * self.decay_constant))
@@ -0,0 +1,118 @@
+# drop-in replacement for M8195A_transfer which drives the simulated STM
+import numpy as np
+
+
+class SimulatedAWG:
+    def __init__(self, plant,
+                 command_latency = 5e-3,
+                 sample_rate = 64e9,
+                 upload_rate = 1e8,
+                 amplitude_resolution = 1e-3,
+                 min_amplitude = 0.0,
+                 max_amplitude = 1.0,
+                 ):
+        """
+        Simulated AWG exposing the methods of M8195A_transfer used by the transfer finder.
+
+        Every SCPI command sleeps on the clock of the plant for command_latency and is counted. Configuring a waveform additionally
+        takes the time to upload all samples of the waveform at upload_rate.
+
+        Args:
+            - plant: The STMPlantModel which receives the AWG output.
+            - command_latency: The round-trip time of a single command in seconds.
+            - sample_rate: The sample rate of the AWG in samples per second.
+            - upload_rate: The number of waveform samples uploaded per second.
+            - amplitude_resolution: The resolution of the output amplitude in Volts.
+            - min_amplitude: The minimum output amplitude in Volts.
+            - max_amplitude: The maximum output amplitude in Volts.
+        """
+        self.plant = plant
+        self.command_latency = command_latency
+        self.sample_rate = sample_rate
+        self.upload_rate = upload_rate
+        self.amplitude_resolution = amplitude_resolution
+        self.min_amplitude = min_amplitude
+        self.max_amplitude = max_amplitude
+
+        self.frequency = None
+        self.amplitude = 0.0
+        self.num_samples = 0
+        self.segments = {} # segment id -> (frequency, number of samples)
+
+        # number of calls per command, e.g. {"start_playing": 10}
+        self.call_counts = {}
+
+    # function to simulate one command round-trip
+    def command(self, command_name, extra_time = 0.0):
+        self.call_counts[command_name] = self.call_counts.get(command_name, 0) + 1
+        self.plant.clock.sleep(self.command_latency + extra_time)
+
+    def total_calls(self):
+        return sum(self.call_counts.values())
+
+    def reset_call_counts(self):
+        self.call_counts = {}
+
+    # function to clip an amplitude to the resolution and range of the AWG
+    def match_amplitude(self, amplitude):
+        amplitude = round(amplitude / self.amplitude_resolution) * self.amplitude_resolution
+        return float(min(self.max_amplitude, max(self.min_amplitude, amplitude)))
+
+    # number of samples of a waveform that repeats seamlessly with the granularity frequency
+    def waveform_length(self, granularity_frequency):
+        return int(np.ceil(self.sample_rate / granularity_frequency))
+
+    def configure_continuous_sine_wave(self, frequency, granularity_frequency, lockin_frequency, starting_amplitude):
+        """
+        Computes and uploads a continuous sine wave. The output is not started.
+
+        Returns
+            - matched_amplitude (float): The amplitude applied by the AWG in Volts.
+        """
+        self.num_samples = self.waveform_length(granularity_frequency)
+        self.command("configure_continuous_sine_wave", extra_time=self.num_samples / self.upload_rate)
+
+        self.frequency = frequency
+        self.amplitude = self.match_amplitude(starting_amplitude)
+        self.plant.set_awg_output(frequency=self.frequency, amplitude=self.amplitude)
+        return self.amplitude
+
+    def update_continuous_sine_wave_amplitude(self, new_amplitude):
+        """
+        Changes the amplitude of the configured sine wave.
+
+        Returns
+            - matched_amplitude (float): The amplitude applied by the AWG in Volts.
+        """
+        self.command("update_continuous_sine_wave_amplitude")
+        self.amplitude = self.match_amplitude(new_amplitude)
+        self.plant.set_awg_output(amplitude=self.amplitude)
+        return self.amplitude
+
+    def upload_sine_segment(self, segment_id, frequency, granularity_frequency, lockin_frequency):
+        """
+        Computes a continuous sine wave and stores it in the given segment without changing the output.
+        """
+        num_samples = self.waveform_length(granularity_frequency)
+        self.command("upload_sine_segment", extra_time=num_samples / self.upload_rate)
+        self.segments[segment_id] = (frequency, num_samples)
+
+    def delete_segment(self, segment_id):
+        self.command("delete_segment")
+        del self.segments[segment_id]
+
+    def select_segment(self, segment_id):
+        """
+        Switches the output to a previously uploaded segment, the output keeps running.
+        """
+        self.command("select_segment")
+        self.frequency, self.num_samples = self.segments[segment_id]
+        self.plant.set_awg_output(frequency=self.frequency)
+
+    def start_playing(self):
+        self.command("start_playing")
+        self.plant.set_awg_output(playing=True)
+
+    def stop_playing(self):
+        self.command("stop_playing")
+        self.plant.set_awg_output(playing=False)
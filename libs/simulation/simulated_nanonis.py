@@ -0,0 +1,221 @@
+# drop-in replacement for NanonisModules which talks to a simulated STM instead of the Nanonis TCP server
+import numpy as np
+
+from libs.simulation.plant_model import STMPlantModel
+
+
+class SimulatedNanonisModules:
+    def __init__(self, plant = None,
+                 command_latency = 1e-3,
+                 latency_jitter = 0.2e-3,
+                 session_path = "measurements",
+                 signal_names = None,
+                 seed = None,
+                 ):
+        """
+        Simulated Nanonis system exposing the modules and methods used by the transfer finder
+        (Bias, ZCtl, Sig, ATrack, FolMe, Util).
+
+        Every command sleeps on the clock of the plant for one TCP round-trip (command_latency plus a random jitter) and is counted,
+        so that the timing and the number of hardware calls of a measurement can be profiled without an STM.
+
+        Args:
+            - plant: The STMPlantModel to simulate. A default plant is created if None.
+            - command_latency: The mean round-trip time of a single command in seconds.
+            - latency_jitter: The standard deviation of the round-trip time in seconds.
+            - session_path: The path returned by Util.SessionPathGet.
+            - signal_names: The names of the signals, their position is the signal index used by Sig.ValGet.
+            - seed: Seed for the random number generator of the latency jitter.
+        """
+        self.plant = plant if plant is not None else STMPlantModel(seed=seed)
+        self.command_latency = command_latency
+        self.latency_jitter = latency_jitter
+        self.session_path = session_path
+        self.signal_names = signal_names if signal_names is not None else [
+            "Bias (V)",
+            "Current (A)",
+            "Z (m)",
+            "Input 1 (V)",
+            "Input 2 (V)",
+        ]
+        self.rng = np.random.default_rng(seed)
+
+        # number of calls per command, e.g. {"Bias.Set": 10}
+        self.call_counts = {}
+
+        self.Bias = SimulatedBias(self)
+        self.ZCtl = SimulatedZCtl(self)
+        self.Sig = SimulatedSig(self)
+        self.ATrack = SimulatedATrack(self)
+        self.FolMe = SimulatedFolMe(self)
+        self.Util = SimulatedUtil(self)
+
+    # function to simulate one TCP round-trip
+    def command(self, command_name, extra_time = 0.0):
+        """
+        Counts the command and waits for its round-trip time.
+
+        Args:
+            - command_name: The name of the command, e.g. "Bias.Set".
+            - extra_time: Additional time the command blocks for, e.g. an averaging time.
+        """
+        self.call_counts[command_name] = self.call_counts.get(command_name, 0) + 1
+
+        latency = max(0.0, self.rng.normal(self.command_latency, self.latency_jitter))
+        self.plant.clock.sleep(latency + extra_time)
+
+    def total_calls(self):
+        return sum(self.call_counts.values())
+
+    def reset_call_counts(self):
+        self.call_counts = {}
+
+    # function to read a signal by name
+    def read_signal(self, name, averaging_time = 0.0):
+        plant = self.plant
+        if name == "Current (A)":
+            return plant.measure_current(averaging_time)
+        if name == "Bias (V)":
+            return float(plant.bias)
+        if name == "Z (m)":
+            return plant.z_position()
+        if name.startswith("Input"):
+            # inputs monitor the AWG amplitude at the junction
+            noise = 1e-3 / np.sqrt(1 + averaging_time * plant.noise_bandwidth)
+            return float(plant.stm_amplitude() + plant.rng.normal(0.0, noise))
+        return None
+
+
+class SimulatedBias:
+    def __init__(self, nanonis):
+        self.nanonis = nanonis
+
+    def Set(self, bias):
+        self.nanonis.command("Bias.Set")
+        self.nanonis.plant.bias = bias
+
+    def Get(self):
+        self.nanonis.command("Bias.Get")
+        return float(self.nanonis.plant.bias)
+
+
+class SimulatedZCtl:
+    def __init__(self, nanonis):
+        self.nanonis = nanonis
+        self.switch_off_delay = 0.1
+        self.p_gain = 1e-12
+        self.time_constant = 1e-4
+
+    def OnOffSet(self, state):
+        self.nanonis.command("ZCtl.OnOffSet")
+        self.nanonis.plant.set_z_controller(state == 1, self.switch_off_delay)
+
+    def OnOffGet(self):
+        self.nanonis.command("ZCtl.OnOffGet")
+        return 1 if self.nanonis.plant.is_z_controller_on() else 0
+
+    def SetpntSet(self, setpoint):
+        self.nanonis.command("ZCtl.SetpntSet")
+        self.nanonis.plant.current_setpoint = setpoint
+
+    def SetpntGet(self):
+        self.nanonis.command("ZCtl.SetpntGet")
+        return self.nanonis.plant.current_setpoint
+
+    def SwitchOffDelaySet(self, delay):
+        self.nanonis.command("ZCtl.SwitchOffDelaySet")
+        self.switch_off_delay = delay
+
+    def SwitchOffDelayGet(self):
+        self.nanonis.command("ZCtl.SwitchOffDelayGet")
+        return self.switch_off_delay
+
+    def GainSet(self, p_gain, time_constant):
+        self.nanonis.command("ZCtl.GainSet")
+        self.p_gain = p_gain
+        self.time_constant = time_constant
+
+    def GainGet(self):
+        self.nanonis.command("ZCtl.GainGet")
+        return self.p_gain, self.time_constant, self.p_gain / self.time_constant
+
+
+class SimulatedSig:
+    def __init__(self, nanonis):
+        self.nanonis = nanonis
+
+    def ValGet(self, signal_index, wait_for_newest_data = True):
+        self.nanonis.command("Sig.ValGet")
+        return self.nanonis.read_signal(self.nanonis.signal_names[signal_index])
+
+    def MeasSig(self, sig_names, averaging_time):
+        """
+        Averages the given signals for the averaging time and returns a dictionary with the signal names as keys.
+        """
+        self.nanonis.command("Sig.MeasSig", extra_time=averaging_time)
+        readout = {}
+        for name in sig_names:
+            value = self.nanonis.read_signal(name, averaging_time)
+            if value is not None:
+                readout[name] = value
+        return readout
+
+
+class SimulatedATrack:
+    def __init__(self, nanonis):
+        self.nanonis = nanonis
+        self.props = {
+            "Igain": 570e-12,
+            "Frequency": 10.0,
+            "Amplitude": 100e-12,
+            "Phase": 0.0,
+            "SwitchOffDelay": 0.5,
+        }
+        self.status = {"Modulation": "off", "Controller": "off"}
+
+    def PropsSet(self, Igain, Frequency, Amplitude, Phase, SwitchOffDelay):
+        self.nanonis.command("ATrack.PropsSet")
+        self.props = {
+            "Igain": Igain,
+            "Frequency": Frequency,
+            "Amplitude": Amplitude,
+            "Phase": Phase,
+            "SwitchOffDelay": SwitchOffDelay,
+        }
+
+    def PropsGet(self):
+        self.nanonis.command("ATrack.PropsGet")
+        return dict(self.props)
+
+    def CtrlSet(self, name, state):
+        self.nanonis.command("ATrack.CtrlSet")
+        self.status[name] = state
+        # tracking only follows the atom while the controller is running with modulation
+        if name == "Controller" and state == "on":
+            self.status["Modulation"] = "on"
+        tracking = self.status["Controller"] == "on" and self.status["Modulation"] == "on"
+        self.nanonis.plant.set_tracking(tracking)
+
+    def StatusGet(self, name):
+        self.nanonis.command("ATrack.StatusGet")
+        return self.status[name]
+
+
+class SimulatedFolMe:
+    def __init__(self, nanonis):
+        self.nanonis = nanonis
+
+    def XYPosGet(self, Wait_for_newest_data = True):
+        self.nanonis.command("FolMe.XYPosGet")
+        plant = self.nanonis.plant
+        plant.lateral_offset() # updates the tip position while tracking
+        return float(plant.tip_xy[0]), float(plant.tip_xy[1])
+
+
+class SimulatedUtil:
+    def __init__(self, nanonis):
+        self.nanonis = nanonis
+
+    def SessionPathGet(self):
+        self.nanonis.command("Util.SessionPathGet")
+        return self.nanonis.session_path
@@ -0,0 +1,23 @@
+# helper to create a simulated Nanonis and AWG which share one simulated STM
+from libs.simulation.plant_model import STMPlantModel
+from libs.simulation.simulated_nanonis import SimulatedNanonisModules
+from libs.simulation.simulated_awg import SimulatedAWG
+
+
+def create_simulated_setup(plant_settings = None, nanonis_settings = None, awg_settings = None, clock = None):
+    """
+    Creates a simulated Nanonis and AWG connected to the same plant.
+
+    Args:
+        - plant_settings: Dictionary of keyword arguments for STMPlantModel.
+        - nanonis_settings: Dictionary of keyword arguments for SimulatedNanonisModules.
+        - awg_settings: Dictionary of keyword arguments for SimulatedAWG.
+        - clock: The clock shared by the plant and the devices (RealClock if None). Pass the same clock to the transferFinder.
+
+    Returns
+        - nanonis (SimulatedNanonisModules), awg (SimulatedAWG)
+    """
+    plant = STMPlantModel(clock=clock, **(plant_settings or {}))
+    nanonis = SimulatedNanonisModules(plant=plant, **(nanonis_settings or {}))
+    awg = SimulatedAWG(plant, **(awg_settings or {}))
+    return nanonis, awg
@@ -0,0 +1,111 @@
+# TCP server speaking the Nanonis protocol for a few commands, backed by the simulated Nanonis
+import asyncio
+import struct
+import threading
+
+HEADER_SIZE = 40 # bytes
+ERROR_SECTION = bytes(12) # error status, error code and message size, all zero (no error)
+RESPONSE_SIZES = { # bytes of the values before the error section
+    "Bias.Set": 0,
+    "Bias.Get": 4,
+    "Signals.ValGet": 4,
+    "ZCtrl.OnOffSet": 0,
+    "ZCtrl.OnOffGet": 4,
+}
+
+
+# error section of a failed command: error status (int32, non-zero), error code (int32), message size (int32), message
+def make_error_section(message, error_code = -1):
+    message = message.encode()
+    return struct.pack(">iii", 1, error_code, len(message)) + message
+
+
+class SimulatedNanonisServer:
+    def __init__(self, nanonis, service_time = 1e-4, round_trip_delay = 1e-3):
+        """
+        Serves the commands used by the AsyncNanonisClient (Bias.Set/Get, Signals.ValGet, ZCtrl.OnOffSet/Get)
+        from a SimulatedNanonisModules, so the client can be tested without Nanonis.
+
+        A command which fails in the simulated Nanonis (e.g. Signals.ValGet with an invalid signal index) is answered
+        with zero values and an error section with a non-zero error status, as Nanonis does.
+
+        Requests of one connection are processed in order, each taking service_time, and every response is
+        delayed by round_trip_delay to model the network. A blocking client therefore needs
+        service_time + round_trip_delay per command, a pipelined one about service_time.
+        The simulated Nanonis should be created with command_latency = 0 and a RealClock plant.
+
+        Args:
+            - nanonis: The SimulatedNanonisModules executing the commands.
+            - service_time: The processing time per command in seconds.
+            - round_trip_delay: The network delay added to every response in seconds.
+        """
+        self.nanonis = nanonis
+        self.service_time = service_time
+        self.round_trip_delay = round_trip_delay
+
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.port = None
+
+    # function to start the server in a background thread, returns the port
+    def start(self, host = "127.0.0.1"):
+        started = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.server = self.loop.run_until_complete(asyncio.start_server(self.handle_connection, host, 0))
+            self.port = self.server.sockets[0].getsockname()[1]
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+        return self.port
+
+    def stop(self):
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readexactly(HEADER_SIZE)
+                command_name = header[0:32].rstrip(b"\x00").decode()
+                body_size = struct.unpack(">i", header[32:36])[0]
+                send_response = struct.unpack(">H", header[36:38])[0] != 0
+                body = await reader.readexactly(body_size)
+
+                await asyncio.sleep(self.service_time)
+                try:
+                    response_body = self.execute(command_name, body) + ERROR_SECTION
+                except Exception as e:
+                    response_body = bytes(RESPONSE_SIZES.get(command_name, 0)) + make_error_section(f"{command_name}: {e}")
+
+                if send_response:
+                    response = header[0:32] + struct.pack(">i", len(response_body)) + bytes(4) + response_body
+                    self.loop.call_later(self.round_trip_delay, writer.write, response)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    # function to execute a command, returns the values of the response body
+    def execute(self, command_name, body):
+        nanonis = self.nanonis
+        if command_name == "Bias.Set":
+            nanonis.Bias.Set(struct.unpack(">f", body[0:4])[0])
+            return b""
+        if command_name == "Bias.Get":
+            return struct.pack(">f", nanonis.Bias.Get())
+        if command_name == "Signals.ValGet":
+            signal_index, wait_for_newest_data = struct.unpack(">II", body[0:8])
+            return struct.pack(">f", nanonis.Sig.ValGet(signal_index=signal_index, wait_for_newest_data=wait_for_newest_data == 1))
+        if command_name == "ZCtrl.OnOffSet":
+            nanonis.ZCtl.OnOffSet(struct.unpack(">I", body[0:4])[0])
+            return b""
+        if command_name == "ZCtrl.OnOffGet":
+            return struct.pack(">I", nanonis.ZCtl.OnOffGet())
+        raise ValueError(f"Command {command_name} is not simulated.")
@@ -0,0 +1,114 @@
+# columnar binary storage of a measurement: one .npy file per column and JSON sidecars with the layout and the settings
+import collections.abc
+import json
+import os
+import re
+import numpy as np
+
+LAYOUT_FILENAME = "columns.json"
+METADATA_FILENAME = "metadata.json"
+FORMAT_NAME = "transfer_function_columns"
+
+
+# helper function to turn a column name into a file name, e.g. "Input 2 (V)" -> "Input_2_V.npy"
+def column_filename(name, used_filenames):
+    stem = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_") or "column"
+    filename = f"{stem}.npy"
+    suffix = 1
+    while filename in used_filenames:
+        suffix += 1
+        filename = f"{stem}_{suffix}.npy"
+    used_filenames.add(filename)
+    return filename
+
+
+def save_columns(directory, columns, metadata = None):
+    """
+    Saves the columns as typed .npy files in the directory. The column names, file names and dtypes are saved in a small
+    layout file, the metadata (e.g. the settings) in a separate sidecar, so the columns can be loaded without parsing the settings.
+    The layout is written last, so a directory without it is incomplete.
+
+    Args:
+        - directory: The directory to create.
+        - columns (dict): Column name -> array-like with one value per point. All columns need the same length.
+        - metadata (dict): JSON serializable data saved in the sidecar.
+
+    Returns
+        - directory (str): The directory the columns were saved to.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    used_filenames = {LAYOUT_FILENAME, METADATA_FILENAME}
+    column_info = []
+    num_rows = None
+    for name, values in columns.items():
+        values = np.ascontiguousarray(values)
+        if num_rows is None:
+            num_rows = len(values)
+        elif len(values) != num_rows:
+            raise ValueError(f"Column {name} has {len(values)} values, expected {num_rows}.")
+
+        filename = column_filename(name, used_filenames)
+        np.save(os.path.join(directory, filename), values, allow_pickle=False)
+        column_info.append({"name": name, "file": filename, "dtype": values.dtype.str})
+
+    with open(os.path.join(directory, METADATA_FILENAME), 'w') as f:
+        json.dump(metadata if metadata is not None else {}, f, indent=4)
+
+    layout = {
+        "format": FORMAT_NAME,
+        "num_rows": num_rows if num_rows is not None else 0,
+        "columns": column_info,
+    }
+    with open(os.path.join(directory, LAYOUT_FILENAME), 'w') as f:
+        json.dump(layout, f, indent=4)
+    return directory
+
+
+class ColumnarData(collections.abc.Mapping):
+    def __init__(self, directory, layout, mmap = True):
+        """
+        Read-only mapping of the column names to NumPy arrays. Every column is loaded on first access
+        (np.load with mmap_mode='r' if mmap), so only the used columns cost anything.
+        """
+        self.directory = directory
+        self.num_rows = layout["num_rows"]
+        self.files = {info["name"]: info["file"] for info in layout["columns"]}
+        self.mmap_mode = 'r' if mmap else None
+        self.loaded = {}
+
+    def __getitem__(self, name):
+        if name not in self.loaded:
+            self.loaded[name] = np.load(os.path.join(self.directory, self.files[name]), mmap_mode=self.mmap_mode, allow_pickle=False)
+        return self.loaded[name]
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __len__(self):
+        return len(self.files)
+
+
+def load_columns(directory, mmap = True):
+    """
+    Loads the columns saved by save_columns. With mmap, the arrays are read-only memory maps (np.load with
+    mmap_mode='r'), so only the pages of the values actually used are read from disk.
+
+    Args:
+        - directory: The directory written by save_columns.
+        - mmap: If true, the columns are memory-mapped instead of read into memory.
+
+    Returns
+        - columns (ColumnarData): Mapping of the column names to NumPy arrays, in the saved order, loaded on first access.
+    """
+    with open(os.path.join(directory, LAYOUT_FILENAME), 'r') as f:
+        layout = json.load(f)
+    if layout.get("format") != FORMAT_NAME:
+        raise ValueError(f"{directory} does not contain columnar transfer function data.")
+    return ColumnarData(directory, layout, mmap=mmap)
+
+
+# function to load the metadata (settings) saved with the columns
+def load_metadata(directory):
+    with open(os.path.join(directory, METADATA_FILENAME), 'r') as f:
+        return json.load(f)
@@ -0,0 +1,137 @@
+# crash-safe streaming of the measured rows to a JSON Lines file
+import json
+import os
+
+import logging
+logger = logging.getLogger("data_stream")
+
+
+class DataStreamWriter:
+    def __init__(self, filename, fsync = True):
+        """
+        Appends the measurement to a JSON Lines file, one record per line, so everything written before a crash
+        (or an exit() in the escape routine) stays readable. Every record is flushed, and with fsync also written to disk,
+        before the function returns.
+
+        Records:
+            - {"record": "header", ...}: the settings and reference values, written at the start of every (resumed) sweep.
+            - {"record": "row", "values": [...], "metadata": {...}}: one measured frequency.
+            - {"record": "end", ...}: written when the sweep finished.
+
+        Args:
+            - filename: The path of the JSON Lines file. Existing files are appended to.
+            - fsync: If true, every record is synced to disk (os.fsync) and not only flushed to the operating system.
+        """
+        self.filename = filename
+        self.fsync = fsync
+        self.file = None
+        self.written_rows = 0
+
+    def open(self):
+        directory = os.path.dirname(self.filename)
+        if directory != "" and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.file = open(self.filename, 'a')
+
+        # a crash while writing can leave a partial last line, start the new records on a new line
+        if self.file.tell() > 0:
+            with open(self.filename, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self.file.write("\n")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    # function to write one record and make sure it reached the file
+    def write_record(self, record_type, data):
+        if self.file is None:
+            self.open()
+        self.file.write(json.dumps({"record": record_type, **data}) + "\n")
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def write_header(self, header):
+        self.write_record("header", header)
+
+    def write_row(self, values, metadata = None):
+        self.write_record("row", {"values": values, "metadata": metadata})
+        self.written_rows += 1
+
+    def write_end(self, data = None):
+        self.write_record("end", data if data is not None else {})
+
+
+# function to read a (possibly interrupted) data stream
+def read_data_stream(filename):
+    """
+    Reads a JSON Lines file written by the DataStreamWriter. A partial line left by a crash is skipped.
+
+    Args:
+        - filename: The path of the JSON Lines file.
+
+    Returns
+        - headers (list of dict): The header records, one per (resumed) sweep.
+        - rows (list of dict): The row records with "values", "metadata" and "header_index" (the index of the header
+                               the row was written after, -1 if none), in the order they were measured.
+        - finished (bool): True if the last sweep wrote its end record.
+    """
+    headers = []
+    rows = []
+    finished = False
+    with open(filename, 'r') as f:
+        for line_number, line in enumerate(f, start=1):
+            if line.strip() == "":
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping incomplete record in line {line_number} of {filename}.")
+                continue
+
+            record_type = record.pop("record", None)
+            if record_type == "header":
+                headers.append(record)
+                finished = False
+            elif record_type == "row":
+                record["header_index"] = len(headers) - 1
+                rows.append(record)
+            elif record_type == "end":
+                finished = True
+    return headers, rows, finished
+
+
+# function to get the rows of the last sweep, i.e. since the last header which does not belong to a resumed sweep
+def last_sweep_rows(headers, rows):
+    start = 0
+    for index, header in enumerate(headers):
+        if not header.get("resumed", False):
+            start = index
+    return [row for row in rows if row["header_index"] >= start]
+
+
+# function to move an existing file out of the way, e.g. sweep.jsonl -> sweep_1.jsonl
+def rotate_file(filename):
+    """
+    Returns
+        - rotated_filename (str): The new name of the file, None if the file does not exist.
+    """
+    if not os.path.exists(filename):
+        return None
+    root, extension = os.path.splitext(filename)
+    suffix = 1
+    while os.path.exists(f"{root}_{suffix}{extension}"):
+        suffix += 1
+    rotated_filename = f"{root}_{suffix}{extension}"
+    os.replace(filename, rotated_filename)
+    return rotated_filename
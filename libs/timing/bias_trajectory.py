@@ -0,0 +1,105 @@
+# planning and execution of time-parameterised bias ramps
+import numpy as np
+
+
+def plan_bias_profile(start_voltage, end_voltage, total_time, slew_rate, step_interval):
+    """
+    Computes a linear bias ramp which does not exceed the slew rate.
+
+    Args:
+        - start_voltage: The bias at the start of the ramp in Volts.
+        - end_voltage: The bias at the end of the ramp in Volts.
+        - total_time: The minimum duration of the ramp in seconds. The ramp is slower if the slew rate requires it.
+        - slew_rate: The maximum slew rate in V/s.
+        - step_interval: The minimum time between two points in seconds, e.g. the time of one Bias.Set call.
+
+    Returns
+        - times (np.ndarray): The time of every point relative to the start of the ramp in seconds.
+        - voltages (np.ndarray): The bias of every point in Volts. The last point is end_voltage.
+    """
+    diff_voltage = end_voltage - start_voltage
+    duration = max(total_time, abs(diff_voltage) / slew_rate)
+    if diff_voltage == 0 or duration <= 0:
+        return np.array([0.0]), np.array([float(end_voltage)])
+
+    num_points = max(1, int(np.ceil(duration / step_interval)))
+    times = np.linspace(duration / num_points, duration, num_points)
+    voltages = start_voltage + diff_voltage * times / duration
+    voltages[-1] = end_voltage
+    return times, voltages
+
+
+class BiasTrajectoryExecutor:
+    def __init__(self, clock):
+        """
+        Sends a precomputed bias profile, every point at an absolute deadline relative to the start of the ramp.
+
+        A point is never sent before its deadline, so the applied bias never runs ahead of the planned profile
+        and the slew rate is not exceeded. If a command took longer than planned, all points whose deadline has
+        already passed are merged into the latest of them, so the delay does not add up over the ramp.
+
+        Args:
+            - clock: The clock used for the deadlines.
+        """
+        self.clock = clock
+
+    def execute(self, set_bias, times, voltages):
+        """
+        Args:
+            - set_bias: Function applying a bias in Volts, e.g. Bias.Set.
+            - times: The planned time of every point relative to the start in seconds (increasing).
+            - voltages: The planned bias of every point in Volts.
+
+        Returns
+            - report (dict): The planned and achieved profile (arrays) and a summary, see summarize().
+        """
+        start_time = self.clock.time()
+        sent_times = []
+        sent_indices = []
+        skipped_points = 0
+
+        index = 0
+        num_points = len(times)
+        while index < num_points:
+            now = self.clock.time() - start_time
+            if now < times[index]:
+                self.clock.wait_until(start_time + times[index])
+            else:
+                # behind schedule: merge all points which are already due into the latest one
+                latest = int(np.searchsorted(times, now, side="right")) - 1
+                skipped_points += latest - index
+                index = latest
+
+            sent_times.append(self.clock.time() - start_time)
+            set_bias(voltages[index])
+            sent_indices.append(index)
+            index += 1
+
+        end_time = self.clock.time() - start_time
+        return {
+            "planned_times": np.asarray(times),
+            "planned_voltages": np.asarray(voltages),
+            "sent_times": np.array(sent_times),
+            "sent_voltages": np.asarray(voltages)[sent_indices],
+            "sent_indices": np.array(sent_indices),
+            "skipped_points": skipped_points,
+            "achieved_duration": end_time,
+        }
+
+    # function to reduce a report to the values logged with the measurement
+    def summarize(self, report):
+        planned_times = report["planned_times"]
+        sent_times = report["sent_times"]
+
+        # lag of every sent point behind its deadline
+        lags = sent_times - planned_times[report["sent_indices"]]
+
+        return {
+            "end_voltage": float(report["planned_voltages"][-1]),
+            "planned_duration": float(planned_times[-1]),
+            "achieved_duration": float(report["achieved_duration"]),
+            "planned_points": len(planned_times),
+            "sent_points": len(sent_times),
+            "skipped_points": report["skipped_points"],
+            "max_lag": float(np.max(lags)),
+        }
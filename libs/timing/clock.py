@@ -0,0 +1,61 @@
+# clocks used for all waiting in the measurement, so that simulated runs do not need to wait in real time
+import threading
+import time
+
+
+class RealClock:
+    """
+    Clock which waits in real time.
+    """
+    def time(self):
+        return time.perf_counter()
+
+    def sleep(self, duration):
+        if duration > 0:
+            time.sleep(duration)
+
+    def wait_until(self, target_time):
+        self.sleep(target_time - self.time())
+
+    # background threads run in real time, nothing to do
+    def begin_timeline(self, start_time):
+        pass
+
+
+class VirtualClock:
+    def __init__(self, start_time = 0.0):
+        """
+        Clock which advances instantly when sleeping.
+        The virtual time is the duration the same sequence of waits would have taken in real time.
+
+        Background threads can run on their own timeline (see begin_timeline), so that work done in parallel
+        does not add up on the main timeline.
+
+        Args:
+            - start_time: The initial virtual time in seconds.
+        """
+        self.start_time = start_time
+        self.current_time = start_time
+        self.thread_state = threading.local()
+
+    def time(self):
+        return getattr(self.thread_state, "current_time", self.current_time)
+
+    def sleep(self, duration):
+        if duration <= 0:
+            return
+        if hasattr(self.thread_state, "current_time"):
+            self.thread_state.current_time += duration
+        else:
+            self.current_time += duration
+
+    def wait_until(self, target_time):
+        self.sleep(target_time - self.time())
+
+    # function to let the calling (background) thread run on its own timeline, starting at start_time
+    def begin_timeline(self, start_time):
+        self.thread_state.current_time = start_time
+
+    # function to get the virtual time since the creation of the clock
+    def elapsed(self):
+        return self.current_time - self.start_time
@@ -0,0 +1,150 @@
+# latency histograms of the commands sent to the Nanonis and the AWG
+import functools
+import numpy as np
+
+
+class LatencyHistogram:
+    def __init__(self, lowest = 1e-6, highest = 1e3, relative_precision = 0.01):
+        """
+        Histogram with logarithmic buckets (as in HDR histograms), so every recorded value is known to within
+        relative_precision over the whole range, with a fixed memory footprint and constant recording cost.
+
+        Args:
+            - lowest: The smallest distinguishable value in seconds. Smaller values go into the first bucket.
+            - highest: The largest value in seconds. Larger values go into the last bucket.
+            - relative_precision: The relative width of a bucket.
+        """
+        self.lowest = lowest
+        self.log_base = np.log1p(relative_precision)
+        num_buckets = int(np.ceil(np.log(highest / lowest) / self.log_base)) + 1
+        self.counts = np.zeros(num_buckets, dtype=np.int64)
+
+        self.count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = 0.0
+
+    def bucket_index(self, value):
+        if value <= self.lowest:
+            return 0
+        return min(int(np.log(value / self.lowest) / self.log_base) + 1, len(self.counts) - 1)
+
+    # upper bound of the values in a bucket
+    def bucket_value(self, index):
+        return self.lowest * np.exp(index * self.log_base)
+
+    def record(self, value):
+        self.counts[self.bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, percentile):
+        if self.count == 0:
+            return None
+        rank = int(np.ceil(percentile / 100 * self.count))
+        index = int(np.searchsorted(np.cumsum(self.counts), max(rank, 1)))
+        # the bucket bound is an upper estimate, the exact extreme values are known
+        return float(min(max(self.bucket_value(index), self.min), self.max))
+
+    def summary(self, percentiles = (50, 99)):
+        if self.count == 0:
+            return {"count": 0}
+        summary = {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count,
+            "min": float(self.min),
+            "max": float(self.max),
+        }
+        for percentile in percentiles:
+            summary[f"p{percentile:g}"] = self.percentile(percentile)
+        return summary
+
+    # non-empty buckets as [upper bound, count]
+    def buckets(self):
+        indices = np.nonzero(self.counts)[0]
+        return [[float(self.bucket_value(index)), int(self.counts[index])] for index in indices]
+
+
+class CommandProfiler:
+    # commands with a detailed percentile breakdown
+    HOT_COMMANDS = ("Bias.Set", "Sig.ValGet", "Sig.MeasSig")
+    DETAILED_PERCENTILES = (50, 75, 90, 95, 99, 99.9)
+
+    def __init__(self, clock):
+        """
+        Records the call count and a latency histogram per command. The commands are timed with the clock of the measurement.
+
+        Args:
+            - clock: The clock of the measurement.
+        """
+        self.clock = clock
+        self.histograms = {}
+
+    def record(self, command_name, duration):
+        if command_name not in self.histograms:
+            self.histograms[command_name] = LatencyHistogram()
+        self.histograms[command_name].record(duration)
+
+    # function to wrap a method so its calls are timed
+    def wrap(self, command_name, method):
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start_time = self.clock.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(command_name, self.clock.time() - start_time)
+        return timed
+
+    def statistics(self):
+        """
+        Returns
+            - statistics (dict): For every command the call count, total, mean, min and max time, p50 and p99
+              (and more percentiles for the hot commands) and the non-empty histogram buckets.
+        """
+        statistics = {}
+        for command_name, histogram in sorted(self.histograms.items(), key=lambda item: -item[1].total):
+            percentiles = self.DETAILED_PERCENTILES if command_name in self.HOT_COMMANDS else (50, 99)
+            statistics[command_name] = histogram.summary(percentiles)
+            statistics[command_name]["histogram"] = histogram.buckets()
+        return statistics
+
+
+class ProfiledModule:
+    def __init__(self, module_name, module, profiler):
+        """
+        Wraps an object (a Nanonis module or the AWG) and times every method called on it as "<module_name>.<method>".
+        """
+        self.module_name = module_name
+        self.module = module
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+        attribute = getattr(self.module, name)
+        if not callable(attribute):
+            return attribute
+        return self.profiler.wrap(f"{self.module_name}.{name}", attribute)
+
+
+class ProfiledNanonisModules:
+    def __init__(self, nanonis_module, profiler):
+        """
+        Drop-in replacement for NanonisModules which times every command with the profiler.
+        Modules (attributes starting with an upper case letter, e.g. Bias, ZCtl) are wrapped, all other attributes
+        are taken from the wrapped object.
+        """
+        self.nanonis_module = nanonis_module
+        self.profiler = profiler
+        self.modules = {}
+
+    def __getattr__(self, name):
+        attribute = getattr(self.nanonis_module, name)
+        if not name[:1].isupper():
+            return attribute
+
+        if name not in self.modules:
+            self.modules[name] = ProfiledModule(name, attribute, self.profiler)
+        return self.modules[name]
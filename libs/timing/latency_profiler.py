@@ -0,0 +1,122 @@
+# measurement of the round-trip times of the Nanonis commands used during a sweep
+import json
+import os
+import time
+import numpy as np
+
+import logging
+logger = logging.getLogger("latency_profiler")
+
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".nanonis_latency_cache.json")
+
+
+class LatencyProfiler:
+    def __init__(self, num_samples = 50, cache_file = DEFAULT_CACHE_FILE, max_age = 24 * 3600):
+        """
+        Measures the round-trip time distribution (median and p99) of the Nanonis commands used during a sweep.
+
+        Only commands without side effects are timed: getters, and Bias.Set with the bias that is already applied.
+        Results are cached in a JSON file per Nanonis address (host, port) and reused until they are older than max_age,
+        so the profiling only runs once per machine and day.
+
+        Args:
+            - num_samples: The number of round trips timed per command.
+            - cache_file: The JSON file for the cached results. No caching if None.
+            - max_age: The time after which cached results expire in seconds.
+        """
+        self.num_samples = num_samples
+        self.cache_file = cache_file
+        self.max_age = max_age
+
+    # key of the cache entry of a Nanonis address
+    def make_key(self, address):
+        host, port = address
+        return f"{host}:{port}"
+
+    # commands to time, as functions without arguments
+    def make_commands(self, nanonis_module, current_index):
+        bias = nanonis_module.Bias.Get()
+        return {
+            "Bias.Get": lambda: nanonis_module.Bias.Get(),
+            "Bias.Set": lambda: nanonis_module.Bias.Set(bias),
+            "Sig.ValGet": lambda: nanonis_module.Sig.ValGet(signal_index=current_index, wait_for_newest_data=True),
+            "ZCtl.OnOffGet": lambda: nanonis_module.ZCtl.OnOffGet(),
+            "ZCtl.SetpntGet": lambda: nanonis_module.ZCtl.SetpntGet(),
+        }
+
+    def measure(self, nanonis_module, clock, current_index = 1):
+        """
+        Times every command num_samples times.
+
+        Returns
+            - latencies (dict): For every command name a dict with the median, p99, mean and min round-trip time in seconds.
+        """
+        latencies = {}
+        for name, command in self.make_commands(nanonis_module, current_index).items():
+            samples = []
+            for _ in range(self.num_samples):
+                start_time = clock.time()
+                command()
+                samples.append(clock.time() - start_time)
+
+            latencies[name] = {
+                "median": float(np.median(samples)),
+                "p99": float(np.percentile(samples, 99)),
+                "mean": float(np.mean(samples)),
+                "min": float(np.min(samples)),
+                "samples": len(samples),
+            }
+        return latencies
+
+    def load_cache(self):
+        if self.cache_file is None or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read the latency cache {self.cache_file}: {e}")
+            return {}
+
+    def save_cache(self, cache):
+        if self.cache_file is None:
+            return
+        try:
+            with open(self.cache_file, "w") as f:
+                json.dump(cache, f, indent=4)
+        except OSError as e:
+            logger.warning(f"Could not write the latency cache {self.cache_file}: {e}")
+
+    def profile(self, nanonis_module, clock, address = None, current_index = 1, force = False):
+        """
+        Returns the latencies of the Nanonis at address, from the cache if possible.
+
+        Args:
+            - nanonis_module: The NanonisModules object.
+            - clock: The clock used to time the commands.
+            - address: The tuple (host, port) of the Nanonis TCP interface. Results are not cached if None.
+            - current_index: The signal index of the current, read by Sig.ValGet.
+            - force: If true, the latencies are measured even if a valid cache entry exists.
+
+        Returns
+            - latencies (dict): See measure().
+        """
+        cache = self.load_cache() if address is not None else {}
+        key = self.make_key(address) if address is not None else None
+
+        if not force and key in cache:
+            entry = cache[key]
+            age = time.time() - entry["timestamp"]
+            if age < self.max_age:
+                logger.info(f"Using cached latencies for {key} ({age / 3600:.1f} h old).")
+                return entry["latencies"]
+
+        latencies = self.measure(nanonis_module, clock, current_index)
+        logger.info("Measured Nanonis latencies: " + ", ".join(
+            f"{name} median {values['median'] * 1e3:.3f} ms, p99 {values['p99'] * 1e3:.3f} ms" for name, values in latencies.items()))
+
+        if key is not None:
+            cache[key] = {"timestamp": time.time(), "latencies": latencies}
+            self.save_cache(cache)
+        return latencies
@@ -0,0 +1,108 @@
+# span tracing of the measurement phases, exported in the Chrome trace event format (chrome://tracing, ui.perfetto.dev)
+import contextlib
+import json
+import threading
+
+
+class SpanTracer:
+    def __init__(self, clock, enabled = True, process_name = "transferFinder"):
+        """
+        Records nested spans (name, start, duration, arguments) of the measurement, timed with the clock of the measurement.
+        The spans are saved as complete events ("ph": "X") of the trace event format, so runs can be compared on a timeline.
+
+        Args:
+            - clock: The clock of the measurement.
+            - enabled: If false, span() returns a no-op context and nothing is recorded.
+            - process_name: The name of the process shown in the trace viewer.
+        """
+        self.clock = clock
+        self.enabled = enabled
+        self.process_name = process_name
+        self.events = []
+        self.start_time = clock.time()
+        self.thread_ids = {} # thread identifiers mapped to small numbers for the viewer
+        self.lock = threading.Lock()
+
+    # helper function to get the trace thread id of the calling thread
+    def thread_id(self):
+        ident = threading.get_ident()
+        with self.lock:
+            if ident not in self.thread_ids:
+                self.thread_ids[ident] = (len(self.thread_ids), threading.current_thread().name)
+            return self.thread_ids[ident][0]
+
+    # helper function to convert a clock time to the microseconds of the trace
+    def timestamp(self, clock_time):
+        return (clock_time - self.start_time) * 1e6
+
+    @contextlib.contextmanager
+    def record_span(self, name, category, args):
+        start_time = self.clock.time()
+        try:
+            yield args
+        finally:
+            end_time = self.clock.time()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": self.timestamp(start_time),
+                "dur": (end_time - start_time) * 1e6,
+                "pid": 0,
+                "tid": self.thread_id(),
+            }
+            if len(args) > 0:
+                event["args"] = args
+            with self.lock:
+                self.events.append(event)
+
+    def span(self, name, category = "measurement", **args):
+        """
+        Context manager measuring the enclosed code as one span. The yielded dictionary holds the arguments of the span
+        and can be extended inside the block, e.g. with results.
+
+        Args:
+            - name: The name of the span.
+            - category: The category of the span, used for filtering in the viewer.
+            - args: Arguments shown with the span (JSON serializable).
+        """
+        if not self.enabled:
+            return contextlib.nullcontext(args)
+        return self.record_span(name, category, args)
+
+    # function to mark a point in time
+    def instant(self, name, category = "measurement", **args):
+        if not self.enabled:
+            return
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "i",
+            "s": "t",
+            "ts": self.timestamp(self.clock.time()),
+            "pid": 0,
+            "tid": self.thread_id(),
+        }
+        if len(args) > 0:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+
+    def trace_events(self):
+        """
+        Returns
+            - trace (dict): The recorded spans with process and thread names in the trace event format.
+        """
+        metadata = [{"name": "process_name", "ph": "M", "pid": 0, "args": {"name": self.process_name}}]
+        for tid, thread_name in self.thread_ids.values():
+            metadata.append({"name": "thread_name", "ph": "M", "pid": 0, "tid": tid, "args": {"name": thread_name}})
+
+        with self.lock:
+            events = sorted(self.events, key=lambda event: event["ts"])
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    # function to save the trace, returns the filename
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.trace_events(), f)
+        return filename
@@ -0,0 +1,115 @@
+# prediction of the duration of a frequency sweep from the settings and the measured command latencies
+import numpy as np
+
+
+class SweepDurationEstimator:
+    def __init__(self, integration_time, awg_settling_time, max_tune_iterations, atom_tracking_interval,
+                 atom_tracking_time, command_time, awg_command_time = 0.0, expected_iterations = 1.0,
+                 combined_acquisition = False, drift_check_time = 0.0):
+        """
+        Estimates the duration of measure_transfer_function_for_all_frequencies. Per frequency the sweep
+        switches the AWG, waits for the settling, measures Irec, repeats this for every tuning iteration and
+        finally acquires the data channels. Every atom_tracking_interval frequencies the atom is tracked.
+
+        The settling and averaging times are upper bounds with settle detection and adaptive integration.
+
+        Args:
+            - integration_time: The averaging time of one Irec or logging acquisition in seconds.
+            - awg_settling_time: The time waited after every change of the AWG output in seconds.
+            - max_tune_iterations: The maximum number of amplitude updates per frequency.
+            - atom_tracking_interval: The number of frequencies between two atom trackings.
+            - atom_tracking_time: The duration of one atom tracking in seconds.
+            - command_time: The round-trip time of a Nanonis command in seconds.
+            - awg_command_time: The time of one AWG command (switching the frequency or the amplitude) in seconds.
+            - expected_iterations: The expected mean number of tuning iterations per frequency.
+            - combined_acquisition: If true, the final tuning acquisition is reused and no separate logging acquisition is made.
+            - drift_check_time: The time of the drift check after every frequency in seconds (0 without drift checks).
+        """
+        self.integration_time = integration_time
+        self.awg_settling_time = awg_settling_time
+        self.max_tune_iterations = max_tune_iterations
+        self.atom_tracking_interval = atom_tracking_interval
+        self.atom_tracking_time = atom_tracking_time
+        self.command_time = command_time
+        self.awg_command_time = awg_command_time
+        self.expected_iterations = expected_iterations
+        self.combined_acquisition = combined_acquisition
+        self.drift_check_time = drift_check_time
+
+    # duration of one frequency with the given number of tuning iterations
+    def point_duration(self, iterations):
+        acquisition_time = self.integration_time + self.command_time
+        step_time = self.awg_command_time + self.awg_settling_time + acquisition_time
+        logging_time = 0.0 if self.combined_acquisition else acquisition_time
+        return step_time * (1 + iterations) + logging_time + self.drift_check_time
+
+    # duration of one atom tracking, controller on and modulation off are one command each
+    def tracking_duration(self):
+        return self.atom_tracking_time + 2 * self.command_time
+
+    def estimate(self, num_frequencies):
+        """
+        Returns
+            - estimate (dict): The expected duration ("expected", with expected_iterations per frequency) and the
+              upper bound ("upper_bound", max_tune_iterations per frequency) of the sweep in seconds, the duration of
+              a single frequency and the number of atom trackings.
+        """
+        num_trackings = num_frequencies // self.atom_tracking_interval
+        tracking_time = num_trackings * self.tracking_duration()
+        expected_iterations = min(self.expected_iterations, self.max_tune_iterations)
+        return {
+            "num_frequencies": num_frequencies,
+            "num_atom_trackings": num_trackings,
+            "point_duration": self.point_duration(expected_iterations),
+            "expected": num_frequencies * self.point_duration(expected_iterations) + tracking_time,
+            "upper_bound": num_frequencies * self.point_duration(self.max_tune_iterations) + tracking_time,
+        }
+
+
+class SweepETA:
+    def __init__(self, num_points, expected_point_duration, start_time, prior_weight = 3):
+        """
+        Live estimate of the remaining sweep time. The cost per point is the mean of the observed points
+        (including the atom trackings between them), blended with the predicted cost as long as only a few points are measured.
+
+        Args:
+            - num_points: The number of frequencies of the sweep.
+            - expected_point_duration: The predicted time per point in seconds, including the share of the atom tracking.
+            - start_time: The clock time at the start of the sweep.
+            - prior_weight: The number of observed points the prediction is worth.
+        """
+        self.num_points = num_points
+        self.expected_point_duration = expected_point_duration
+        self.start_time = start_time
+        self.prior_weight = prior_weight
+        self.completed_points = 0
+        self.elapsed_time = 0.0
+
+    def update(self, completed_points, now):
+        """
+        Args:
+            - completed_points: The number of measured points.
+            - now: The current clock time.
+
+        Returns
+            - remaining_time (float): The estimated time until the sweep is finished in seconds.
+        """
+        self.completed_points = completed_points
+        self.elapsed_time = now - self.start_time
+        return self.remaining_time()
+
+    def point_duration(self):
+        return ((self.prior_weight * self.expected_point_duration + self.elapsed_time)
+                / (self.prior_weight + self.completed_points))
+
+    def remaining_time(self):
+        return max(self.num_points - self.completed_points, 0) * self.point_duration()
+
+    def total_time(self):
+        return self.elapsed_time + self.remaining_time()
+
+
+# helper function to format a duration in seconds as h:mm:ss
+def format_duration(seconds):
+    seconds = int(np.round(seconds))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
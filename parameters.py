@@ -1,4 +1,5 @@
 # define classes to hold parameters for the awg, the nanonis and others
+import numpy as np
 
 # general parameter class
 class Parameter:
@@ -129,19 +130,65 @@ class AmplitudeTuningParameters(ParameterList):
         super().__init__(params)
 
 
-# class to hold measurement parameters
+# class to hold measurement values
 class MeasurementValues:
-    def __init__(self, labels):
-        self.labels = labels
-        self.values = []
+    """
+    Growable table of measured values with one float column per label.
+
+    The rows are stored in a preallocated structured NumPy array whose capacity doubles when it is full, so adding
+    a row is amortised O(1). column() returns a view of the filled part of a column without copying. The views are
+    only valid until the next add_values() which has to grow the array.
+    """
+    __slots__ = ("labels", "data", "size")
+
+    def __init__(self, labels, initial_capacity = 64):
+        self.labels = list(labels)
+        self.data = np.empty(max(initial_capacity, 1), dtype=[(label, np.float64) for label in self.labels])
+        self.size = 0
 
     def add_values(self, new_values):
         if len(new_values) != len(self.labels):
             raise ValueError(f"Number of new values {len(new_values)} does not match number of labels {len(self.labels)}")
-        self.values.append(new_values)
+        if self.size == len(self.data):
+            # amortised doubling of the capacity
+            grown = np.empty(2 * len(self.data), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size] = tuple(new_values)
+        self.size += 1
 
+    # structured array of the filled rows (view)
     def get_values(self):
-        return self.values
+        return self.data[:self.size]
     
     def get_labels(self):
-        return self.labels
\ No newline at end of file
+        return self.labels
+
+    # function to get the values of one column (view)
+    def column(self, label):
+        return self.data[label][:self.size]
+
+    # function to get the values as a 2D float array (copy), one row per measurement
+    def to_array(self):
+        return np.column_stack([self.column(label) for label in self.labels])
+
+    # function to rearrange the rows, row i becomes the old row order[i]
+    def reorder(self, order):
+        if len(order) != self.size:
+            raise ValueError(f"Order with {len(order)} entries does not match the {self.size} rows")
+        self.data[:self.size] = self.data[:self.size][np.asarray(order, dtype=np.intp)]
+
+    def __len__(self):
+        return self.size
+
+    # row as a list of Python floats
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(f"Row {index} out of range for {self.size} rows")
+        return list(self.data[index].tolist())
+
+    def __iter__(self):
+        for index in range(self.size):
+            yield self[index]
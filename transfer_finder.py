@@ -4,11 +4,34 @@ from libs.pyNanonisMeasurements.nanonisTCP.nanonisTCP import nanonisTCP
 from libs.pyNanonisMeasurements.nanonisTCP import NanonisModules
 from libs.pyNanonisMeasurements.measurementClasses.MeasurementBase import MeasurementBase
 from libs.regulator.pi_controller import PIController
+from libs.regulator.tuning_strategies import TuningStrategy, PITuningStrategy, SecantTuningStrategy
+from libs.regulator.bias_approach import BiasApproach, LinearBiasApproach, GallopingBiasApproach
+from libs.acquisition.atom_tracking_scheduler import AtomTrackingScheduler, IntervalTrackingScheduler, DriftTrackingScheduler
+from libs.acquisition.sweep_planner import SweepPlanner, GivenOrderPlanner, SortedPlanner, BisectionPlanner, AmplitudePlanner
+from libs.timing.clock import RealClock
+from libs.timing.latency_profiler import LatencyProfiler
+from libs.timing.bias_trajectory import BiasTrajectoryExecutor, plan_bias_profile
+from libs.timing.command_profiler import CommandProfiler, ProfiledModule, ProfiledNanonisModules
+from libs.timing.span_tracer import SpanTracer
+from libs.timing.sweep_estimator import SweepDurationEstimator, SweepETA, format_duration
+from libs.nanonis.state_cache import CachedNanonisModules
+from libs.acquisition.sequential_integration import SequentialAcquisition
+from libs.acquisition.settle_detector import SettleDetector
+from libs.storage.data_stream import DataStreamWriter, read_data_stream, last_sweep_rows, rotate_file
+from libs.storage.columnar import save_columns
+from libs.estimation.frequency_index import FrequencyIndex
+from libs.estimation.amplitude_model import AmplitudeModel
+from parameters import MeasurementValues
+from libs.awg.continuous_sweep import ContinuousSweepAWG, missing_segment_methods
+from libs.awg.pipelined_sweep import PipelinedSweepExecutor
 
 import time
+import asyncio
+import contextlib
 import numpy as np 
 import json
 import datetime
+import os
 
 import logging
 logger = logging.getLogger("transfer_finder")
@@ -30,7 +53,20 @@ class transferFinder:
                 lockin_frequency = 1e3,
                 tuning_pgain = 0.5,
                 tuning_integration_time_constant = 1.0,
+                tolerance = 0.01,
                 max_tune_iterations = 10,
+                tuning_strategy = "secant",
+                adaptive_integration = False,
+                adaptive_burst_time = 0.01,
+                adaptive_confidence_z = 3.0,
+                settle_detection = False,
+                settle_sample_interval = 0.005,
+                settle_window_size = 5,
+                settle_relative_threshold = 2e-3,
+                continuous_output = False,
+                waveform_cache = None,
+                pipelined_sweep = False,
+                combined_acquisition = False,
                 sweep_frequencies = None,
                 reference_frequency = None,
                 reference_STM_amplitude = 0.5,
@@ -41,11 +77,34 @@ class transferFinder:
                 active_state_current = None,
                 active_state_voltage = None,
                 measurement_voltage = 0.5,
-                irec_tolerance = 0.1e-13,
+                irec_tolerance = None,
                 header = "dummy header",
                 filename = "transfer_function_measurement",
-                communication_time = 1e-4, # TODO: find value!
+                communication_time = None,
                 slew_rate = 0.1, # V/s, TODO: find value!
+                bias_approach = "galloping",
+                max_bias_step = 1e-3,
+                clock = None,
+                latency_profiler = None,
+                nanonis_address = None,
+                latency_statistic = "p99",
+                state_cache = False,
+                state_cache_max_age = 1.0,
+                coalesce_writes = False,
+                async_client = None,
+                profile_commands = False,
+                trace_spans = False,
+                atom_tracking_scheduler = "interval",
+                drift_threshold = 0.01,
+                max_atom_tracking_interval = None,
+                drift_check_time = 0.02,
+                stream_file = None,
+                resume = False,
+                output_format = "json",
+                log_frequency_distance = False,
+                frequency_match_tolerance = 1e-9,
+                sweep_order = "given",
+                tracking_deferral = 0,
                  ):
         
         """
@@ -56,7 +115,7 @@ class transferFinder:
             - open_nanonis_settings_gui: Flag which opens the parameter selection GUI if true.
             - height_averaging_time: The time to wait for the height to stabilize after switching off the z-controller.
             - integration_time: The integration time to use for recording the Irec value.
-            - amplitude_guess_mode: The strategy to use for estimating the starting amplitude for the tuning process. Options are "known" and "half". "known" uses the recorded Irec values for the reference amplitudes to find the two reference frequencies that are closest to the desired frequency, and performs a linear interpolation to estimate the Irec value at the desired frequency, then finds the corresponding amplitude. "half" assumes 0.5 transmission to estimate the starting amplitude.
+            - amplitude_guess_mode: The strategy to use for estimating the starting amplitude for the tuning process. Options are "known", "closest", "model", "half" and "fixed" (see estimate_starting_amplitude_for_frequency). "known" uses the recorded Irec values for the reference amplitudes to find the two reference frequencies that are closest to the desired frequency, and performs a linear interpolation to estimate the Irec value at the desired frequency, then finds the corresponding amplitude. "half" assumes 0.5 transmission to estimate the starting amplitude.
             - old compensation_amplitudes (list of tuples): The list of previously evaluated frequencies and their corresponding compensation amplitudes.
             - old_measurement_file (str): The path to the old measurement file from which to read parameters.
             - atom_tracking_settings: Dictionary containing the settings to use for atom tracking, e.g. a dictionary of parameters.
@@ -69,7 +128,20 @@ class transferFinder:
             - lockin_frequency: The frequency of the lock-in amplifier.
             - tuning_pgain: The proportional gain to use for the tuning process.
             - tuning_integration_time_constant: The time constant for the integral action in the tuning process.
-            - tolerance: The tolerance for the tuning process (relative to the current measured at reference amplitude and reference frequency).
+            - tolerance: The tolerance for the tuning process (relative to the current measured at reference amplitude and reference frequency). Only used if irec_tolerance is None.
+            - max_tune_iterations: The maximum number of amplitude updates per frequency.
+            - tuning_strategy: The strategy to tune the amplitude. Options are "secant" (root finding on the monotonic Irec(amplitude) relation) and "pi" (PI controller), or a TuningStrategy object.
+            - adaptive_integration: If true, Irec values during tuning are averaged in short bursts and the averaging stops as soon as the value is clearly outside the tolerance. Accepted values are still integrated for the full integration time.
+            - adaptive_burst_time: The averaging time of a single burst for the adaptive integration in seconds.
+            - adaptive_confidence_z: The half width of the confidence interval (in standard errors) used to decide if a value is outside the tolerance.
+            - settle_detection: If true, the current is sampled after each change of the AWG output and the measurement starts as soon as it has settled. awg_settling_time is then the upper bound.
+            - settle_sample_interval: The time between two current samples of the settle detection in seconds.
+            - settle_window_size: The number of samples which have to be flat and quiet to declare the system settled.
+            - settle_relative_threshold: The allowed drift and noise within the window, relative to the current.
+            - continuous_output: If true, the waveforms of all frequencies are preloaded as AWG segments and the output keeps playing during the whole sweep. Frequency changes only switch the segment and amplitude (see ContinuousSweepAWG). Like pipelined_sweep and waveform_cache, this needs an AWG with the segment methods of ContinuousSweepAWG (upload_sine_segment, select_segment, delete_segment), otherwise a ValueError is raised.
+            - waveform_cache: A WaveformCache for the AWG, shared between measurements to reuse uploaded waveforms. If given, all waveforms are played from cached AWG segments.
+            - pipelined_sweep: If true, the waveform of the next frequency is uploaded to the AWG in the background while the current frequency is measured. The playing segment is not touched, so the output only changes when the sweep switches to the next frequency.
+            - combined_acquisition: If true, every Irec measurement during tuning also reads all data_channels in the same Sig.MeasSig call, and the readout of the final tuning iteration is logged. This saves the separate logging acquisition (one integration time per frequency).
             - sweep_frequencies: The frequencies for which the transfer function shall be measured.
             - reference_frequency: The frequency at which the reference Irec value shall be recorded.
             - reference_STM_amplitude: The amplitude at the STM (!!) for which the reference Irec value shall be recorded.
@@ -78,35 +150,123 @@ class transferFinder:
             - data_channels: Labels of the channels in Nanonis that shall be logged.
             - use_active_state: TODO: check with Nicolaj again.
             - measurement_voltage: The voltage used for which the measurement shall be run.
-            - irec_tolerance: The tolerance for the Irec value when comparing to the reference Irec value for the compensation amplitude tuning.
+            - irec_tolerance: The absolute tolerance in Amperes for the Irec value when comparing to the reference Irec value for the compensation amplitude tuning. If set, the tuning accepts reference Irec +- irec_tolerance and the relative tolerance is ignored. If None, the relative tolerance is used. It should be above the noise of one Irec acquisition, otherwise every frequency runs max_tune_iterations.
             - filename: The name of the file to save the data to.
             - header: The header to save in the data file, e.g. a description of the experiment and the settings used.
-            - communication_time: The time to wait after each communication with the Nanonis system, to ensure that the system has time to process the command and update the values. This can help to prevent errors due to too fast communication. TODO: find value!
+            - communication_time: The round-trip time of a Nanonis command in seconds, used to plan the bias ramps. If None, it is measured by the latency profiler at startup (latency_statistic of Bias.Set). Without nanonis_address nothing is cached, so every construction times each profiled command latency_profiler.num_samples times (5 x 50 round trips by default, Bias.Set re-applies the present bias).
             - slew_rate: The maximum slew rate to use for the voltage changes, to protect the tip and sample. This can be used in the ramping functions to ensure that the voltage is changed in a way that does not exceed this slew rate.       
+            - bias_approach: The strategy to increase the bias until the current setpoint is reached while the z-controller is off. Options are "galloping" (exponential search and bisection using the exponential I-V relation) and "linear" (steps of slew_rate * communication_time), or a BiasApproach object.
+            - max_bias_step: The largest bias change of a single Bias.Set call when ramping the bias, in Volts. Larger changes are split into points that are sent at deadlines given by the slew rate.
+            - clock: The clock used for all waiting (RealClock if None). A VirtualClock lets simulated runs advance time instantly. The async variants (async_ramp_bias, async_turn_off_z_controller_and_wait) wait with asyncio in real time and raise a ValueError for other clocks.
+            - latency_profiler: The LatencyProfiler measuring the Nanonis round-trip times (a new one with default settings if None).
+            - nanonis_address: The tuple (host, port) of the Nanonis TCP interface, used as key for the cached latencies. The latencies are measured at every startup if None.
+            - latency_statistic: The statistic of the measured Bias.Set round trips used as communication time: "p99" (default), "median", "mean" or "min". The ramp points are sent at fixed deadlines one step interval apart, so with the median every second Bias.Set would arrive after its deadline and the ramp falls behind; the p99 keeps almost all points on time.
+            - state_cache: If true, repeated getters of values only changed by the measurement (bias, setpoint, switch-off delay, z-controller state) are served from a cache, which is updated by the own setters (see CachedNanonisModules).
+            - state_cache_max_age: The time after which a cached value is read from Nanonis again in seconds, to notice changes by the hardware or the user.
+            - coalesce_writes: If true, setter calls which would not change the known Nanonis state are not sent, and consecutive writes of settings are merged. This enables the state cache, which provides the known state.
+            - async_client: A connected AsyncNanonisClient (on its own Nanonis TCP port) used by the async variants of the hot loops: async_ramp_bias, async_get_irec and async_turn_off_z_controller_and_wait.
+            - profile_commands: If true, every Nanonis and AWG command is timed and the call counts and latency histograms are saved next to the measurement data (see CommandProfiler). Nothing is wrapped if false.
+            - trace_spans: If true, the phases of the measurement (atom tracking, z-controller off, bias ramps, AWG configuration, settling, tuning iterations, acquisitions) are recorded as spans and saved as Chrome trace / Perfetto JSON next to the measurement data (see SpanTracer).
+            - atom_tracking_scheduler: The strategy deciding when the atom is tracked during the sweep. Options are "interval" (every atom_tracking_interval points) and "drift" (only if the drift estimated from the current with the AWG output off or from the tip positions of the trackings exceeds a threshold), or an AtomTrackingScheduler object.
+            - drift_threshold: The relative change of the current with the AWG output off which triggers an atom tracking with the "drift" scheduler.
+            - max_atom_tracking_interval: The maximum number of points between two trackings with the "drift" scheduler (4 * atom_tracking_interval if None).
+            - drift_check_time: The averaging time of the current measurement of the drift check in seconds. With continuous_output, every drift check also mutes the output and waits awg_settling_time (see measure_drift_current), which is included in estimate_sweep_duration.
+            - stream_file: The path of a JSON Lines file to which every measured row is appended (and synced to disk) as soon as it is measured, so an interrupted sweep is not lost (see DataStreamWriter). No file is written if None.
+            - resume: If true and the stream_file exists, the rows of the interrupted sweep are loaded and their frequencies are skipped.
+            - log_frequency_distance: If true, the "closest" guess mode compares frequencies on a logarithmic scale (ratio instead of difference).
+            - frequency_match_tolerance: The relative tolerance within which the "known" guess mode treats an old frequency as the desired frequency.
+            - sweep_order: The order in which the frequencies are measured. Options are "given" (the order of sweep_frequencies), "sorted" (ascending), "bisection" (lowest and highest frequency first, then the middle of the gaps, coarse to fine) and "amplitude" (ascending predicted compensation amplitude, needs old_compensation_amplitudes), or a SweepPlanner object. The results are always saved in the order of sweep_frequencies.
+            - tracking_deferral: The maximum number of points a due atom tracking may be postponed to the point before the largest step (in predicted amplitude or frequency) of the planned order, where the starting guess is poor anyway. 0 tracks immediately.
+            - output_format: The format written by save_data. Options are "json" (one JSON file), "columnar" (a directory with one .npy file per column and a JSON sidecar with the settings, see save_columns and load_columns) and "both".
         """
                 
         # dummy parameters (TODO: should be used with the constructor)
         self.max_allowed_amplitude = 1 # maximum allowed amplitude in Volts to protect the sample and tip, TODO: find better parameter for this, maybe based on the recorded Irec values for the reference amplitudes
-        self.communication_time = communication_time # time to wait after each communication with the Nanonis system, to ensure that the system has time to process the command and update the values. This can help to prevent errors due to too fast communication. TODO: find value!
+        self.clock = clock if clock is not None else RealClock() # all waiting goes through the clock
+
+        # command latency histograms, the modules are only wrapped if enabled
+        self.command_profiler = CommandProfiler(self.clock) if profile_commands else None
+        if self.command_profiler is not None:
+            awg_reference = ProfiledModule("AWG", awg_reference, self.command_profiler)
+            nanonis_module = ProfiledNanonisModules(nanonis_module, self.command_profiler)
+
+        # timeline of the measurement phases, spans are no-ops if disabled
+        self.tracer = SpanTracer(self.clock, enabled=trace_spans)
         
         # AWG parameters
         self.awg = awg_reference
         self.awg_settling_time = awg_settling_time
+        self.settle_detection = settle_detection
+        self.settle_detector = SettleDetector(sample_interval=settle_sample_interval, window_size=settle_window_size,
+                                              relative_threshold=settle_relative_threshold)
+        self.reference_settle_time = None
         self.granularity_frequency = granularity_frequency
         self.lockin_frequency = lockin_frequency
-
-        # create integrator
+        self.continuous_output = continuous_output
+        self.waveform_cache = waveform_cache
+        self.continuous_awg = None # segment based output, used for continuous output and cached waveforms
+        if continuous_output or waveform_cache is not None or pipelined_sweep:
+            # fail here and not in the middle of the sweep if the AWG driver has no segment API
+            missing_methods = missing_segment_methods(self.awg)
+            if len(missing_methods) > 0:
+                raise ValueError(f"continuous_output, pipelined_sweep and waveform_cache need an AWG with segment support, {type(self.awg).__name__} is missing {', '.join(missing_methods)}.")
+            self.continuous_awg = ContinuousSweepAWG(self.awg, granularity_frequency, lockin_frequency, waveform_cache=waveform_cache)
+            # the continuous output creates its own cache if none is given, its statistics are saved as well
+            self.waveform_cache = self.continuous_awg.waveform_cache
+        self.sweep_executor = PipelinedSweepExecutor(self.continuous_awg, self.clock) if pipelined_sweep else None
+        self.next_frequency = None # frequency measured after the current one, prepared by the sweep executor
+
+        # create integrator, one update per tuning iteration
         self.tuning_controller = PIController(Kp=tuning_pgain, Ti=tuning_integration_time_constant, 
-                                              dt=0.1, V_min=0.1, V_max=self.max_allowed_amplitude)
+                                              dt=awg_settling_time + integration_time, V_min=0.1, V_max=self.max_allowed_amplitude)
         self.irec_tolerance = irec_tolerance
+        self.tolerance = tolerance
+        self.max_tune_iterations = max_tune_iterations
+
+        # tuning strategy
+        if isinstance(tuning_strategy, TuningStrategy):
+            self.tuning_strategy = tuning_strategy
+        elif tuning_strategy == "pi":
+            self.tuning_strategy = PITuningStrategy(self.tuning_controller)
+        elif tuning_strategy == "secant":
+            self.tuning_strategy = SecantTuningStrategy(V_min=0.1, V_max=self.max_allowed_amplitude)
+        else:
+            raise ValueError(f"Invalid tuning strategy: {tuning_strategy}. Valid options are 'secant', 'pi' or a TuningStrategy object.")
 
 
         # nanonis        
-        self.nanonis_module = nanonis_module
+        self.uncached_nanonis_module = nanonis_module
+        if state_cache or coalesce_writes:
+            self.nanonis_module = CachedNanonisModules(nanonis_module, self.clock, max_age=state_cache_max_age,
+                                                       coalesce_writes=coalesce_writes)
+        else:
+            self.nanonis_module = nanonis_module
         self.height_averaging_time = height_averaging_time
         self.integration_time = integration_time
         self.current_index = 1 # TODO: find from nanonis
 
+        self.async_client = async_client
+
+        # round-trip time of the Nanonis commands, measured once per machine if not given
+        self.latency_profiler = latency_profiler if latency_profiler is not None else LatencyProfiler()
+        self.nanonis_address = nanonis_address
+        self.latency_profile = None
+        if latency_statistic not in ("p99", "median", "mean", "min"):
+            raise ValueError(f"Invalid latency statistic: {latency_statistic}. Valid options are 'p99', 'median', 'mean' or 'min'.")
+        self.latency_statistic = latency_statistic
+        if communication_time is None:
+            self.profile_latency()
+        else:
+            self.communication_time = communication_time
+        self.adaptive_integration = adaptive_integration
+        self.sequential_acquisition = SequentialAcquisition(burst_time=adaptive_burst_time, confidence_z=adaptive_confidence_z)
+        self.last_irec_acquisition_time = 0.0 # averaging time used by the last call of get_irec
+        self.last_irec_elapsed_time = 0.0 # clock time of the last call of get_irec, including the round-trips
+        self.combined_acquisition = combined_acquisition
+        self.last_readout = None # all signals read by the last call of get_irec
+        self.final_tuning_readout = None # readout of the final tuning iteration, reused for logging
+        self.final_tuning_acquisition_time = 0.0
+
         # get current nanonis settings
         x_pos, y_pos = self.nanonis_module.FolMe.XYPosGet(Wait_for_newest_data=True)
         self.initial_x_position_m = x_pos
@@ -122,11 +282,26 @@ class transferFinder:
         # escape routine
         self.voltage_tolerance = 1e-5
         self.current_tolerance = 0.1e-12
+        self.data_saved_on_error = False # the escape routine saves the recorded data only once
         self.is_in_error_state = False # flag to indicate if the system is in an error state, e.g. due to tip crash or excessive current
         self.escape_routine_voltage_step = 1e-3 # voltage step to apply in the escape routine
         self.escape_routine_current_step = 1e-12 # current step to apply in the escape routine       
         self.escape_routine_time_constant = 0.5  # time step between the update of the bias voltage
         self.slew_rate = slew_rate # maximum slew rate to use for the voltage changes in the escape routine, to protect the tip and sample
+        self.max_bias_step = max_bias_step
+        self.bias_trajectory_executor = BiasTrajectoryExecutor(self.clock)
+        self.ramp_reports = [] # planned vs. achieved profile of every bias ramp
+
+        # bias approach strategy (z-controller off)
+        if isinstance(bias_approach, BiasApproach):
+            self.bias_approach = bias_approach
+        elif bias_approach == "galloping":
+            self.bias_approach = GallopingBiasApproach()
+        elif bias_approach == "linear":
+            self.bias_approach = LinearBiasApproach(voltage_step=self.slew_rate * self.communication_time)
+        else:
+            raise ValueError(f"Invalid bias approach: {bias_approach}. Valid options are 'galloping', 'linear' or a BiasApproach object.")
+        self.approach_results = [] # result of every bias approach, incl. the number of calls
 
         # Sweep parameters:
         self.sweep_frequencies = sweep_frequencies
@@ -145,6 +320,20 @@ class transferFinder:
         self.reference_amplitude = self.reference_STM_amplitude / self.reference_transmission
         self.reference_frequency = reference_frequency
         self.old_compensation_amplitudes = old_compensation_amplitudes
+
+        # sorted frequency indices for the starting amplitude guesses
+        self.frequency_match_tolerance = frequency_match_tolerance
+        self.old_frequency_index = FrequencyIndex(log_distance=log_frequency_distance)
+        if old_compensation_amplitudes is not None:
+            self.old_compensation_amplitudes = np.asarray(old_compensation_amplitudes, dtype=np.float64)
+            self.old_frequency_index.extend(self.old_compensation_amplitudes[:, 0], self.old_compensation_amplitudes[:, 1])
+        self.recorded_frequency_index = FrequencyIndex(log_distance=log_frequency_distance) # frequencies measured in this session
+
+        # smooth model of the compensation amplitude vs. log(frequency) for the "model" guess mode, updated after every point
+        self.amplitude_model = AmplitudeModel()
+        if old_compensation_amplitudes is not None:
+            self.amplitude_model.extend(self.old_compensation_amplitudes[:, 0], self.old_compensation_amplitudes[:, 1])
+        self.last_amplitude_prediction = {} # prediction and uncertainty of the "model" guess mode for the current point
     
    
         # atom tracking
@@ -152,6 +341,34 @@ class transferFinder:
         self.nanonis_module.ATrack.PropsSet(**self.atom_tracking_settings)
         self.atom_tracking_time = atom_tracking_time
         self.atom_tracking_interval = atom_tracking_interval
+        self.drift_check_time = drift_check_time
+        if isinstance(atom_tracking_scheduler, AtomTrackingScheduler):
+            self.atom_tracking_scheduler = atom_tracking_scheduler
+        elif atom_tracking_scheduler == "interval":
+            self.atom_tracking_scheduler = IntervalTrackingScheduler(interval=atom_tracking_interval)
+        elif atom_tracking_scheduler == "drift":
+            if max_atom_tracking_interval is None:
+                max_atom_tracking_interval = 4 * atom_tracking_interval
+            self.atom_tracking_scheduler = DriftTrackingScheduler(current_threshold=drift_threshold, max_interval=max_atom_tracking_interval)
+        else:
+            raise ValueError(f"Invalid atom tracking scheduler: {atom_tracking_scheduler}. Valid options are 'interval', 'drift' or an AtomTrackingScheduler object.")
+        self.tracking_decisions = [] # decision and drift estimates after every point
+        self.tracking_deferral = tracking_deferral
+
+        # order of the sweep
+        if isinstance(sweep_order, SweepPlanner):
+            self.sweep_planner = sweep_order
+        elif sweep_order == "given":
+            self.sweep_planner = GivenOrderPlanner()
+        elif sweep_order == "sorted":
+            self.sweep_planner = SortedPlanner()
+        elif sweep_order == "bisection":
+            self.sweep_planner = BisectionPlanner()
+        elif sweep_order == "amplitude":
+            self.sweep_planner = AmplitudePlanner()
+        else:
+            raise ValueError(f"Invalid sweep order: {sweep_order}. Valid options are 'given', 'sorted', 'bisection', 'amplitude' or a SweepPlanner object.")
+        self.measurement_order = [] # positions in sweep_frequencies in the order they were measured
 
         # logging parameters
         self.start_time = time.strftime("%Y-%m-%d_%H-%M-%S")
@@ -171,11 +388,24 @@ class transferFinder:
         self.nanonis_channels = data_channels
 
         self.recorded_data_headers.extend(self.nanonis_channels)
-        self.recorded_data_values = [] # list of tuples (frequency, tuned_amplitude, current, bias, z_controller_setpoint,...)
+        self.recorded_data_values = MeasurementValues(self.recorded_data_headers) # one row (frequency, tuned_amplitude, current, bias, z_controller_setpoint,...) per frequency
+        self.point_metadata = [] # list of dictionaries with information about each measured point, e.g. the number of tuning iterations
+        self.last_tuning_result = None
+        self.sweep_estimate = None # predicted (and after the sweep the actual) duration of the sweep
+        self.sweep_eta = None
+
+        # streaming of the measured rows, opened at the start of the sweep
+        self.stream_file = stream_file
+        self.resume = resume
+        self.stream_writer = None
+        if output_format not in ["json", "columnar", "both"]:
+            raise ValueError(f"Invalid output format: {output_format}. Valid options are 'json', 'columnar' and 'both'.")
+        self.output_format = output_format
 
         # compensation parameters
         self.amplitude_guess_mode = amplitude_guess_mode
         self.reference_i_rec = None # current value at the reference amplitude
+        self.baseline_i_rec = None # current value without AWG output
 
         # keep track of current desired paramters for the escape routine
         self.current_desired_voltage = self.initial_voltage
@@ -188,6 +418,12 @@ class transferFinder:
                     "atom_tracking_settings": atom_tracking_settings,
                     "atom_tracking_time": atom_tracking_time,
                     "atom_tracking_interval": atom_tracking_interval,
+                    "atom_tracking_scheduler": self.atom_tracking_scheduler.name,
+                    "drift_threshold": drift_threshold,
+                    "max_atom_tracking_interval": max_atom_tracking_interval,
+                    "drift_check_time": drift_check_time,
+                    "sweep_order": self.sweep_planner.name,
+                    "tracking_deferral": tracking_deferral,
                     "data_channels": data_channels,
                     "measurement_voltage": measurement_voltage,
                     "active_state_current": active_state_current,
@@ -200,7 +436,15 @@ class transferFinder:
                                     "switch_off_delay_s": self.initial_z_controler_switch_off_delay_s,
                                     "p_gain": self.initial_z_p_gain,
                                     "time_constant": self.initial_z_time_constant,
-                                   }
+                                   },
+                    "communication_time": self.communication_time,
+                    "latency_statistic": latency_statistic,
+                    "state_cache": state_cache,
+                    "state_cache_max_age": state_cache_max_age,
+                    "coalesce_writes": coalesce_writes,
+                    "latency_profile": self.latency_profile,
+                    "bias_approach": self.bias_approach.name,
+                    "max_bias_step": max_bias_step,
                     }
         
         self.awg_settings = {
@@ -211,6 +455,12 @@ class transferFinder:
                     "reference_frequency": reference_frequency,
                     "reference_STM_amplitude": reference_STM_amplitude,
                     "reference_transmission": reference_transmission,
+                    "settle_detection": settle_detection,
+                    "settle_sample_interval": settle_sample_interval,
+                    "settle_window_size": settle_window_size,
+                    "settle_relative_threshold": settle_relative_threshold,
+                    "continuous_output": continuous_output,
+                    "pipelined_sweep": pipelined_sweep,
                     #"max_sweep_amplitude": max_sweep_amplitude,
                     #"num_sweep_amplitudes": num_sweep_amplitudes,
                 }
@@ -219,7 +469,13 @@ class transferFinder:
                     "tuning_pgain": tuning_pgain,
                     "tuning_integration_time_constant": tuning_integration_time_constant,
                     "irec_tolerance": irec_tolerance,
+                    "tolerance": tolerance,
                     "max_tune_iterations": max_tune_iterations,
+                    "combined_acquisition": combined_acquisition,
+                    "tuning_strategy": self.tuning_strategy.name,
+                    "adaptive_integration": adaptive_integration,
+                    "adaptive_burst_time": adaptive_burst_time,
+                    "adaptive_confidence_z": adaptive_confidence_z,
                 }
 
         print(f"Session path: {self.session_path}")        
@@ -330,35 +586,13 @@ class transferFinder:
         Function that tunes the bias iteratively to a desired voltage
         Args:
             - new_voltage: The desired voltage setpoint in Volts.
-            - time: The total duration of the function in seconds.
+            - time: The minimum duration of the function in seconds. The ramp takes longer if the slew rate requires it.
 
         """
         current_voltage = self.nanonis_module.Bias.Get()
-        diff_voltage = new_voltage - current_voltage
-
-        # ensure slew rate is not exceeded
-        time_from_slew_rate = abs(diff_voltage) / self.slew_rate
-        total_time = max(total_time, time_from_slew_rate)
-
-        # compute voltage increment
-        num_steps = int(np.ceil(diff_voltage / (self.slew_rate * total_time)))       
-        if num_steps == 0:
-            self.nanonis_module.Bias.Set(new_voltage)
-            return 0
-        
-        step_voltage = diff_voltage / num_steps
-        time_per_step = total_time / num_steps
-        additional_waiting_time = time_per_step - self.communication_time
 
         try:
-            for _ in range(num_steps):
-                current_voltage += step_voltage
-                new_voltage = current_voltage - step_voltage
-                self.nanonis_module.Bias.Set(new_voltage)
-
-                if (additional_waiting_time > 0):
-                    time.sleep(additional_waiting_time)
-
+            self.execute_bias_ramp(new_voltage, current_voltage, total_time)
             return 0
         
         except Exception as e:
@@ -366,6 +600,30 @@ class transferFinder:
             print(f"Error in line {e.__traceback__.tb_lineno}")
             self.escape_routine()
 
+    # helper function to send a slew-rate limited bias profile against absolute deadlines
+    def execute_bias_ramp(self, new_voltage, current_voltage, total_time = 0.0):
+        """
+        Function to ramp the bias from current_voltage to new_voltage. The profile is planned with a point every
+        max(communication_time, max_bias_step / slew_rate) and executed by the BiasTrajectoryExecutor.
+        A summary of the planned and achieved profile is added to self.ramp_reports.
+
+        Args:
+            - new_voltage: The bias at the end of the ramp in Volts.
+            - current_voltage: The bias at the start of the ramp in Volts.
+            - total_time: The minimum duration of the ramp in seconds.
+
+        Returns
+            - report (dict): The planned and achieved profile, see BiasTrajectoryExecutor.execute().
+        """
+        step_interval = max(self.communication_time, self.max_bias_step / self.slew_rate)
+        times, voltages = plan_bias_profile(current_voltage, new_voltage, total_time, self.slew_rate, step_interval)
+
+        report = self.bias_trajectory_executor.execute(self.nanonis_module.Bias.Set, times, voltages)
+        summary = self.bias_trajectory_executor.summarize(report)
+        summary["start_voltage"] = float(current_voltage)
+        self.ramp_reports.append(summary)
+        return report
+
     # helper function to achieve a desired current while controler is off
     def ramp_to_current(self, desired_current, desired_voltage):
         """
@@ -379,12 +637,8 @@ class transferFinder:
         # check polarity and set voltage to 0 if polarity does not match
         if not self.check_bias_polarity(desired_voltage):
             self.ramp_bias(0, 0.05) # TODO: find better parameters for the time and voltage step in this function
-        # iteratively adjust voltage until achieve current is above the desired current setpoint
-        voltage_step = self.slew_rate * self.communication_time
-
-        while self.get_irec() < desired_current:            
-            new_voltage = self.nanonis_module.Bias.Get() + voltage_step # TODO: find better strategy for voltage adjustment
-            self.nanonis_module.Bias.Set(new_voltage)
+        # adjust voltage until achieve current is above the desired current setpoint
+        self.approach_current(desired_current, polarity=np.sign(desired_voltage))
 
         return 0
     
@@ -403,22 +657,53 @@ class transferFinder:
     # helper function to tune the voltage to a desired current setpoint
     def tune_voltage_to_current_setpoint(self, current_setpoint):
         """
-        Function to tune the bias voltage to reach a desired current setpoint using a PI controller.
+        Function to tune the bias voltage to reach a desired current setpoint with the bias approach strategy.
 
         Args:
             - current_setpoint: The desired current setpoint in Amperes.
         """
         # find polarity of the desired voltage
         polarity= np.sign(self.current_desired_voltage)
-        voltage_step = self.slew_rate * self.communication_time * polarity
-        set_voltage = self.nanonis_module.Bias.Get()
-
-        while  (current_setpoint - self.get_irec()) > 0:
-            set_voltage += voltage_step
-            self.nanonis_module.Bias.Set(set_voltage)
+        self.approach_current(current_setpoint, polarity)
 
         return 0
 
+    # helper function to increase the bias until the current reaches the desired current (z-controller off)
+    def approach_current(self, desired_current, polarity):
+        """
+        Function to increase the bias magnitude in the direction of the polarity until the current reaches the desired current.
+        The result, incl. the number of measurements and Bias.Set calls, is added to self.approach_results.
+
+        Args:
+            - desired_current: The desired current in Amperes.
+            - polarity: The sign of the bias (+1 or -1).
+
+        Returns
+            - result (dict): The result of the bias approach strategy.
+        """
+        if polarity == 0:
+            raise ValueError("Cannot approach the current setpoint with a bias polarity of 0.")
+
+        start_voltage = self.nanonis_module.Bias.Get()
+        result = self.bias_approach.approach(set_bias=self.set_bias_within_slew_rate,
+                                             read_current=self.get_irec,
+                                             start_voltage=start_voltage,
+                                             polarity=polarity,
+                                             desired_current=desired_current)
+        self.approach_results.append(result)
+        logger.info(f"Bias approach ({result['strategy']}) to {desired_current} A: {result['measurements']} measurements, "
+                    f"{result['bias_set_calls']} Bias.Set calls, final bias {result['voltage']} V.")
+        return result
+
+    # helper function to move the bias in steps of at most max_bias_step, paced by the slew rate
+    def set_bias_within_slew_rate(self, new_voltage, current_voltage):
+        """
+        Returns
+            - num_steps (int): The number of Bias.Set calls.
+        """
+        report = self.execute_bias_ramp(new_voltage, current_voltage)
+        return len(report["sent_times"])
+
     
     # helper function to measure the difference between the current voltage and the desired voltage
     def measure_voltage_difference(self, desired_voltage):
@@ -436,7 +721,7 @@ class transferFinder:
             self.nanonis_module.ZCtl.OnOffSet(0) # turn off z-controller
         
             while self.nanonis_module.ZCtl.OnOffGet() == 1:
-                time.sleep(0.01)
+                self.clock.sleep(0.01)
 
             return 0
         
@@ -444,6 +729,83 @@ class transferFinder:
             print(f"Error while turning off z-controller: {e}. Executing escape routine.")
             self.escape_routine()
 
+    #####################################################
+    ################ Asynchronous variants ##############
+    #####################################################
+
+    # helper function to drop the cached Nanonis state after commands sent by the async client
+    def invalidate_state_cache(self):
+        if isinstance(self.nanonis_module, CachedNanonisModules):
+            self.nanonis_module.state_cache.invalidate()
+
+    # helper function to reject clocks which do not run in real time, the async variants wait on the asyncio event loop
+    def require_real_clock(self, function_name):
+        if not isinstance(self.clock, RealClock):
+            raise ValueError(f"{function_name} waits with asyncio in real time and needs a RealClock, not {type(self.clock).__name__}.")
+
+    async def async_ramp_bias(self, new_voltage, total_time = 0.05):
+        """
+        Variant of ramp_bias using the async client. The points of the profile are sent at their deadlines without waiting
+        for a response (Nanonis is told not to answer), so the step interval is not limited by the round-trip time.
+        Only the last point is acknowledged.
+        The deadlines are taken from self.clock, but the waiting is done by asyncio in real time, so a RealClock is required.
+
+        Args:
+            - new_voltage: The desired voltage setpoint in Volts.
+            - total_time: The minimum duration of the ramp in seconds.
+
+        Returns
+            - summary (dict): The planned vs. achieved profile, as for ramp_bias (also added to self.ramp_reports).
+        """
+        self.require_real_clock("async_ramp_bias")
+        current_voltage = await self.async_client.bias_get()
+        step_interval = self.max_bias_step / self.slew_rate
+        times, voltages = plan_bias_profile(current_voltage, new_voltage, total_time, self.slew_rate, step_interval)
+
+        start_time = self.clock.time()
+        sent_times = []
+        for index in range(len(times)):
+            delay = start_time + times[index] - self.clock.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sent_times.append(self.clock.time() - start_time)
+            await self.async_client.bias_set(voltages[index], response=(index == len(times) - 1))
+        self.invalidate_state_cache()
+
+        report = {
+            "planned_times": times,
+            "planned_voltages": voltages,
+            "sent_times": np.array(sent_times),
+            "sent_voltages": voltages,
+            "sent_indices": np.arange(len(times)),
+            "skipped_points": 0,
+            "achieved_duration": self.clock.time() - start_time,
+        }
+        summary = self.bias_trajectory_executor.summarize(report)
+        summary["start_voltage"] = float(current_voltage)
+        self.ramp_reports.append(summary)
+        return summary
+
+    async def async_get_irec(self, num_samples = 10):
+        """
+        Variant of get_irec without integration time: reads num_samples values of the current with all requests in flight
+        at once and returns their mean.
+        """
+        samples = await self.async_client.sig_val_get_burst(self.current_index, num_samples)
+        return float(np.mean(samples))
+
+    async def async_turn_off_z_controller_and_wait(self, poll_interval = 0.01):
+        """
+        Variant of turn_off_z_controller_and_wait using the async client. The polling waits with asyncio in real time,
+        so a RealClock is required.
+        """
+        self.require_real_clock("async_turn_off_z_controller_and_wait")
+        await self.async_client.z_ctrl_on_off_set(0)
+        while await self.async_client.z_ctrl_on_off_get() == 1:
+            await asyncio.sleep(poll_interval)
+        self.invalidate_state_cache()
+        return 0
+
     # return to default state
     def return_to_starting_state(self):
 
@@ -454,13 +816,14 @@ class transferFinder:
 
         try:
             # TODO: check with Nicolaj for best sequence of operations
+            with self.settings_batch():
     
-            # set off delay to initial value
-            self.nanonis_module.ZCtl.SwitchOffDelaySet(self.initial_z_controler_switch_off_delay_s)
-            self.maneeuver_to_state(self.initial_voltage, self.initial_current_A)
+                # set off delay to initial value
+                self.nanonis_module.ZCtl.SwitchOffDelaySet(self.initial_z_controler_switch_off_delay_s)
+                self.maneeuver_to_state(self.initial_voltage, self.initial_current_A)
 
-            # restore atom tracking settings
-            self.nanonis_module.ATrack.PropsSet(*self.initial_tracking_settings.values())
+                # restore atom tracking settings
+                self.nanonis_module.ATrack.PropsSet(*self.initial_tracking_settings.values())
 
             return 0
 
@@ -468,6 +831,49 @@ class transferFinder:
             print(f"Error while returning to starting state: {e}. Executing escape routine.")
             self.escape_routine()      
  
+    # helper function to merge consecutive writes of Nanonis settings (only with coalesce_writes)
+    def settings_batch(self):
+        if isinstance(self.nanonis_module, CachedNanonisModules) and self.nanonis_module.state_cache.coalesce_writes:
+            return self.nanonis_module.state_cache.batch()
+        return contextlib.nullcontext()
+
+    # helper function to stop the continuous AWG output on the error path
+    def stop_continuous_output(self):
+        if self.continuous_awg is None:
+            return
+        try:
+            if self.continuous_awg.is_playing:
+                self.continuous_awg.stop()
+        except Exception as e:
+            print(f"Error while stopping the continuous AWG output: {e}")
+        finally:
+            self.continuous_awg.is_playing = False
+
+        if self.sweep_executor is not None:
+            try:
+                self.sweep_executor.shutdown()
+            except Exception as e:
+                print(f"Error in the background waveform upload: {e}")
+
+    # helper function to close the data stream and save the recorded data on the error path, only once
+    def save_data_on_error(self):
+        if self.stream_writer is not None:
+            try:
+                self.stream_writer.close()
+            except Exception as e:
+                print(f"Error while closing the data stream: {e}")
+
+        if self.data_saved_on_error:
+            return
+        self.data_saved_on_error = True
+        try:
+            if len(self.measurement_order) != len(self.recorded_data_values):
+                # interrupted sweep, report the measured rows in the order of sweep_frequencies as well
+                self.sort_recorded_data()
+            self.save_data()
+        except Exception as e:
+            print(f"Error while saving the data in the escape routine: {e}")
+
     # if an error occurs, execute this command
     def escape_routine(self):
         """
@@ -475,6 +881,12 @@ class transferFinder:
         Sets the z-controller value to its default position and activates the controller.
     
         """
+        # the continuous output is not stopped after each frequency, stop it before anything else (also before the exit below)
+        self.stop_continuous_output()
+
+        # keep what was measured so far, also before the exit below
+        self.save_data_on_error()
+
         ### REMOVE AFTER TESTING!!! ###
         print("Error occured!")
         exit(1)
@@ -507,7 +919,6 @@ class transferFinder:
             self.escape_routine()
 
         # TODO: what shall happen after recovering?
-        self.save_data()
         exit(1)
 
 
@@ -517,40 +928,47 @@ class transferFinder:
         Function to prepare the measurement.
         """
         try:
-            # TODO: verify sequence
-        
-            if self.atom_tracking_interval < len(self.sweep_frequencies):
-                print("Starting atom tracking.")
-                self.track_atom()
-                
-            # ensure the z_off_delay is set to the desired value
-            self.nanonis_module.ZCtl.SwitchOffDelaySet(self.height_averaging_time)
-            print("Atom tracking finished.")
-
-            # DEBUG ONLY:
-            # move to 2.5 V and 10 pA
-            voltage = 2.5
-            amps = 20e-12
-            self.maneeuver_to_state(voltage, amps)
-
-            print("Moved to 2.5 V and 10 pA for testing purposes. Remove this after testing!!!")
-            time.sleep(5)
-            # move to active state position, if specified
-            if self.active_state_voltage is not None and self.active_state_current is not None:
-                # update current desired parameters for escape routine
-                print(f"Moving to active state given by voltage {self.active_state_voltage} V and current {self.active_state_current} A.")
-                self.current_desired_voltage = self.active_state_voltage
-                self.current_desired_current = self.active_state_current
-                self.maneeuver_to_state(self.active_state_voltage, self.active_state_current)
-
-                print("moved to active state.")
-                time.sleep(10)
-
-            # turn off the z-controller to allow for height averaging
-            self.turn_off_z_controller_and_wait()
-
-            # set measurement voltage
-            self.ramp_bias(self.measurement_voltage)
+            with self.tracer.span("prepare_measurement"):
+                # TODO: verify sequence
+            
+                if self.atom_tracking_interval < len(self.sweep_frequencies):
+                    print("Starting atom tracking.")
+                    self.track_atom()
+                    
+                # ensure the z_off_delay is set to the desired value
+                self.nanonis_module.ZCtl.SwitchOffDelaySet(self.height_averaging_time)
+                print("Atom tracking finished.")
+
+                # DEBUG ONLY:
+                # move to 2.5 V and 10 pA
+                voltage = 2.5
+                amps = 20e-12
+                with self.tracer.span("maneeuver_to_state", voltage=voltage, current=amps):
+                    self.maneeuver_to_state(voltage, amps)
+
+                print("Moved to 2.5 V and 10 pA for testing purposes. Remove this after testing!!!")
+                with self.tracer.span("wait"):
+                    self.clock.sleep(5)
+                # move to active state position, if specified
+                if self.active_state_voltage is not None and self.active_state_current is not None:
+                    # update current desired parameters for escape routine
+                    print(f"Moving to active state given by voltage {self.active_state_voltage} V and current {self.active_state_current} A.")
+                    self.current_desired_voltage = self.active_state_voltage
+                    self.current_desired_current = self.active_state_current
+                    with self.tracer.span("maneeuver_to_state", voltage=self.active_state_voltage, current=self.active_state_current):
+                        self.maneeuver_to_state(self.active_state_voltage, self.active_state_current)
+
+                    print("moved to active state.")
+                    with self.tracer.span("wait"):
+                        self.clock.sleep(10)
+
+                # turn off the z-controller to allow for height averaging
+                with self.tracer.span("z_controller_off"):
+                    self.turn_off_z_controller_and_wait()
+
+                # set measurement voltage
+                with self.tracer.span("bias_ramp", voltage=self.measurement_voltage):
+                    self.ramp_bias(self.measurement_voltage)
 
             return 0
         
@@ -571,13 +989,14 @@ class transferFinder:
             self.nanonis_module.ATrack.CtrlSet('Modulation','off')
         """
         try:
-            # turn modulation and controller on
-            self.nanonis_module.ATrack.CtrlSet('Controller','on')
-
-            # track for the specified time
-            time.sleep(self.atom_tracking_time)
-            # turn modulation and controller off
-            self.nanonis_module.ATrack.CtrlSet('Modulation','off')
+            with self.tracer.span("track_atom", tracking_time=self.atom_tracking_time):
+                # turn modulation and controller on
+                self.nanonis_module.ATrack.CtrlSet('Controller','on')
+
+                # track for the specified time
+                self.clock.sleep(self.atom_tracking_time)
+                # turn modulation and controller off
+                self.nanonis_module.ATrack.CtrlSet('Modulation','off')
             
             return 0
         
@@ -585,6 +1004,37 @@ class transferFinder:
             print(f"Error while tracking atom: {e}. Executing escape routine.")
             self.escape_routine()
 
+    # function to decide if the atom is tracked after a point, the decision is logged
+    def decide_atom_tracking(self, index, frequency, points_since_tracking):
+        """
+        Function to ask the atom tracking scheduler if the atom should be tracked after the point index.
+
+        Returns
+            - decision (dict): "track" (bool), the reason and the drift estimates (see AtomTrackingScheduler.decide).
+        """
+        decision = self.atom_tracking_scheduler.decide(points_since_tracking, self.clock.time(), read_current=self.measure_drift_current)
+        decision = {"index": index, "frequency": float(frequency), "time": self.clock.time(), **decision}
+        self.tracking_decisions.append(decision)
+        logger.info(f"Atom tracking decision after point {index+1}: track {decision['track']} ({decision['reason']}), "
+                    f"current drift {decision['current_drift']}, lateral drift {decision['lateral_drift']} m")
+        return decision
+
+    # helper function to measure the current with the AWG output off, used to detect drift between the points
+    # in continuous mode this also costs an AWG command and the AWG settling time: the rectified current of the playing
+    # output is tuned to the reference after every point and would hide the drift, so the output has to be muted
+    def measure_drift_current(self):
+        with self.tracer.span("drift_check"):
+            if self.continuous_output:
+                # the output keeps playing in continuous mode, it is switched back on by the next frequency
+                self.continuous_awg.mute()
+                self.wait_for_awg_settling()
+            readout = self.nanonis_module.Sig.MeasSig(sig_names=["Current (A)"], averaging_time=self.drift_check_time)
+        return readout["Current (A)"]
+
+    # helper function to read the tip position
+    def get_tip_position(self):
+        return self.nanonis_module.FolMe.XYPosGet(Wait_for_newest_data=True)
+
     #####################################################
     ############### Measurement functions ###############
     #####################################################
@@ -598,27 +1048,111 @@ class transferFinder:
         """
         return self.nanonis_module.Util.SessionPathGet()
 
+    # function to measure the round-trip times of the Nanonis commands
+    def profile_latency(self, force = False):
+        """
+        Function to measure the round-trip times of the commands used during the sweep (or to load them from the cache) and
+        to use the latency_statistic (p99 by default) of the Bias.Set time as communication time for the ramp planning.
+
+        Args:
+            - force: If true, the latencies are measured even if cached values exist.
+
+        Returns
+            - latency_profile (dict): The median, p99, mean and min round-trip time for every profiled command.
+        """
+        self.latency_profile = self.latency_profiler.profile(self.uncached_nanonis_module, self.clock,
+                                                             address=self.nanonis_address,
+                                                             current_index=self.current_index,
+                                                             force=force)
+        self.communication_time = self.latency_profile["Bias.Set"][self.latency_statistic]
+        return self.latency_profile
+
     # function to get the current Irec value
-    def get_irec(self, integration_time = None):
+    def get_irec(self, integration_time = None, tolerance_band = None):
         """
         Function to get the current Irec value.
 
+        Args:
+            - integration_time: The averaging time in seconds. None returns a single sample.
+            - tolerance_band: Tuple (lower, upper) of the Irec tolerance. With adaptive integration enabled, the averaging stops early if the value is clearly outside this band.
+
         Returns
         Irec (float): The recorded Irec value in Amperes.
         """
         
         # no integration time -> single shot
+        start_time = self.clock.time()
         if integration_time is None:
-            return self.nanonis_module.Sig.ValGet(signal_index=self.current_index, wait_for_newest_data=True)
-        
-        readout = self.nanonis_module.Sig.MeasSig(sig_names = ["Current (A)"], averaging_time=integration_time) # returns dictionary with signal names as keys and measured values as values
+            self.last_irec_acquisition_time = 0.0
+            i_rec = self.nanonis_module.Sig.ValGet(signal_index=self.current_index, wait_for_newest_data=True)
+            self.last_irec_elapsed_time = self.clock.time() - start_time
+            return i_rec
+
+        if self.adaptive_integration and tolerance_band is not None:
+            readouts = []
+            burst_times = []
+            def measure_burst(burst_time):
+                i_rec = self.measure_irec(burst_time)
+                readouts.append(self.last_readout)
+                burst_times.append(burst_time)
+                return i_rec
+
+            i_rec, self.last_irec_acquisition_time = self.sequential_acquisition.acquire(
+                                                            measure_burst=measure_burst,
+                                                            integration_time=integration_time,
+                                                            lower_bound=tolerance_band[0],
+                                                            upper_bound=tolerance_band[1])
+            # average all signals over the bursts, weighted by their averaging time
+            self.last_readout = {name: float(np.average([readout[name] for readout in readouts], weights=burst_times)) for name in readouts[0]}
+            self.last_irec_elapsed_time = self.clock.time() - start_time
+            return i_rec
+
+        self.last_irec_acquisition_time = integration_time
+        i_rec = self.measure_irec(integration_time)
+        self.last_irec_elapsed_time = self.clock.time() - start_time
+        return i_rec
+
+    # helper function to average the current (and with combined acquisition all data channels) for a fixed time
+    def measure_irec(self, integration_time):
+        sig_names = ["Current (A)"]
+        if self.combined_acquisition:
+            sig_names += [channel for channel in self.nanonis_channels if channel != "Current (A)"]
+
+        readout = self.nanonis_module.Sig.MeasSig(sig_names = sig_names, averaging_time=integration_time) # returns dictionary with signal names as keys and measured values as values
         
         # if current not in the returned dictionary, raise error
         if "Current (A)" not in readout:
             raise ValueError("Current (A) not found in the measured signals. Check if the channel name is correct and if the signal is properly configured in Nanonis.")
         
+        self.last_readout = readout
         return readout["Current (A)"]
 
+    # function to wait until the current has settled after a change of the AWG output
+    def wait_for_awg_settling(self):
+        """
+        Function to wait after a change of the AWG output. Without settle detection, the fixed awg_settling_time is waited.
+        With settle detection, the current is sampled until it is flat, at most for awg_settling_time.
+
+        Returns
+            - settle_time (float): The time waited in seconds.
+        """
+        if not self.settle_detection:
+            self.clock.sleep(self.awg_settling_time)
+            return self.awg_settling_time
+
+        settle_time, settled = self.settle_detector.wait_until_settled(read_value=self.get_irec, clock=self.clock,
+                                                                       max_time=self.awg_settling_time)
+        if not settled:
+            logger.info(f"Current did not settle within {self.awg_settling_time} s.")
+        return settle_time
+
+    # function to stop the AWG output
+    def stop_awg_output(self):
+        if self.continuous_awg is not None:
+            self.continuous_awg.stop()
+        else:
+            self.awg.stop_playing()
+
     # record Irec at reference amplitude and frequency
     def record_reference_irec(self):
         """
@@ -626,16 +1160,40 @@ class transferFinder:
         This value isused as a reference for the tuning process.
         """
         try:
-            # configure AWG to output the reference signal
-            self.awg.configure_continuous_sine_wave(frequency=self.reference_frequency, 
-                                                    granularity_frequency=self.granularity_frequency,
-                                                    lockin_frequency=self.lockin_frequency, 
-                                                    starting_amplitude=self.reference_amplitude)
-            # activate the output of the AWG and measure at reference amplitude
-            self.awg.start_playing()
-            time.sleep(self.awg_settling_time)
-            self.reference_i_rec = self.get_irec(integration_time=self.integration_time)
-            self.awg.stop_playing()
+            with self.tracer.span("record_reference_irec", frequency=self.reference_frequency):
+                with self.tracer.span("configure_awg", frequency=self.reference_frequency):
+                    if self.continuous_awg is not None:
+                        # in continuous mode, upload the waveforms of the reference and all sweep frequencies once (cached waveforms are skipped)
+                        # otherwise, the sweep waveforms are uploaded on demand or by the sweep executor
+                        if self.continuous_output:
+                            self.continuous_awg.preload([self.reference_frequency] + list(self.sweep_frequencies))
+                        else:
+                            self.continuous_awg.preload([self.reference_frequency])
+                    else:
+                        # configure AWG to output the reference signal
+                        self.awg.configure_continuous_sine_wave(frequency=self.reference_frequency, 
+                                                                granularity_frequency=self.granularity_frequency,
+                                                                lockin_frequency=self.lockin_frequency, 
+                                                                starting_amplitude=self.reference_amplitude)
+                # measure without AWG output, used by the tuning strategy to model Irec vs. amplitude
+                with self.tracer.span("irec_acquisition", output="off"):
+                    self.baseline_i_rec = self.get_irec(integration_time=self.integration_time)
+
+                # activate the output of the AWG and measure at reference amplitude
+                with self.tracer.span("awg_output_on", amplitude=self.reference_amplitude):
+                    if self.continuous_awg is not None:
+                        self.continuous_awg.switch_to(self.reference_frequency, self.reference_amplitude)
+                    else:
+                        self.awg.start_playing()
+                with self.tracer.span("awg_settle"):
+                    self.reference_settle_time = self.wait_for_awg_settling()
+                with self.tracer.span("irec_acquisition", output="reference"):
+                    self.reference_i_rec = self.get_irec(integration_time=self.integration_time)
+
+                # in continuous mode, the output keeps running for the sweep
+                if not self.continuous_output:
+                    with self.tracer.span("awg_output_off"):
+                        self.stop_awg_output()
             
             return 0
             
@@ -678,75 +1236,142 @@ class transferFinder:
             self.escape_routine
             """
    
+    # helper function to get the accepted Irec band around the reference Irec
+    def get_tolerance_band(self, tolerance = None):
+        """
+        Args:
+            - tolerance: A relative tolerance overriding the settings. If None, the absolute irec_tolerance is used if
+                         it is set, otherwise the relative tolerance of the constructor.
+
+        Returns
+            - tolerance_band (tuple): (lower, upper) bound of the accepted Irec in Amperes.
+        """
+        if tolerance is None and self.irec_tolerance is not None:
+            half_width = self.irec_tolerance
+        else:
+            half_width = abs(self.reference_i_rec) * (tolerance if tolerance is not None else self.tolerance)
+        return (self.reference_i_rec - half_width, self.reference_i_rec + half_width)
+
     # function to tune awg amplitude for a specific frequency to match reference irec
     def tune_awg_amplitude_for_frequency(self, frequency, starting_amplitude = 0.1,
-                                         tolerance=0.01, max_iterations=2):
+                                         tolerance = None, max_iterations = None):
         """
         Function to tune the AWG amplitude for a specific frequency to match the reference Irec value (self.reference_i_rec). 
         The function iteratively adjusts the amplitude until the recorded Irec value is within the specified tolerance of the reference Irec.
         Args:
             - frequency (float): The frequency for which to tune the AWG amplitude.
             - starting_amplitude (float): The starting amplitude for the tuning process in Volts.
-            - tolerance (float): The acceptable relative difference between the recorded Irec and the reference Irec
-            - max_iterations (int): The maximum number of iterations to perform to avoid infinite loops.
+            - tolerance (float): The acceptable relative difference between the recorded Irec and the reference Irec. If None, the band of the settings is used (see get_tolerance_band).
+            - max_iterations (int): The maximum number of iterations to perform to avoid infinite loops (self.max_tune_iterations if None).
 
         Returns
         tuned_amplitude (float): The tuned amplitude in microvolts that achieves the desired Irec within the specified tolerance.
         """
+        if max_iterations is None:
+            max_iterations = self.max_tune_iterations
+        self.final_tuning_readout = None
+        self.final_tuning_acquisition_time = 0.0
         try:
-            # TODO: Find proper starting and reference amplitude for the tuning process.
-            # configure AWG to output the reference signal
-            self.awg.configure_continuous_sine_wave(frequency=frequency,
-                                                    granularity_frequency=self.granularity_frequency,
-                                                    lockin_frequency=self.lockin_frequency,
-                                                    starting_amplitude=starting_amplitude,
-                                                )
-
-            # turn on the AWG output
-            self.awg.start_playing()
-            print(f"AWG ON for frequency {frequency} Hz, starting amplitude {starting_amplitude} V")
-            time.sleep(self.awg_settling_time)
-
-            tuned_amplitude = starting_amplitude
-            print("----------------------------------------")
-            print(f"Starting tuning for frequency {frequency} Hz. Starting amplitude: {tuned_amplitude} V, reference Irec: {self.reference_i_rec} A")
-            iteration = 0
-            upper_bound_irec = self.reference_i_rec * (1 + tolerance)
-            lower_bound_irec = self.reference_i_rec * (1 - tolerance)
-
-            i_rec = self.get_irec(integration_time=self.integration_time)
-
-            while ((i_rec > upper_bound_irec or i_rec < lower_bound_irec) 
-                    and iteration < max_iterations):
-                
-                tuned_amplitude = self.tuning_controller.update(I_ref=self.reference_i_rec, I_meas=i_rec)
-                
-                self.awg.update_continuous_sine_wave_amplitude(new_amplitude=tuned_amplitude)
-                time.sleep(self.awg_settling_time)
-                i_rec = self.get_irec(integration_time=self.integration_time)
-                iteration += 1
-                
-                """                
-                # TODO: find better tuning strategy, e.g. proportional control based on the difference between recorded Irec and default Irec, instead of just increasing or decreasing by a fixed percentage
-                # or linear sweep
-                # CAUTION: too much current rips the sample/tip
-                # Nicolaj mentioned something as the momentum method
-                if self.get_irec(integration_time=self.integration_time) > upper_bound_irec:
-                    tuned_amplitude *= 0.9 # decrease amplitude by 10%
-                else:
-                    tuned_amplitude *= 1.1 # increase amplitude by 10%
-
-                # the awg function will clip to the resolution and return the applied value
-                tuned_amplitude = self.awg.update_continuous_sine_wave_amplitude(new_amplitude=tuned_amplitude)
-                time.sleep(self.integration_time)
-                iteration +=1 
-                """
-
-            # turn off the AWG output
-            self.awg.stop_playing()
-
-            # log the result
-            print(f"Tuned amplitude for frequency {frequency} Hz: {tuned_amplitude} V")
+            with self.tracer.span("tune_awg_amplitude_for_frequency", frequency=float(frequency)) as span_args:
+                # TODO: Find proper starting and reference amplitude for the tuning process.
+                with self.tracer.span("configure_awg", frequency=float(frequency)):
+                    if self.continuous_awg is not None:
+                        # switch the output to the preloaded waveform
+                        starting_amplitude = self.continuous_awg.switch_to(frequency, starting_amplitude)
+                    else:
+                        # configure AWG to output the reference signal
+                        self.awg.configure_continuous_sine_wave(frequency=frequency,
+                                                                granularity_frequency=self.granularity_frequency,
+                                                                lockin_frequency=self.lockin_frequency,
+                                                                starting_amplitude=starting_amplitude,
+                                                            )
+
+                        # turn on the AWG output
+                        self.awg.start_playing()
+                print(f"AWG ON for frequency {frequency} Hz, starting amplitude {starting_amplitude} V")
+
+                # prepare the next frequency on the AWG while this one is measured
+                if self.sweep_executor is not None and self.next_frequency is not None:
+                    self.sweep_executor.prefetch(self.next_frequency)
+                with self.tracer.span("awg_settle"):
+                    settle_times = [self.wait_for_awg_settling()]
+
+                tuned_amplitude = starting_amplitude
+                print("----------------------------------------")
+                print(f"Starting tuning for frequency {frequency} Hz. Starting amplitude: {tuned_amplitude} V, reference Irec: {self.reference_i_rec} A")
+                iteration = 0
+                tolerance_band = self.get_tolerance_band(tolerance)
+                lower_bound_irec, upper_bound_irec = tolerance_band
+                with self.tracer.span("irec_acquisition", amplitude=float(tuned_amplitude)) as acquisition_args:
+                    i_rec = self.get_irec(integration_time=self.integration_time, tolerance_band=tolerance_band)
+                    acquisition_args["irec"] = float(i_rec)
+                acquisition_time = self.last_irec_elapsed_time
+                self.tuning_strategy.start(reference_irec=self.reference_i_rec, starting_amplitude=starting_amplitude,
+                                           baseline_irec=self.baseline_i_rec)
+
+                while ((i_rec > upper_bound_irec or i_rec < lower_bound_irec) 
+                        and iteration < max_iterations):
+                    with self.tracer.span("tuning_iteration", iteration=iteration) as iteration_args:
+                        new_amplitude = self.tuning_strategy.next_amplitude(amplitude=tuned_amplitude, irec=i_rec)
+                        
+                        # the awg function will clip to the resolution and return the applied value
+                        with self.tracer.span("set_awg_amplitude", amplitude=float(new_amplitude)):
+                            if self.continuous_awg is not None:
+                                matched_amplitude = self.continuous_awg.set_amplitude(new_amplitude)
+                            else:
+                                matched_amplitude = self.awg.update_continuous_sine_wave_amplitude(new_amplitude=new_amplitude)
+                        if matched_amplitude is not None:
+                            new_amplitude = matched_amplitude
+                        if new_amplitude == tuned_amplitude:
+                            # the amplitude cannot be resolved any finer, measuring again would not change anything
+                            iteration_args["stopped"] = "amplitude resolution"
+                            break
+
+                        tuned_amplitude = new_amplitude
+                        with self.tracer.span("awg_settle"):
+                            settle_times.append(self.wait_for_awg_settling())
+                        with self.tracer.span("irec_acquisition", amplitude=float(tuned_amplitude)) as acquisition_args:
+                            i_rec = self.get_irec(integration_time=self.integration_time, tolerance_band=tolerance_band)
+                            acquisition_args["irec"] = float(i_rec)
+                        acquisition_time += self.last_irec_elapsed_time
+                        iteration += 1
+                    
+                    """                
+                    # TODO: find better tuning strategy, e.g. proportional control based on the difference between recorded Irec and default Irec, instead of just increasing or decreasing by a fixed percentage
+                    # or linear sweep
+                    # CAUTION: too much current rips the sample/tip
+                    # Nicolaj mentioned something as the momentum method
+                    if self.get_irec(integration_time=self.integration_time) > upper_bound_irec:
+                        tuned_amplitude *= 0.9 # decrease amplitude by 10%
+                    else:
+                        tuned_amplitude *= 1.1 # increase amplitude by 10%
+
+                    # the awg function will clip to the resolution and return the applied value
+                    tuned_amplitude = self.awg.update_continuous_sine_wave_amplitude(new_amplitude=tuned_amplitude)
+                    time.sleep(self.integration_time)
+                    iteration +=1 
+                    """
+
+                # keep the readout of the final iteration for logging
+                self.final_tuning_readout = self.last_readout
+                self.final_tuning_acquisition_time = self.last_irec_acquisition_time
+
+                # turn off the AWG output (in continuous mode, the output keeps running for the next frequency)
+                if not self.continuous_output:
+                    with self.tracer.span("awg_output_off"):
+                        self.stop_awg_output()
+
+                # log the result
+                self.last_tuning_result = {
+                    "tuning_iterations": iteration,
+                    "converged": bool(lower_bound_irec <= i_rec <= upper_bound_irec),
+                    "irec_acquisition_time": acquisition_time,
+                    "settle_times": settle_times,
+                    "total_settle_time": sum(settle_times),
+                }
+                span_args.update(tuned_amplitude=float(tuned_amplitude), iterations=iteration,
+                                 converged=self.last_tuning_result["converged"])
+                print(f"Tuned amplitude for frequency {frequency} Hz: {tuned_amplitude} V after {iteration} iterations")
             
             return tuned_amplitude
     
@@ -765,17 +1390,20 @@ class transferFinder:
                 Options are:
                 - "known": use the known transfer function value for the desired frequency
                 - "closest": use the recorded Irec values for the reference amplitudes to find the reference frequency that is closest to the desired frequency, and perform a linear interpolation to estimate the Irec value at the desired frequency, then find the corresponding amplitude.
+                - "model": use the prediction of a smooth model (monotone cubic interpolation over log(frequency), see AmplitudeModel) of all amplitudes recorded so far and the old compensation amplitudes. The prediction and its uncertainty are saved in the point metadata.
                 - "half": assume 0.5 transmission 
                 - "fixed": use a fixed value for the starting amplitude, currently 0.2 V
                 - idea: 50% transmission -> problem: what is the desired amplitude at the output of the channel?
         """
         if mode not in ["known", 
                         "closest", 
+                        "model",
                         "half", 
                         "fixed"]:
-            raise ValueError(f"Invalid mode for estimating starting amplitude: {mode}. Valid options are 'known', 'closest', 'half', 'fixed'.")
+            raise ValueError(f"Invalid mode for estimating starting amplitude: {mode}. Valid options are 'known', 'closest', 'model', 'half', 'fixed'.")
         
         starting_amplitude = 0
+        self.last_amplitude_prediction = {}
         if mode == "known":
             # could be modified to not only use the same but a close old frequency
 
@@ -783,27 +1411,30 @@ class transferFinder:
             if self.old_compensation_amplitudes is None:
                 raise ValueError("No old compensation amplitudes provided for 'known' mode. Please provide a list of previously evaluated frequencies and their corresponding compensation amplitudes.")
             # check if frequency is within the old transfer function range (1.st column)
-            old_frequencies = self.old_compensation_amplitudes[:, 0]
-            old_amplitudes = self.old_compensation_amplitudes[:, 1]
-
-            if frequency in old_frequencies:
+            match = self.old_frequency_index.match(frequency, rtol=self.frequency_match_tolerance)
+            if match is not None:
                 # if the frequency is already in the old transfer function, use the corresponding transfer function value to estimate the starting amplitude
-                idx = np.where(old_frequencies == frequency)[0][0]
-                starting_amplitude = old_amplitudes[idx]
+                starting_amplitude = match[1]
     
         if mode == "closest":
             # find the transfer function value for the closest frequency of previously evaluated frequencies
-            if len(self.recorded_data_values) > 0:
-                recorded_frequencies = [ data[0] for data in self.recorded_data_values]
-                recorded_amplitudes = [ data[1] for data in self.recorded_data_values]
-
-                closest_index = np.argmin(np.abs(np.array(recorded_frequencies) - frequency))
-                starting_amplitude = recorded_amplitudes[closest_index]
+            if len(self.recorded_frequency_index) > 0:
+                starting_amplitude = self.recorded_frequency_index.nearest(frequency)[1]
             
             else:
                 # if there are no previously recorded frequencies, use the default amplitude as a starting point
                 starting_amplitude = 0.2 # As for fixed value, TODO: find better value
     
+        if mode == "model":
+            prediction = self.amplitude_model.predict(frequency)
+            if prediction is not None:
+                starting_amplitude, uncertainty = prediction
+                self.last_amplitude_prediction = {"predicted_amplitude": starting_amplitude, "prediction_uncertainty": uncertainty}
+                print(f"Model prediction for frequency {frequency} Hz: {starting_amplitude} V +- {uncertainty} V ({len(self.amplitude_model)} points)")
+            else:
+                # no amplitudes known yet, same default as for "closest"
+                starting_amplitude = 0.2
+
         if mode == "fixed":
             starting_amplitude = 0.2 # fixed value for testing, TODO: find better parameter for this
 
@@ -821,22 +1452,35 @@ class transferFinder:
         Loggs all desired values and adds the row to the recorded data list.
         """
         try:
-            starting_amplitude = self.estimate_starting_amplitude_for_frequency(frequency=frequency, mode=self.amplitude_guess_mode)
-            #print(f"Estimated starting amplitude for frequency {frequency} Hz: {starting_amplitude} V using mode {self.amplitude_guess_mode}")
-            tuned_amplitude = self.tune_awg_amplitude_for_frequency(frequency=frequency, starting_amplitude=starting_amplitude)
-
-            # get data for all elements in the data_indices list and add the values to the recorded data list
-            values = self.nanonis_module.Sig.MeasSig(sig_names = self.nanonis_channels, averaging_time=self.integration_time) # returns dictionary with signal names as keys and measured values as values
-
-            data_list = [frequency, tuned_amplitude]
-            
-            for channel in self.nanonis_channels:
-                # if channel not in the returned dictionary, raise error
-                if channel not in values:
-                    raise ValueError(f"{channel} not found in the measured signals. Check if the channel name is correct and if the signal is properly configured in Nanonis.")
-                data_list.append(values[channel])
+            with self.tracer.span("measure_transfer_function_for_frequency", frequency=float(frequency)):
+                starting_amplitude = self.estimate_starting_amplitude_for_frequency(frequency=frequency, mode=self.amplitude_guess_mode)
+                #print(f"Estimated starting amplitude for frequency {frequency} Hz: {starting_amplitude} V using mode {self.amplitude_guess_mode}")
+                tuned_amplitude = self.tune_awg_amplitude_for_frequency(frequency=frequency, starting_amplitude=starting_amplitude,
+                                                                        max_iterations=self.max_tune_iterations)
+
+                # get data for all elements in the data_indices list and add the values to the recorded data list
+                if (self.combined_acquisition and self.final_tuning_readout is not None
+                        and self.final_tuning_acquisition_time >= self.integration_time * (1 - 1e-9)):
+                    # the final tuning iteration already read all channels for the full integration time
+                    values = self.final_tuning_readout
+                else:
+                    with self.tracer.span("logging_acquisition"):
+                        values = self.nanonis_module.Sig.MeasSig(sig_names = self.nanonis_channels, averaging_time=self.integration_time) # returns dictionary with signal names as keys and measured values as values
 
-            self.recorded_data_values.append(data_list)
+                data_list = [frequency, tuned_amplitude]
+                
+                for channel in self.nanonis_channels:
+                    # if channel not in the returned dictionary, raise error
+                    if channel not in values:
+                        raise ValueError(f"{channel} not found in the measured signals. Check if the channel name is correct and if the signal is properly configured in Nanonis.")
+                    data_list.append(values[channel])
+
+                self.recorded_data_values.add_values(data_list)
+                self.recorded_frequency_index.add(frequency, tuned_amplitude)
+                self.amplitude_model.add(frequency, tuned_amplitude)
+                self.point_metadata.append({"frequency": frequency, **self.last_tuning_result, **self.last_amplitude_prediction})
+                if self.stream_writer is not None:
+                    self.stream_writer.write_row(data_list, self.point_metadata[-1])
             return 0
 
         except Exception as e:
@@ -844,6 +1488,151 @@ class transferFinder:
             self.escape_routine()
 
 
+    # function to open the data stream (and load the rows of an interrupted sweep)
+    def start_data_stream(self):
+        """
+        Function to open the JSON Lines stream of the measured rows and write the header record. With resume, the rows
+        of the interrupted sweep in stream_file are added to the recorded data and their frequencies are skipped.
+        Only the last sweep of the file is resumed, and only if it did not finish. Otherwise an existing stream_file
+        is renamed (e.g. sweep.jsonl -> sweep_1.jsonl) and a new stream is started.
+
+        Returns
+            - frequencies (list of float): The sweep frequencies which still have to be measured.
+        """
+        if self.stream_file is None:
+            return list(self.sweep_frequencies)
+
+        completed_frequencies = FrequencyIndex()
+        resuming = False
+        if self.resume and os.path.exists(self.stream_file):
+            headers, rows, finished = read_data_stream(self.stream_file)
+            resuming = len(headers) > 0 and not finished
+            if not resuming:
+                print(f"Not resuming {self.stream_file}: the last sweep {'finished' if finished else 'has no header'}.")
+        if not resuming and os.path.exists(self.stream_file):
+            rotated_filename = rotate_file(self.stream_file)
+            print(f"Moved the existing stream {self.stream_file} to {rotated_filename}.")
+
+        if resuming:
+            if headers[-1]["channel_names"] != self.recorded_data_headers:
+                raise ValueError(f"Cannot resume {self.stream_file}: the channels {headers[-1]['channel_names']} differ from {self.recorded_data_headers}.")
+            rows = last_sweep_rows(headers, rows)
+            for row in rows:
+                self.recorded_data_values.add_values(row["values"])
+                self.recorded_frequency_index.add(row["values"][0], row["values"][1])
+                self.amplitude_model.add(row["values"][0], row["values"][1])
+                if row["metadata"] is not None:
+                    self.point_metadata.append(row["metadata"])
+            completed_frequencies.extend([row["values"][0] for row in rows], [None] * len(rows))
+            print(f"Resuming {self.stream_file}: {len(rows)} frequencies already measured.")
+
+        frequencies = [frequency for frequency in self.sweep_frequencies
+                       if completed_frequencies.match(frequency, rtol=1e-12) is None]
+
+        self.stream_writer = DataStreamWriter(self.stream_file)
+        self.stream_writer.write_header({
+            "type": "transfer_function_stream",
+            "version": self.version,
+            "header": f"{self.header}",
+            "start_time": f"{self.start_time}",
+            "resumed": resuming,
+            "channel_names": self.recorded_data_headers,
+            "sweep_frequencies": [float(frequency) for frequency in self.sweep_frequencies],
+            "nanonis_measurement_settings": self.nanonis_settings,
+            "awg_settings": self.awg_settings,
+            "tuning_settings": self.tuning_settings,
+            "reference_i_rec": self.reference_i_rec,
+            "baseline_i_rec": self.baseline_i_rec,
+        })
+        return frequencies
+
+    # function to order the frequencies of the sweep
+    def plan_sweep(self, frequencies):
+        """
+        Function to reorder the frequencies with the sweep planner. The predicted amplitudes come from the amplitude
+        model (old compensation amplitudes and resumed points).
+
+        Returns
+            - frequencies (list of float): The frequencies in the order they are measured.
+            - transitions (list of float): The step from every point to the next one (see SweepPlanner.transition_sizes).
+        """
+        predict = self.predict_compensation_amplitude if len(self.amplitude_model) > 0 else None
+        order = self.sweep_planner.plan(frequencies, predict=predict)
+        frequencies = [frequencies[index] for index in order]
+        transitions = self.sweep_planner.transition_sizes(frequencies, predict=predict)
+        logger.info(f"Sweep order ({self.sweep_planner.name}): {frequencies}")
+        return frequencies, transitions
+
+    # helper function to get the predicted compensation amplitude of the amplitude model, None if unknown
+    def predict_compensation_amplitude(self, frequency):
+        prediction = self.amplitude_model.predict(frequency)
+        return None if prediction is None else prediction[0]
+
+    # function to sort the recorded rows into the order of sweep_frequencies
+    def sort_recorded_data(self):
+        """
+        Function to sort the recorded values and the point metadata into the order of sweep_frequencies, whatever
+        order they were measured in. The positions in the measured order are kept in measurement_order.
+        """
+        sweep_positions = FrequencyIndex()
+        sweep_positions.extend(self.sweep_frequencies, range(len(self.sweep_frequencies)))
+        positions = []
+        for frequency in self.recorded_data_values.column(self.recorded_data_headers[0]):
+            match = sweep_positions.match(frequency, rtol=1e-12)
+            # rows which are not in sweep_frequencies are kept at the end
+            positions.append(match[1] if match is not None else len(self.sweep_frequencies))
+        self.measurement_order = [int(position) for position in positions]
+
+        order = np.argsort(positions, kind="stable")
+        self.recorded_data_values.reorder(order)
+        if len(self.point_metadata) == len(order):
+            self.point_metadata = [self.point_metadata[index] for index in order]
+
+    # function to predict the duration of the sweep
+    def estimate_sweep_duration(self, awg_command_time = 0.0, expected_iterations = None, num_frequencies = None):
+        """
+        Function to predict the duration of measure_transfer_function_for_all_frequencies from the settings and the
+        measured Nanonis round-trip times, e.g. to check that the sweep fits into the time the tip is stable.
+
+        Args:
+            - awg_command_time: The time of one AWG command in seconds (frequency or amplitude change).
+            - expected_iterations: The expected mean number of tuning iterations per frequency. If None, the mean of the
+                                   already measured frequencies is used (one iteration if there are none).
+            - num_frequencies: The number of frequencies to measure (all sweep frequencies if None).
+
+        Returns
+            - estimate (dict): The expected duration and the upper bound in seconds (see SweepDurationEstimator.estimate).
+        """
+        if expected_iterations is None:
+            iterations = [metadata["tuning_iterations"] for metadata in self.point_metadata]
+            expected_iterations = float(np.mean(iterations)) if len(iterations) > 0 else 1.0
+
+        # the acquisitions are limited by the Sig.MeasSig round trip, which is not profiled (it takes the averaging time)
+        command_time = self.communication_time
+        if self.latency_profile is not None and "Sig.ValGet" in self.latency_profile:
+            command_time = self.latency_profile["Sig.ValGet"]["median"]
+
+        # the drift check reads the current after every point, in continuous mode the output is muted and settled before
+        drift_check_time = 0.0
+        if self.atom_tracking_scheduler.reads_current:
+            drift_check_time = self.drift_check_time + command_time
+            if self.continuous_output:
+                drift_check_time += awg_command_time + self.awg_settling_time
+
+        estimator = SweepDurationEstimator(integration_time=self.integration_time,
+                                           awg_settling_time=self.awg_settling_time,
+                                           max_tune_iterations=self.max_tune_iterations,
+                                           atom_tracking_interval=self.atom_tracking_interval,
+                                           atom_tracking_time=self.atom_tracking_time,
+                                           command_time=command_time,
+                                           awg_command_time=awg_command_time,
+                                           expected_iterations=expected_iterations,
+                                           combined_acquisition=self.combined_acquisition,
+                                           drift_check_time=drift_check_time)
+        if num_frequencies is None:
+            num_frequencies = len(self.sweep_frequencies)
+        return estimator.estimate(num_frequencies)
+
     # function to actually measure the transfer function for the specified frequencies
     def measure_transfer_function_for_all_frequencies(self):
         """
@@ -854,21 +1643,72 @@ class transferFinder:
         """
 
         try:
+            # open the data stream, when resuming only the missing frequencies are measured
+            frequencies = self.start_data_stream()
+            frequencies, transitions = self.plan_sweep(frequencies)
+
+            # predict the duration, updated from the observed cost per point during the sweep
+            self.sweep_estimate = self.estimate_sweep_duration(num_frequencies=len(frequencies))
+            print(f"Estimated sweep duration: {format_duration(self.sweep_estimate['expected'])} "
+                  f"(at most {format_duration(self.sweep_estimate['upper_bound'])}) for {len(frequencies)} frequencies.")
+            sweep_start_time = self.clock.time()
+            self.sweep_eta = SweepETA(num_points=len(frequencies),
+                                      expected_point_duration=self.sweep_estimate["expected"] / max(len(frequencies), 1),
+                                      start_time=sweep_start_time)
+            self.atom_tracking_scheduler.start(sweep_start_time)
+            points_since_tracking = 0
+            tracking_position = None # point after which the due tracking is executed
+
             # iterate over all frequencies and measure the transfer function for each frequency
-            for index, frequency in enumerate(self.sweep_frequencies):
-                #print(f"Measuring transfer function for frequency {frequency} Hz ({index+1}/{len(self.sweep_frequencies)})")
+            for index, frequency in enumerate(frequencies):
+                #print(f"Measuring transfer function for frequency {frequency} Hz ({index+1}/{len(frequencies)})")
                 
+                if self.sweep_executor is not None:
+                    # the waveform of this frequency has to be ready before switching to it
+                    self.sweep_executor.wait()
+                    self.next_frequency = frequencies[index+1] if index+1 < len(frequencies) else None
+
                 # perform the measurement
                 self.measure_transfer_function_for_frequency(frequency)
 
-                # execute atom tracking after a specified number of measurement steps
-                if (index+1) % self.atom_tracking_interval == 0:
+                # execute atom tracking when the scheduler asks for it, possibly postponed to a point before a large step
+                points_since_tracking += 1
+                if tracking_position is None:
+                    decision = self.decide_atom_tracking(index, frequency, points_since_tracking)
+                    if decision["track"]:
+                        tracking_position = self.sweep_planner.tracking_position(transitions, index, self.tracking_deferral)
+                        decision["tracking_index"] = tracking_position
+                        if tracking_position > index:
+                            print(f"Atom tracking due ({decision['reason']}), postponed by {tracking_position - index} points.")
+                if tracking_position is not None and index >= tracking_position:
                     print(f"Executing atom tracking after {index+1} measurement steps.")
 
                     # TODO: Do/Check anything on AWG?
+                    if self.continuous_output:
+                        # do not disturb the tracking with the output of the last frequency
+                        self.continuous_awg.mute()
 
                     # tracking
                     self.track_atom()
+                    self.atom_tracking_scheduler.tracked(self.clock.time(), read_position=self.get_tip_position)
+                    points_since_tracking = 0
+                    tracking_position = None
+
+                remaining_time = self.sweep_eta.update(index+1, self.clock.time())
+                print(f"Measured {index+1}/{len(frequencies)} frequencies, ETA {format_duration(remaining_time)}")
+
+            self.sweep_estimate["actual"] = self.clock.time() - sweep_start_time
+            self.sort_recorded_data()
+            print(f"Sweep finished after {format_duration(self.sweep_estimate['actual'])} "
+                  f"(estimated {format_duration(self.sweep_estimate['expected'])}).")
+            if self.stream_writer is not None:
+                self.stream_writer.write_end({"end_time": time.strftime("%Y-%m-%d_%H-%M-%S"), "sweep_duration_estimate": self.sweep_estimate})
+                self.stream_writer.close()
+
+            if self.sweep_executor is not None:
+                self.sweep_executor.shutdown()
+            if self.continuous_output:
+                self.continuous_awg.stop()
 
             # return to default state after the measurement is done
             self.return_to_starting_state()
@@ -982,45 +1822,104 @@ class transferFinder:
         data_to_dump["awg_settings"] = self.awg_settings
         data_to_dump["tuning_settings"] = self.tuning_settings
         data_to_dump["reference_i_rec"] = self.reference_i_rec
-
-        # TODO: also save settings
-        with open(filename, 'w') as f:
+        data_to_dump["baseline_i_rec"] = self.baseline_i_rec
+        data_to_dump["reference_settle_time"] = self.reference_settle_time
+        data_to_dump["point_metadata"] = self.point_metadata
+        data_to_dump["approach_results"] = self.approach_results
+        data_to_dump["tracking_decisions"] = self.tracking_decisions
+        data_to_dump["measurement_order"] = self.measurement_order
+        data_to_dump["ramp_reports"] = self.ramp_reports
+        data_to_dump["sweep_duration_estimate"] = self.sweep_estimate
+        if isinstance(self.nanonis_module, CachedNanonisModules):
+            data_to_dump["state_cache_statistics"] = self.nanonis_module.state_cache.statistics()
+        if self.waveform_cache is not None:
+            data_to_dump["waveform_cache_statistics"] = self.waveform_cache.statistics()
+
+        if self.output_format in ("json", "both"):
+            # TODO: also save settings
+            with open(filename, 'w') as f:
 
   
 
-            f.write(json.dumps(data_to_dump, indent=4)[:-1]+",\n") # remove the last closing curly brace to add the data
+                f.write(json.dumps(data_to_dump, indent=4)[:-1]+",\n") # remove the last closing curly brace to add the data
 
-            # data section
-            f.write('"data": {\n')
+                # data section
+                f.write('"data": {\n')
 
-            # data headers
-            f.write('\t"channel names": ' + json.dumps(self.recorded_data_headers) + ",\n")
+                # data headers
+                f.write('\t"channel names": ' + json.dumps(self.recorded_data_headers) + ",\n")
             
-            # data
-            f.write('\t"values": [\n') # start of values list
-            for index in range(len(self.recorded_data_values)):
-                data_values = self.recorded_data_values[index]
-                line = "\t\t" + json.dumps(data_values) # convert list of values to json string and add indentation for better readability
+                # data
+                f.write('\t"values": [\n') # start of values list
+                for index in range(len(self.recorded_data_values)):
+                    data_values = self.recorded_data_values[index]
+                    line = "\t\t" + json.dumps(data_values) # convert list of values to json string and add indentation for better readability
                
-                # add comma after each line except the last one
-                if index < len(self.recorded_data_values)-1:
-                    line += "," 
+                    # add comma after each line except the last one
+                    if index < len(self.recorded_data_values)-1:
+                        line += "," 
+
+                    f.write(line + "\n")
+
+                # end values list and data section
+                f.write("\t\t]\n")
+                f.write("\t}\n")
 
-                f.write(line + "\n")
+                # end of json file
+                f.write("}\n")
 
-            # end values list and data section
-            f.write("\t\t]\n")
-            f.write("\t}\n")
 
-            # end of json file
-            f.write("}\n")
+            logger.info(f"Data saved to {filename}.")
 
+        # typed columns and JSON sidecars, loaded with load_columns (memory-mapped)
+        if self.output_format in ("columnar", "both"):
+            columns_directory = f"{self.session_path}/{self.filename}_{current_time}_columns"
+            self.save_columnar_data(columns_directory, data_to_dump)
+            logger.info(f"Columnar data saved to {columns_directory}.")
 
-        logger.info(f"Data saved to {filename}.")
+        # command latency histograms next to the data file
+        if self.command_profiler is not None:
+            profile_filename = f"{self.session_path}/{self.filename}_{current_time}_command_profile.json"
+            with open(profile_filename, 'w') as f:
+                json.dump(self.command_profiler.statistics(), f, indent=4)
+            logger.info(f"Command profile saved to {profile_filename}.")
+
+        # timeline of the measurement phases, open in chrome://tracing or ui.perfetto.dev
+        if self.tracer.enabled:
+            trace_filename = self.tracer.save(f"{self.session_path}/{self.filename}_{current_time}_trace.json")
+            logger.info(f"Trace saved to {trace_filename}.")
 
         return 0
     
 
+    # function to save the recorded data as typed columns
+    def save_columnar_data(self, directory, data_to_dump):
+        """
+        Function to save the recorded values as one column per channel (frequency, compensation amplitude, data channels)
+        plus the timing and tuning metadata of every point, with the remaining data in the JSON sidecar.
+
+        Args:
+            - directory (str): The directory to save the columns to.
+            - data_to_dump (dict): The settings and other data of the measurement, saved in the sidecar.
+        """
+        columns = {name: self.recorded_data_values.column(name) for name in self.recorded_data_headers}
+
+        # per point metadata, one entry per recorded row
+        metadata_columns = {
+            "tuning_iterations": np.int32,
+            "converged": np.bool_,
+            "irec_acquisition_time": np.float64,
+            "total_settle_time": np.float64,
+        }
+        if len(self.point_metadata) == len(self.recorded_data_values):
+            for name, dtype in metadata_columns.items():
+                columns[name] = np.array([metadata[name] for metadata in self.point_metadata], dtype=dtype)
+
+        # the point metadata is stored in the columns
+        sidecar = {key: value for key, value in data_to_dump.items() if key != "point_metadata"}
+        sidecar["channel_names"] = self.recorded_data_headers
+        return save_columns(directory, columns, metadata=sidecar)
+
     # function to read all parameters from an old logging file
     def read_parameters_from_old_measurement(self, filepath):
         """
@@ -0,0 +1,94 @@
+# go one folder up
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import asyncio
+import time
+
+from transfer_finder import transferFinder
+from libs.nanonis.async_client import AsyncNanonisClient
+from libs.simulation.plant_model import STMPlantModel
+from libs.simulation.simulated_nanonis import SimulatedNanonisModules
+from libs.simulation.simulated_awg import SimulatedAWG
+from libs.simulation.simulated_tcp_server import SimulatedNanonisServer
+from libs.timing.clock import RealClock
+from benchmark_sweep import atom_tracking_parameters
+
+# benchmark the pipelined async Nanonis client against blocking request/response on a simulated Nanonis TCP server
+
+async def time_coroutine(coroutine):
+    start_time = time.perf_counter()
+    result = await coroutine
+    return time.perf_counter() - start_time, result
+
+async def blocking_reads(client, num_commands):
+    return [await client.sig_val_get(1) for _ in range(num_commands)]
+
+async def blocking_bias_sets(client, num_commands):
+    for _ in range(num_commands):
+        await client.bias_set(0.5)
+
+async def unacknowledged_bias_sets(client, num_commands):
+    for index in range(num_commands):
+        await client.bias_set(0.5, response=(index == num_commands - 1))
+
+async def benchmark_async_client(port, tf_finder, num_commands, ramp_voltage):
+    async with AsyncNanonisClient(PORT=port) as client:
+        tf_finder.async_client = client
+
+        results = {
+            "Signals.ValGet blocking": await time_coroutine(blocking_reads(client, num_commands)),
+            "Signals.ValGet pipelined": await time_coroutine(client.sig_val_get_burst(1, num_commands)),
+            "Bias.Set blocking": await time_coroutine(blocking_bias_sets(client, num_commands)),
+            "Bias.Set without response": await time_coroutine(unacknowledged_bias_sets(client, num_commands)),
+            "async_turn_off_z_controller_and_wait": await time_coroutine(tf_finder.async_turn_off_z_controller_and_wait()),
+            "async_ramp_bias": await time_coroutine(tf_finder.async_ramp_bias(ramp_voltage)),
+        }
+
+        # an error response (invalid signal index) has to raise, and the following requests still work
+        error = None
+        try:
+            await client.sig_val_get(9999)
+        except Exception as e:
+            error = e
+        assert error is not None, "The error response of Signals.ValGet was not detected."
+        print(f"Error response detected: {error}")
+        await client.sig_val_get(1)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the async Nanonis client on a simulated TCP server.")
+    parser.add_argument("--commands", type=int, default=200, help="number of commands per test")
+    parser.add_argument("--service-time", type=float, default=1e-4, help="processing time per command of the server in seconds")
+    parser.add_argument("--round-trip-delay", type=float, default=2e-3, help="network delay per response in seconds")
+    parser.add_argument("--ramp-voltage", type=float, default=0.55, help="target of the bias ramp in Volts")
+    args = parser.parse_args()
+
+    plant = STMPlantModel(clock=RealClock(), seed=0)
+    nanonis = SimulatedNanonisModules(plant=plant, command_latency=0.0, latency_jitter=0.0, seed=0)
+    server = SimulatedNanonisServer(nanonis, service_time=args.service_time, round_trip_delay=args.round_trip_delay)
+    port = server.start()
+
+    tf_finder = transferFinder(
+        nanonis_module=nanonis,
+        atom_tracking_settings=atom_tracking_parameters,
+        sweep_frequencies=[1e6],
+        reference_frequency=1e4,
+        awg_reference=SimulatedAWG(plant, command_latency=0.0),
+        data_channels=["Input 2 (V)"],
+        communication_time=args.service_time + args.round_trip_delay,
+        slew_rate=1.0,
+    )
+
+    results = asyncio.run(benchmark_async_client(port, tf_finder, args.commands, args.ramp_voltage))
+    server.stop()
+
+    print(f"\n===== {args.commands} commands, {args.service_time * 1e3:.2f} ms service time, {args.round_trip_delay * 1e3:.2f} ms round-trip delay =====")
+    for name, (duration, _) in results.items():
+        print(f"{name}: {duration * 1e3:.1f} ms")
+    ramp = tf_finder.ramp_reports[-1]
+    print(f"Ramp {ramp['start_voltage']:.3f} V -> {ramp['end_voltage']:.3f} V: planned {ramp['planned_duration'] * 1e3:.1f} ms, "
+          f"achieved {ramp['achieved_duration'] * 1e3:.1f} ms, {ramp['sent_points']} points, max lag {ramp['max_lag'] * 1e3:.2f} ms")
@@ -0,0 +1,64 @@
+# go one folder up
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import time
+
+from transfer_finder import transferFinder
+from libs.simulation.simulated_setup import create_simulated_setup
+from libs.timing.clock import VirtualClock
+from benchmark_sweep import atom_tracking_parameters
+
+# benchmark the bias approach (z-controller off) on the simulated Nanonis
+
+def benchmark_bias_approach(bias_approach, start_voltage, desired_current, command_latency=1e-3, seed=0):
+    """
+    Turns off the z-controller at start_voltage and increases the bias until the current reaches desired_current.
+    """
+    clock = VirtualClock()
+    nanonis, awg = create_simulated_setup(plant_settings={"seed": seed, "bias": start_voltage},
+                                          nanonis_settings={"command_latency": command_latency, "seed": seed},
+                                          clock=clock)
+    tf_finder = transferFinder(
+        nanonis_module=nanonis,
+        atom_tracking_settings=atom_tracking_parameters,
+        sweep_frequencies=[1e6],
+        reference_frequency=1e4,
+        awg_reference=awg,
+        data_channels=["Input 2 (V)"],
+        bias_approach=bias_approach,
+        clock=clock,
+    )
+    tf_finder.turn_off_z_controller_and_wait()
+    nanonis.reset_call_counts()
+
+    start_time = time.perf_counter()
+    start_clock_time = clock.time()
+    tf_finder.tune_voltage_to_current_setpoint(desired_current)
+    wall_time = time.perf_counter() - start_time
+
+    result = dict(tf_finder.approach_results[-1])
+    result["measurement_time"] = clock.time() - start_clock_time
+    result["wall_time"] = wall_time
+    result["nanonis_calls"] = nanonis.total_calls()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bias approach strategies on the simulated backend.")
+    parser.add_argument("--start-voltage", type=float, default=0.5, help="bias at which the z-controller is turned off in Volts")
+    parser.add_argument("--currents", type=float, nargs="+", default=[200e-12, 1e-9], help="desired currents in Amperes")
+    parser.add_argument("--latency", type=float, default=1e-3, help="simulated round-trip time per Nanonis command in seconds")
+    parser.add_argument("--strategies", nargs="+", default=["galloping", "linear"], help="bias approach strategies")
+    args = parser.parse_args()
+
+    for desired_current in args.currents:
+        print(f"\n===== Approach from {args.start_voltage} V to {desired_current} A =====")
+        for strategy in args.strategies:
+            result = benchmark_bias_approach(strategy, args.start_voltage, desired_current, command_latency=args.latency)
+            print(f"{strategy}: {result['measurements']} measurements, {result['bias_set_calls']} Bias.Set calls, "
+                  f"{result['nanonis_calls']} Nanonis calls, final bias {result['voltage']:.4f} V, "
+                  f"current {result['current']:.3e} A, converged {result['converged']}, "
+                  f"measurement time {result['measurement_time']:.2f} s, wall time {result['wall_time']:.2f} s")
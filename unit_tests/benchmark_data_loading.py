@@ -0,0 +1,85 @@
+# go one folder up
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import shutil
+import tempfile
+import time
+import numpy as np
+
+from libs.storage.columnar import load_columns
+from libs.timing.clock import VirtualClock
+from libs.simulation.simulated_setup import create_simulated_setup
+from benchmark_sweep import run_sweep
+
+# benchmark loading many saved sessions: JSON files vs. memory-mapped columns
+
+# load the frequencies and amplitudes of all sessions from the JSON files (as in test_read_json.py)
+def load_json_sessions(filenames):
+    sessions = []
+    for filename in filenames:
+        with open(filename, "r") as f:
+            data = json.load(f)
+        frequencies = []
+        amplitudes = []
+        for value_set in data["data"]["values"]:
+            frequencies.append(value_set[0])
+            amplitudes.append(value_set[1])
+        sessions.append((frequencies, amplitudes))
+    return sessions
+
+# load the frequencies and amplitudes of all sessions from the column directories
+def load_columnar_sessions(directories):
+    sessions = []
+    for directory in directories:
+        columns = load_columns(directory)
+        sessions.append((columns["frequency (Hz)"], columns["compensation_amplitude (V)"]))
+    return sessions
+
+def time_function(function, *args):
+    start_time = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start_time, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark loading saved sessions as JSON and as memory-mapped columns.")
+    parser.add_argument("--sessions", type=int, default=1000, help="number of saved sessions to load")
+    parser.add_argument("--frequencies", type=int, default=200, help="number of frequencies per session")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    try:
+        # measure one session on the simulated setup and save it in both formats
+        clock = VirtualClock()
+        nanonis, awg = create_simulated_setup(plant_settings={"seed": 0}, nanonis_settings={"command_latency": 1e-3, "seed": 0}, clock=clock)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, tf_finder = run_sweep(nanonis, awg, clock, args.frequencies, {"output_format": "both"})
+            tf_finder.session_path = folder
+            tf_finder.save_data()
+        json_file = glob.glob(os.path.join(folder, "*.json"))[0]
+        columns_directory = glob.glob(os.path.join(folder, "*_columns"))[0]
+
+        # copies as stand-in for many sessions
+        json_files = [json_file]
+        directories = [columns_directory]
+        for index in range(1, args.sessions):
+            json_files.append(shutil.copy(json_file, os.path.join(folder, f"session_{index}.json")))
+            directories.append(shutil.copytree(columns_directory, os.path.join(folder, f"session_{index}_columns")))
+
+        json_time, json_sessions = time_function(load_json_sessions, json_files)
+        columnar_time, columnar_sessions = time_function(load_columnar_sessions, directories)
+        assert np.array_equal(json_sessions[0][0], columnar_sessions[0][0])
+        assert np.array_equal(json_sessions[0][1], columnar_sessions[0][1])
+
+        print(f"\n===== {args.sessions} sessions with {args.frequencies} frequencies =====")
+        print(f"JSON: {json_time * 1e3:.1f} ms ({os.path.getsize(json_file) / 1e3:.1f} kB per session)")
+        print(f"Columns (memory-mapped): {columnar_time * 1e3:.1f} ms")
+    finally:
+        shutil.rmtree(folder)
@@ -0,0 +1,198 @@
+# go one folder up
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import time
+import numpy as np
+
+from transfer_finder import transferFinder
+from libs.simulation.simulated_setup import create_simulated_setup
+from libs.timing.clock import RealClock, VirtualClock
+from libs.awg.waveform_cache import WaveformCache
+
+# benchmark the transfer finder end-to-end on the simulated Nanonis and AWG
+
+atom_tracking_parameters = {
+        "Igain": 570e-12,
+        "Frequency": 10.0,
+        "Amplitude": 100e-12,
+        "Phase": 0.0,
+        "SwitchOffDelay": 0.5
+}
+
+# time a single phase of the measurement and count the hardware calls
+# the measurement time is taken from the clock (the time it takes on the hardware), the wall time is the actual runtime
+def time_phase(function, nanonis, awg, clock):
+    nanonis.reset_call_counts()
+    awg.reset_call_counts()
+
+    start_time = time.perf_counter()
+    start_clock_time = clock.time()
+    function()
+    wall_time = time.perf_counter() - start_time
+
+    return {
+        "measurement_time": clock.time() - start_clock_time,
+        "wall_time": wall_time,
+        "nanonis_calls": nanonis.total_calls(),
+        "awg_calls": awg.total_calls(),
+        "nanonis_call_counts": dict(nanonis.call_counts),
+    }
+
+# run one sweep on the simulated setup
+def run_sweep(nanonis, awg, clock, num_frequencies, finder_settings):
+    tf_finder = transferFinder(
+        nanonis_module=nanonis,
+        atom_tracking_settings=atom_tracking_parameters,
+        sweep_frequencies=list(np.linspace(1e6, 50e6, num_frequencies)),
+        reference_frequency=1e4,
+        reference_STM_amplitude=0.2,
+        awg_reference=awg,
+        data_channels=[
+            "Input 2 (V)"
+        ],
+        active_state_current=1e-9,
+        active_state_voltage=0.1,
+        measurement_voltage=0.5,
+        clock=clock,
+        **finder_settings,
+    )
+
+    results = {
+        "prepare_measurement": time_phase(tf_finder.prepare_measurement, nanonis, awg, clock),
+        "record_reference_irec": time_phase(tf_finder.record_reference_irec, nanonis, awg, clock),
+        "measure_transfer_function_for_all_frequencies": time_phase(tf_finder.measure_transfer_function_for_all_frequencies, nanonis, awg, clock),
+    }
+    return results, tf_finder
+
+# run full sweeps with the given number of frequencies
+def benchmark_sweep(num_frequencies, command_latency=1e-3, seed=0, real_time=False, num_repetitions=1,
+                    waveform_cache=False, trace_file=None, **finder_settings):
+    """
+    Benchmarks the transfer finder on a simulated setup.
+    Repeated sweeps run over the same frequencies on the same AWG (e.g. a measurement campaign), the results of the last sweep are returned.
+    If trace_file is given, the spans of the last sweep are saved there in the Chrome trace format.
+    All additional keyword arguments are passed to the transferFinder.
+    """
+    clock = RealClock() if real_time else VirtualClock()
+    nanonis, awg = create_simulated_setup(plant_settings={"seed": seed},
+                                          nanonis_settings={"command_latency": command_latency, "seed": seed},
+                                          clock=clock)
+
+    if trace_file is not None:
+        finder_settings["trace_spans"] = True
+
+    cache = WaveformCache(awg) if waveform_cache else None
+    if cache is not None:
+        finder_settings["waveform_cache"] = cache
+
+    for _ in range(num_repetitions):
+        results, tf_finder = run_sweep(nanonis, awg, clock, num_frequencies, finder_settings)
+    if trace_file is not None:
+        tf_finder.tracer.save(trace_file)
+
+    # tuning statistics per frequency
+    iterations = [metadata["tuning_iterations"] for metadata in tf_finder.point_metadata]
+    converged = [metadata["converged"] for metadata in tf_finder.point_metadata]
+    acquisition_times = [metadata["irec_acquisition_time"] for metadata in tf_finder.point_metadata]
+    settle_times = [metadata["total_settle_time"] for metadata in tf_finder.point_metadata]
+    results["tuning"] = {
+        "mean_iterations": float(np.mean(iterations)),
+        "max_iterations": int(np.max(iterations)),
+        "converged_fraction": float(np.mean(converged)),
+        "mean_acquisition_time": float(np.mean(acquisition_times)),
+        "mean_settle_time": float(np.mean(settle_times)),
+    }
+    if cache is not None:
+        results["waveform_cache"] = cache.statistics()
+    if finder_settings.get("state_cache", False) or finder_settings.get("coalesce_writes", False):
+        results["state_cache"] = tf_finder.nanonis_module.state_cache.statistics()
+    results["sweep_duration_estimate"] = tf_finder.sweep_estimate
+    results["atom_trackings"] = sum(decision["track"] for decision in tf_finder.tracking_decisions)
+    if tf_finder.command_profiler is not None:
+        results["command_profile"] = tf_finder.command_profiler.statistics()
+    return results
+
+# print the results of one sweep
+def print_results(num_frequencies, results):
+    print(f"\n===== Sweep with {num_frequencies} frequencies =====")
+    for phase in ["prepare_measurement", "record_reference_irec", "measure_transfer_function_for_all_frequencies"]:
+        result = results[phase]
+        print(f"{phase}: measurement time {result['measurement_time']:.3f} s, wall time {result['wall_time']:.3f} s, "
+              f"Nanonis calls {result['nanonis_calls']}, AWG calls {result['awg_calls']}")
+
+    sweep = results["measure_transfer_function_for_all_frequencies"]
+    print(f"Per point: measurement time {sweep['measurement_time'] / num_frequencies * 1e3:.2f} ms, "
+          f"wall time {sweep['wall_time'] / num_frequencies * 1e3:.2f} ms, "
+          f"Nanonis calls {sweep['nanonis_calls'] / num_frequencies:.1f}, "
+          f"AWG calls {sweep['awg_calls'] / num_frequencies:.1f}")
+    estimate = results["sweep_duration_estimate"]
+    print(f"Sweep duration: estimated {estimate['expected']:.3f} s (upper bound {estimate['upper_bound']:.3f} s), actual {estimate['actual']:.3f} s")
+    print(f"Atom trackings during the sweep: {results['atom_trackings']}")
+    tuning = results["tuning"]
+    print(f"Tuning: {tuning['mean_iterations']:.2f} iterations on average (max {tuning['max_iterations']}), "
+          f"{tuning['converged_fraction'] * 100:.1f} % converged, "
+          f"{tuning['mean_acquisition_time'] * 1e3:.1f} ms Irec acquisition and "
+          f"{tuning['mean_settle_time'] * 1e3:.1f} ms settling per point")
+    if "waveform_cache" in results:
+        cache = results["waveform_cache"]
+        print(f"Waveform cache: {cache['hits']} hits, {cache['misses']} misses, {cache['evictions']} evictions")
+    if "state_cache" in results:
+        print(f"State cache: {results['state_cache']['avoided_round_trips']} avoided round-trips, hits per getter: {results['state_cache']['hits']}, "
+              f"elided writes: {results['state_cache']['elided_writes']}, merged writes: {results['state_cache']['merged_writes']}")
+    if "command_profile" in results:
+        print("Command latencies (whole run):")
+        for command, statistics in results["command_profile"].items():
+            percentiles = ", ".join(f"{key} {value * 1e3:.3f} ms" for key, value in statistics.items() if key.startswith("p"))
+            print(f"\t{command}: {statistics['count']} calls, total {statistics['total']:.3f} s, {percentiles}")
+    print("Nanonis calls per command during the sweep:")
+    for command, count in sorted(sweep["nanonis_call_counts"].items(), key=lambda item: -item[1]):
+        print(f"\t{command}: {count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the transfer finder on the simulated backend.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 500, 5000], help="numbers of sweep frequencies")
+    parser.add_argument("--latency", type=float, default=1e-3, help="simulated round-trip time per Nanonis command in seconds")
+    parser.add_argument("--real-time", action="store_true", help="wait in real time instead of using a virtual clock")
+    parser.add_argument("--repetitions", type=int, default=1, help="number of sweeps over the same frequencies, the last one is reported")
+    parser.add_argument("--tuning-strategy", default="secant", choices=["secant", "pi"], help="amplitude tuning strategy")
+    parser.add_argument("--amplitude-guess-mode", default="closest", choices=["closest", "model", "half", "fixed"], help="how the starting amplitude of the tuning is estimated")
+    parser.add_argument("--sweep-order", default="given", choices=["given", "sorted", "bisection", "amplitude"], help="order in which the frequencies are measured")
+    parser.add_argument("--tracking-deferral", type=int, default=0, help="number of points a due atom tracking may be postponed to a cheaper position")
+    parser.add_argument("--adaptive-integration", action="store_true", help="stop averaging Irec early if it is clearly outside the tolerance")
+    parser.add_argument("--settle-detection", action="store_true", help="detect the end of the AWG step response instead of waiting the fixed settling time")
+    parser.add_argument("--continuous-output", action="store_true", help="keep the AWG playing and switch between preloaded segments")
+    parser.add_argument("--pipelined-sweep", action="store_true", help="upload the next waveform while the current frequency is measured")
+    parser.add_argument("--combined-acquisition", action="store_true", help="read the data channels together with the final tuning measurement")
+    parser.add_argument("--state-cache", action="store_true", help="serve repeated Nanonis getters from the state cache")
+    parser.add_argument("--coalesce-writes", action="store_true", help="do not send Nanonis setters which would not change the known state")
+    parser.add_argument("--atom-tracking-scheduler", default="interval", choices=["interval", "drift"], help="when to track the atom during the sweep")
+    parser.add_argument("--profile-commands", action="store_true", help="record latency histograms of all Nanonis and AWG commands")
+    parser.add_argument("--trace", default=None, help="save the spans of the sweep to this file ({size} is replaced by the number of frequencies)")
+    parser.add_argument("--waveform-cache", action="store_true", help="keep uploaded waveforms in the AWG segment memory across sweeps")
+    args = parser.parse_args()
+
+    for num_frequencies in args.sizes:
+        results = benchmark_sweep(num_frequencies,
+                                  command_latency=args.latency,
+                                  real_time=args.real_time,
+                                  num_repetitions=args.repetitions,
+                                  waveform_cache=args.waveform_cache,
+                                  tuning_strategy=args.tuning_strategy,
+                                  amplitude_guess_mode=args.amplitude_guess_mode,
+                                  sweep_order=args.sweep_order,
+                                  tracking_deferral=args.tracking_deferral,
+                                  adaptive_integration=args.adaptive_integration,
+                                  settle_detection=args.settle_detection,
+                                  continuous_output=args.continuous_output,
+                                  pipelined_sweep=args.pipelined_sweep,
+                                  combined_acquisition=args.combined_acquisition,
+                                  state_cache=args.state_cache,
+                                  coalesce_writes=args.coalesce_writes,
+                                  profile_commands=args.profile_commands,
+                                  atom_tracking_scheduler=args.atom_tracking_scheduler,
+                                  trace_file=args.trace.format(size=num_frequencies) if args.trace is not None else None)
+        print_results(num_frequencies, results)
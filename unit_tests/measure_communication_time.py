@@ -29,6 +29,16 @@ def measure_communication_time(num_measurements=100):
     average_time = total_time / num_measurements
     print(f"Average communication time for BiasSet command: {average_time:.6f} seconds")    
 
+# measure the round-trip time distribution of all commands used during the sweep
+from libs.timing.clock import RealClock
+from libs.timing.latency_profiler import LatencyProfiler
+def profile_communication_time(num_samples=200):
+    profiler = LatencyProfiler(num_samples=num_samples)
+    latencies = profiler.profile(NMod, RealClock(), address=(TCP_IP, TCP_PORT), force=True)
+    for name, values in latencies.items():
+        print(f"{name}: median {values['median']:.6f} s, p99 {values['p99']:.6f} s")
+
 if __name__ == "__main__":
     measure_communication_time(num_measurements=1000)
-    measure_communication_time(num_measurements=1)
\ No newline at end of file
+    measure_communication_time(num_measurements=1)
+    profile_communication_time()
\ No newline at end of file